@@ -1,21 +1,56 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 import sqlite3
 import os
+import sys
+import json
 import secrets 
+import threading
+import time
+
+# The shared scripts (bulkedit.py, ...) live one folder up from the Flask app
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import bulkedit
+import changelog
+import createdb
+import dedupe
+import jobqueue
+import publish
+import reclassify
+import sharding
+
+from autocomplete import Autocomplete
+from facets import FacetIndex
+from readmodel import EventReadModel
 
 # Initialize the Flask application
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)  # Generates a 32-character random key
 
 # Path to the SQLite database file
-DB_PATH = '../zines.db'  # Back one folder and just the name
+DB_PATH = os.environ.get('ZINES_DB_PATH', '../zines.db')  # Back one folder and just the name (loadtest.py points it at a copy)
+
+# Pages are read from a published read-only copy of zines.db (see publish.py), so imports
+# and rebuilds of the primary never block them. Writes go to DB_PATH and then republish;
+# the copy is made in the background, at most once every publish.PUBLISH_INTERVAL seconds.
+SNAPSHOT_PATH = os.environ.get('ZINES_SNAPSHOT', '../zines_published.db')
+snapshot_publisher = publish.SnapshotPublisher(DB_PATH, SNAPSHOT_PATH)
+
+# Background jobs (imports, bulk edits, reports, ...) are queued here and run by jobqueue.py workers
+JOBS_DB_PATH = '../jobs.db'
+JOB_WORKERS = 2
+
+# Optional sharded mode: point ZINES_CATALOG at a catalog.db built by sharding.py and
+# every zine is read from (and written to) its own shard database
+CATALOG_PATH = os.environ.get('ZINES_CATALOG')
 
 def get_db_connection():
     """
     Create a connection to the SQLite database
     
     This function:
-    1. Opens a connection to the database file
+    1. Opens a read-only connection to the published snapshot
+       (the primary database if nothing has been published yet; in sharded
+       mode, a read-only connection that sees every shard)
     2. Sets row_factory to sqlite3.Row so we can access columns by name
        (instead of just by index number)
     3. Returns the connection object
@@ -23,31 +58,165 @@ def get_db_connection():
     Returns:
         sqlite3.Connection: A database connection object
     """
-    conn = sqlite3.connect(DB_PATH)
+    if CATALOG_PATH:
+        conn = sharding.connect_federated(CATALOG_PATH)
+    elif os.path.exists(SNAPSHOT_PATH):
+        conn = publish.connect_snapshot(SNAPSHOT_PATH)
+    else:
+        conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row  # This allows us to access columns by name like row['title']
     return conn
 
+def get_write_connection(record_id=None, pub_title=None):
+    """
+    Create a connection for changing data
+    
+    Without sharding this opens the primary database (call republish() after
+    committing so the pages show the change). In sharded mode the write goes to the shard that owns the record: found from its id, or from the
+    publication title for a new publication (creating the shard if needed).
+    
+    Foreign keys are enforced on these connections, so an event can't be saved
+    pointing at a publication that doesn't exist (see integrity.py for old rows).
+    
+    Returns:
+        sqlite3.Connection: A database connection object
+    """
+    if not CATALOG_PATH:
+        conn = sqlite3.connect(DB_PATH, timeout=30)  # wait out an import instead of failing
+        conn.row_factory = sqlite3.Row
+        dedupe.register_content_hash(conn)  # computes content_key for saved events
+    else:
+        if pub_title is not None:
+            shard = sharding.get_or_create_shard(pub_title, CATALOG_PATH)
+        else:
+            shard = sharding.shard_for_id(record_id, CATALOG_PATH)
+            if shard is None:
+                raise ValueError(f'No shard holds record {record_id}')
+        conn = sharding.connect_shard(shard)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+def republish():
+    """
+    Ask for a fresh snapshot after a write. The copy runs on snapshot_publisher's
+    background thread, so the request doesn't wait for it, and writes within
+    publish.PUBLISH_INTERVAL seconds of each other share one copy.
+    Shards are read directly, so there is nothing to publish in sharded mode.
+    """
+    if CATALOG_PATH:
+        return
+    snapshot_publisher.request()
+
+# Prefix indexes for the form autocompletes, rebuilt when the data changes
+suggestions = Autocomplete(get_db_connection)
+
+# Optional in-memory columns for the home page's events table (ZINES_READ_MODEL=1):
+# sorting and paging become array slices instead of an ORDER BY over every event
+read_model = EventReadModel() if os.environ.get('ZINES_READ_MODEL') == '1' else None
+
+# Bitmaps behind the home page's filter counts ("Protest Report (1,204)"), kept up to
+# date from change_log instead of running a GROUP BY per filter on every page view
+facet_index = FacetIndex()
+
+# TF-IDF index of event and resource descriptions (built by similarity.py), brought
+# up to date from change_log at most once every SIMILARITY_CHECK_INTERVAL seconds
+SIMILARITY_INDEX_DIR = '../similarity_index'
+SIMILARITY_CHECK_INTERVAL = 5.0
+similarity_state = {'index': None, 'checked_at': 0.0}
+similarity_lock = threading.RLock()  # held by callers while they query the index too
+
+def get_similarity_index():
+    """
+    The similarity index, loaded from disk on first use (or built if it has never
+    been saved) and updated in memory with the changes made since.
+
+    Returns:
+        similarity.SimilarityIndex: The up-to-date index
+    """
+    import similarity  # SciPy is only loaded once the similar-records widget is used
+
+    with similarity_lock:
+        index = similarity_state['index']
+        if index is not None and time.monotonic() - similarity_state['checked_at'] < SIMILARITY_CHECK_INTERVAL:
+            return index
+        conn = get_db_connection()
+        try:
+            if index is None:
+                index = similarity.SimilarityIndex.load(SIMILARITY_INDEX_DIR)
+            if index is None:
+                index = similarity.SimilarityIndex()
+                index.build(conn)
+                if not CATALOG_PATH:
+                    index.save(SIMILARITY_INDEX_DIR)
+            else:
+                index.update(conn)
+        finally:
+            conn.close()
+        similarity_state['index'] = index
+        similarity_state['checked_at'] = time.monotonic()
+        return index
+
+@app.errorhandler(sqlite3.OperationalError)
+def database_busy(error):
+    """
+    A write that waited out its busy timeout (SQLITE_BUSY, "database is locked") is
+    answered with 503 and Retry-After instead of a generic 500, so clients (and
+    loadtest.py) can tell contention from bugs. Other database errors stay 500s.
+    """
+    message = str(error)
+    if 'locked' not in message and 'busy' not in message:
+        raise error
+    return jsonify({'error': 'The database is busy, please try again.'}), 503, {'Retry-After': '1'}
+
 @app.route('/')
 def index():
     """
     Home page route - displays paginated lists of events and publications in separate tables.
     """
-    # Get query parameters for events
-    search = request.args.get('search', '').strip()
-    sort_events = request.args.get('sort_events', 'event_title')  # Default sort for events
-    order_events = request.args.get('order_events', 'asc')  # Default order for events
-    page_events = int(request.args.get('page_events', 1))  # Current page for events
-    per_page = 10  # Number of rows per page
-    offset_events = (page_events - 1) * per_page
+    conn = get_db_connection()
+    try:
+        context = load_index_context(conn, request.args)
+    finally:
+        conn.close()
 
-    # Get query parameters for publications
-    sort_publications = request.args.get('sort_publications', 'pub_title')  # Default sort for publications
-    order_publications = request.args.get('order_publications', 'asc')  # Default order for publications
-    page_publications = int(request.args.get('page_publications', 1))  # Current page for publications
-    offset_publications = (page_publications - 1) * per_page
+    # Render the HTML template and pass the data
+    return render_template('index.html', **context)
+
+# Columns the home page can sort events by (the read model keeps a sort order for each)
+SORTABLE_EVENT_COLUMNS = ['event_title', 'event_date', 'city', 'state', 'country', 'event_type']
+
+# Filters on the home page's events (query string name -> SQL condition); all but city have counts
+EVENT_FILTERS = {
+    'event_type': 'e.event_type = ?',
+    'state': 'e.state = ?',
+    'country': 'e.country = ?',
+    'city': 'e.city = ?',
+    'year': 'substr(e.event_date, 1, 4) = ?',
+    'publication': 'p.pub_title = ?',
+}
+
+def get_event_filters(args):
+    """
+    The event filters set in the query string
 
-    # Get a connection to the database
-    conn = get_db_connection()
+    Returns:
+        dict: Filter name -> selected value (only filters that are set)
+    """
+    filters = {name: args.get(name, '').strip() for name in EVENT_FILTERS}
+    if not (len(filters['year']) == 4 and filters['year'].isdigit()):
+        filters['year'] = ''  # years are four digits, as in facets.event_year
+    return {name: value for name, value in filters.items() if value}
+
+def query_events_page(conn, search, sort_events, order_events, per_page, offset_events, filters=None):
+    """
+    One page of the home page's events table, straight from SQLite
+
+    Returns:
+        tuple: (list of rows, total number of matching events)
+    """
+    filters = filters or {}
+    conditions = ' '.join(f'AND {EVENT_FILTERS[name]}' for name in filters)
+    parameters = [f"%{search}%"] + list(filters.values())
 
     # Query for events with pagination
     events_query = f'''
@@ -56,17 +225,58 @@ def index():
                p.pub_title AS publication_title
         FROM events e
         LEFT JOIN publications p ON e.publication_id = p.pub_id
-        WHERE e.event_title LIKE ?
+        WHERE e.event_title LIKE ? {conditions}
         ORDER BY {sort_events} {order_events.upper()}
         LIMIT ? OFFSET ?
     '''
-    events = conn.execute(events_query, (f"%{search}%", per_page, offset_events)).fetchall()
+    events = conn.execute(events_query, parameters + [per_page, offset_events]).fetchall()
 
     # Total number of events for pagination
-    total_events_query = '''
-        SELECT COUNT(*) FROM events WHERE event_title LIKE ?
+    join = 'LEFT JOIN publications p ON e.publication_id = p.pub_id' if 'publication' in filters else ''
+    total_events_query = f'''
+        SELECT COUNT(*) FROM events e {join}
+        WHERE e.event_title LIKE ? {conditions}
     '''
-    total_events = conn.execute(total_events_query, (f"%{search}%",)).fetchone()[0]
+    total_events = conn.execute(total_events_query, parameters).fetchone()[0]
+
+    return events, total_events
+
+def load_index_context(conn, args):
+    """
+    Run the home page's queries (shared with the async read path in asgi.py)
+
+    Args:
+        conn (sqlite3.Connection): A read connection from get_db_connection().
+        args (dict-like): The query string (search, sort_events, order_events, page_events, ...).
+
+    Returns:
+        dict: The variables index.html is rendered with
+    """
+    # Get query parameters for events
+    search = args.get('search', '').strip()
+    sort_events = args.get('sort_events', 'event_title')  # Default sort for events
+    order_events = args.get('order_events', 'asc')  # Default order for events
+    page_events = int(args.get('page_events', 1))  # Current page for events
+    per_page = 10  # Number of rows per page
+    offset_events = (page_events - 1) * per_page
+    filters = get_event_filters(args)
+
+    # Get query parameters for publications
+    sort_publications = args.get('sort_publications', 'pub_title')  # Default sort for publications
+    order_publications = args.get('order_publications', 'asc')  # Default order for publications
+    page_publications = int(args.get('page_publications', 1))  # Current page for publications
+    offset_publications = (page_publications - 1) * per_page
+
+    if read_model is not None and sort_events in SORTABLE_EVENT_COLUMNS:
+        read_model.refresh(conn)
+        events, total_events = read_model.page(sort_events, order_events, search, per_page, offset_events, filters)
+    else:
+        events, total_events = query_events_page(conn, search, sort_events, order_events, per_page, offset_events,
+                                                 filters)
+
+    # Counts beside each filter value, for the current search and filters
+    facet_index.refresh(conn)
+    facets, _ = facet_index.counts(search, filters)
 
     # Query for publications with pagination
     publications_query = f'''
@@ -83,15 +293,11 @@ def index():
     '''
     total_publications = conn.execute(total_publications_query).fetchone()[0]
 
-    conn.close()
-
     # Calculate total pages for events and publications
     total_pages_events = (total_events + per_page - 1) // per_page  # Round up division
     total_pages_publications = (total_publications + per_page - 1) // per_page
 
-    # Render the HTML template and pass the data
-    return render_template(
-        'index.html',
+    return dict(
         events=events,
         publications=publications,
         page_events=page_events,
@@ -99,6 +305,9 @@ def index():
         page_publications=page_publications,
         total_pages_publications=total_pages_publications,
         search=search,
+        filters=filters,
+        facets=facets,
+        event_query=dict(filters, search=search) if search else filters,
         sort_events=sort_events,
         order_events=order_events,
         sort_publications=sort_publications,
@@ -150,20 +359,25 @@ def handle_publication_submission():
         return redirect(url_for('add_publication'))
     
     try:
-        conn = get_db_connection()
+        conn = get_write_connection(pub_title=pub_title)
         
-        # Insert the new publication
-        conn.execute('''
+        # Insert the new publication (skipped if this title/volume/issue already exists)
+        cursor = conn.execute('''
             INSERT INTO publications (pub_title, volume, issue_number)
             VALUES (?, ?, ?)
+            ON CONFLICT DO NOTHING
         ''', (pub_title, volume, issue_number))
         
         # Commit the changes
         conn.commit()
         conn.close()
+        republish()
         
         # Success message
-        flash(f'Successfully added publication: {pub_title}', 'success')
+        if cursor.rowcount:
+            flash(f'Successfully added publication: {pub_title}', 'success')
+        else:
+            flash(f'Publication already exists: {pub_title}', 'error')
         
     except Exception as e:
         flash(f'Error adding publication: {str(e)}', 'error')
@@ -218,22 +432,42 @@ def handle_event_submission():
         flash('Event title is required!', 'error')
         return redirect(url_for('add_event'))
     
+    if CATALOG_PATH and not publication_id.isdigit():
+        flash('A publication ID is required to know which zine the event belongs to!', 'error')
+        return redirect(url_for('add_event'))
+    
+    if publication_id and not publication_id.isdigit():
+        flash('Publication ID must be a number!', 'error')
+        return redirect(url_for('add_event'))
+    publication_id = int(publication_id) if publication_id else None  # stored as an integer or NULL, never text
+    
     try:
-        conn = get_db_connection()
+        conn = get_write_connection(record_id=publication_id or None)
         
-        # Insert the new event
-        conn.execute('''
+        # Insert the new event (skipped if an identical event already exists)
+        cursor = conn.execute('''
             INSERT INTO events (event_title, event_date, city, state, country, publication_id)
             VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
         ''', (event_title, event_date, city, state, country, publication_id))
         
         # Commit the changes
         conn.commit()
         conn.close()
+        republish()
         
         # Success message
-        flash(f'Successfully added event: {event_title}', 'success')
+        if cursor.rowcount:
+            flash(f'Successfully added event: {event_title}', 'success')
+        else:
+            flash(f'Event already exists: {event_title}', 'error')
         
+    except sqlite3.IntegrityError as e:
+        if 'FOREIGN KEY' not in str(e):
+            raise
+        conn.close()  # ends the failed insert's transaction, releasing the write lock
+        flash(f'No publication with ID {publication_id}!', 'error')
+        return redirect(url_for('add_event'))
     except Exception as e:
         flash(f'Error adding event: {str(e)}', 'error')
     
@@ -260,43 +494,58 @@ def edit_record(record_type, record_id):
         return redirect(url_for('index'))
 
     if request.method == 'POST':
-        # Handle form submission to update the record
-        if record_type == 'event':
-            event_title = request.form.get('event_title', '').strip() or 'NA'
-            event_date = request.form.get('event_date', '').strip() or 'NA-NA-NA'
-            city = request.form.get('city', '').strip() or 'NA'
-            state = request.form.get('state', '').strip() or 'NA'
-            country = request.form.get('country', '').strip() or 'NA'
-            event_type = request.form.get('event_type', '').strip() or 'NA'
-            description = request.form.get('description', '').strip() or 'NA'
-
-            # Update the event in the database
-            conn.execute('''
-                UPDATE events
-                SET event_title = ?, event_date = ?, city = ?, state = ?, country = ?, event_type = ?, description = ?
-                WHERE event_id = ?
-            ''', (event_title, event_date, city, state, country, event_type, description, record_id))
-            conn.commit()
-            flash('Event updated successfully!', 'success')
+        # Changes go to the primary database (or, in sharded mode, the record's shard)
+        conn.close()
+        try:
+            conn = get_write_connection(record_id=record_id)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('index'))
 
-        elif record_type == 'publication':
-            pub_title = request.form.get('pub_title', '').strip() or 'NA'
-            volume = request.form.get('volume', '').strip() or 'NA'
-            issue_number = request.form.get('issue_number', '').strip() or 'NA'
-            issue_date = request.form.get('issue_date', '').strip() or 'NA'
-            author_org = request.form.get('author_org', '').strip() or 'NA'
-            location = request.form.get('location', '').strip() or 'NA'
-
-            # Update the publication in the database
-            conn.execute('''
-                UPDATE publications
-                SET pub_title = ?, volume = ?, issue_number = ?, issue_date = ?, author_org = ?, location = ?
-                WHERE pub_id = ?
-            ''', (pub_title, volume, issue_number, issue_date, author_org, location, record_id))
-            conn.commit()
-            flash('Publication updated successfully!', 'success')
+        # Handle form submission to update the record
+        try:
+            if record_type == 'event':
+                event_title = request.form.get('event_title', '').strip() or 'NA'
+                event_date = request.form.get('event_date', '').strip() or 'NA-NA-NA'
+                city = request.form.get('city', '').strip() or 'NA'
+                state = request.form.get('state', '').strip() or 'NA'
+                country = request.form.get('country', '').strip() or 'NA'
+                event_type = request.form.get('event_type', '').strip() or 'NA'
+                description = request.form.get('description', '').strip() or 'NA'
+
+                # Update the event in the database
+                conn.execute('''
+                    UPDATE events
+                    SET event_title = ?, event_date = ?, city = ?, state = ?, country = ?, event_type = ?, description = ?
+                    WHERE event_id = ?
+                ''', (event_title, event_date, city, state, country, event_type, description, record_id))
+                conn.commit()
+                flash('Event updated successfully!', 'success')
+
+            elif record_type == 'publication':
+                pub_title = request.form.get('pub_title', '').strip() or 'NA'
+                volume = request.form.get('volume', '').strip() or 'NA'
+                issue_number = request.form.get('issue_number', '').strip() or 'NA'
+                issue_date = request.form.get('issue_date', '').strip() or 'NA'
+                author_org = request.form.get('author_org', '').strip() or 'NA'
+                location = request.form.get('location', '').strip() or 'NA'
+
+                # Update the publication in the database
+                conn.execute('''
+                    UPDATE publications
+                    SET pub_title = ?, volume = ?, issue_number = ?, issue_date = ?, author_org = ?, location = ?
+                    WHERE pub_id = ?
+                ''', (pub_title, volume, issue_number, issue_date, author_org, location, record_id))
+                conn.commit()
+                flash('Publication updated successfully!', 'success')
+        except sqlite3.IntegrityError:
+            # Another row already has this content key (or, for publications, title/volume/issue)
+            conn.close()  # ends the failed update's transaction, releasing the write lock
+            flash(f'Not saved: another {record_type} already has exactly these values!', 'error')
+            return redirect(url_for('edit_record', record_type=record_type, record_id=record_id))
 
         conn.close()
+        republish()
 
         # Redirect back to the index page
         return redirect(url_for('index'))
@@ -316,6 +565,345 @@ def edit_record(record_type, record_id):
 
         return render_template('edit.html', record=record, record_type=record_type)
 
+@app.route('/bulk_edit', methods=['GET', 'POST'])
+def bulk_edit():
+    """
+    Bulk update/delete page.
+
+    GET: Shows the form and any interrupted operations
+    POST: 'preview' counts and samples the matching rows without changing anything,
+          'apply' runs the operation in resumable chunks,
+          'resume' finishes an interrupted operation
+
+    Returns:
+        HTML page: The bulk edit form with the preview or result
+    """
+    form = {
+        'table': request.form.get('table', 'events'),
+        'expression': request.form.get('expression', '').strip(),
+        'action': request.form.get('action', 'update'),
+        'set_column': request.form.get('set_column', '').strip(),
+        'set_value': request.form.get('set_value', ''),
+    }
+    preview_count = None
+    sample = []
+    error = None
+
+    if request.method == 'POST' and CATALOG_PATH:
+        error = 'Bulk edits run against one shard at a time: use bulkedit.py with the shard database path.'
+    elif request.method == 'POST':
+        step = request.form.get('step', 'preview')
+        try:
+            if step == 'resume':
+                op_id = int(request.form.get('op_id', 0))
+                return redirect(url_for('job_status', job_id=queue_job('bulk_edit', op_id=op_id)))
+
+            preview_count, sample = bulkedit.preview(form['table'], form['expression'], db_path=DB_PATH)
+            if step == 'apply':
+                op_id = bulkedit.create_operation(
+                    form['table'], form['expression'], form['action'],
+                    form['set_column'], form['set_value'], db_path=DB_PATH)
+                # The chunks run in a background worker; the job page shows their progress
+                return redirect(url_for('job_status', job_id=queue_job('bulk_edit', op_id=op_id)))
+        except (bulkedit.FilterError, sqlite3.Error) as e:
+            error = str(e)
+
+    return render_template(
+        'bulk_edit.html',
+        form=form,
+        tables=list(bulkedit.BULK_TABLES),
+        preview_count=preview_count,
+        sample=sample,
+        pending=[] if CATALOG_PATH else bulkedit.pending_operations(db_path=DB_PATH),
+        error=error
+    )
+
+# One publication with every event and resource from that issue, built as a single JSON
+# document inside SQLite so the whole issue is one query (and one round trip) however
+# many items it has. The events and resources are found through idx_events_publication_id
+# and idx_resources_volume_issue.
+ISSUE_QUERY = '''
+    SELECT json_object(
+        'pub_id', p.pub_id, 'pub_title', p.pub_title, 'volume', p.volume,
+        'issue_number', p.issue_number, 'issue_date', p.issue_date,
+        'volume_title', p.volume_title, 'author_org', p.author_org, 'location', p.location,
+        'events', (
+            SELECT json_group_array(json_object(
+                'event_id', e.event_id, 'event_title', e.event_title, 'event_date', e.event_date,
+                'event_type', e.event_type, 'city', e.city, 'state', e.state, 'country', e.country,
+                'location', e.location, 'address', e.address, 'description', e.description,
+                'source_publication', e.source_publication))
+            FROM (SELECT * FROM events WHERE publication_id = p.pub_id ORDER BY event_date, event_id) e
+        ),
+        'resources', (
+            SELECT json_group_array(json_object(
+                'resource_id', r.resource_id, 'resource_title', r.resource_title,
+                'resource_type', r.resource_type, 'city', r.city, 'state', r.state, 'country', r.country,
+                'location', r.location, 'address', r.address, 'description', r.description,
+                'source_publication', r.source_publication))
+            FROM (SELECT * FROM resources WHERE volume = p.volume AND issue = p.issue_number
+                  ORDER BY resource_type, resource_id) r
+        )
+    )
+    FROM publications p
+    WHERE p.pub_id = ?
+'''
+
+def get_issue_json(pub_id):
+    """
+    Load one issue with all of its events and resources
+
+    Args:
+        pub_id (int): The publication (issue) to load.
+
+    Returns:
+        str: The issue as a JSON document, or None if there is no such publication
+    """
+    conn = get_db_connection()
+    try:
+        row = conn.execute(ISSUE_QUERY, (pub_id,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+@app.route('/issue/<int:pub_id>')
+def issue(pub_id):
+    """
+    Issue page - the publication plus every event and resource that came from it.
+
+    Args:
+        pub_id (int): The ID of the publication.
+
+    Returns:
+        HTML page: The issue page, or a redirect to the home page if it doesn't exist
+    """
+    issue_json = get_issue_json(pub_id)
+    if issue_json is None:
+        flash('Publication not found!', 'error')
+        return redirect(url_for('index'))
+    return render_template('issue.html', issue=json.loads(issue_json))
+
+@app.route('/api/issue/<int:pub_id>')
+def issue_api(pub_id):
+    """
+    The issue page's data as JSON (the document SQLite built, passed through unchanged).
+
+    Returns:
+        JSON: The publication's columns plus 'events' and 'resources' lists
+    """
+    issue_json = get_issue_json(pub_id)
+    if issue_json is None:
+        return jsonify({'error': f'No publication with id {pub_id}'}), 404
+    return app.response_class(issue_json, mimetype='application/json')
+
+# One event with the publication it came from (also used by staticexport.py)
+EVENT_QUERY = '''
+    SELECT e.event_id, e.event_title, e.event_date, e.city, e.state, e.country, e.event_type,
+           e.description, e.location, e.address, e.source_publication, e.publication_id,
+           p.pub_title AS publication_title, p.volume, p.issue_number
+    FROM events e
+    LEFT JOIN publications p ON e.publication_id = p.pub_id
+'''
+
+@app.route('/event/<int:event_id>')
+def event(event_id):
+    """
+    Event page - every field of one event, linked to its issue.
+
+    Args:
+        event_id (int): The ID of the event.
+
+    Returns:
+        HTML page: The event page, or a redirect to the home page if it doesn't exist
+    """
+    conn = get_db_connection()
+    try:
+        record = conn.execute(EVENT_QUERY + ' WHERE e.event_id = ?', (event_id,)).fetchone()
+    finally:
+        conn.close()
+    if record is None:
+        flash('Event not found!', 'error')
+        return redirect(url_for('index'))
+    return render_template('event.html', event=record)
+
+@app.route('/autocomplete')
+def autocomplete():
+    """
+    Suggestions for a form field as the user types: /autocomplete?field=city&q=ber
+
+    Fields: publication (suggests publication IDs by title), pub_title, event_title,
+    city, state, country, event_type and source_publication.
+
+    Returns:
+        JSON: List of {value, label, count}, most used first
+    """
+    field = request.args.get('field', '')
+    prefix = request.args.get('q', '')
+    try:
+        limit = min(int(request.args.get('limit', 10)), 50)
+        return jsonify(suggestions.suggest(field, prefix, limit))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/similar/<string:record_type>/<int:record_id>')
+def similar_records(record_type, record_id):
+    """
+    Events and resources whose title and description read most like this one:
+    /similar/event/12?limit=10
+
+    Args:
+        record_type (str): 'event' or 'resource'.
+        record_id (int): The ID of the record.
+
+    Returns:
+        JSON: List of {table, id, title, score}, most similar first (score is cosine similarity, 0-1)
+    """
+    tables = {'event': 'events', 'resource': 'resources'}
+    if record_type not in tables:
+        return jsonify({'error': "record_type must be 'event' or 'resource'"}), 400
+    try:
+        limit = min(int(request.args.get('limit', 10)), 50)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    with similarity_lock:  # no update can change the index halfway through the query
+        index = get_similarity_index()
+        if (tables[record_type], record_id) not in index.rows_by_key:
+            return jsonify({'error': f'No {record_type} with id {record_id}'}), 404
+        matches = index.similar(tables[record_type], record_id, limit)
+    return jsonify(matches)
+
+@app.route('/changes')
+def changes():
+    """
+    Change feed for mirrors: every insert, update and delete after ?since=<seq>.
+
+    Returns up to ?limit= changes (default 500, at most 5000) with the current row,
+    plus next_since (pass it as since on the next call), has_more and the log's epoch.
+    Mirrors record the epoch with their seq: a different epoch means the database was
+    rebuilt and seqs started over, so the mirror should re-pull everything.
+
+    Returns:
+        JSON: {changes, next_since, latest_seq, epoch, has_more}
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', changelog.BATCH_SIZE)), 5000)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+
+    conn = get_db_connection()
+    try:
+        if not changelog.has_change_log(conn):
+            return jsonify({'error': 'This database has no change_log; run changelog.py first.'}), 404
+        batch = changelog.read_changes(conn, since, limit)
+        latest_seq = changelog.current_seq(conn)
+        epoch = changelog.log_epoch(conn)
+    finally:
+        conn.close()
+
+    return jsonify({
+        'changes': batch,
+        'next_since': batch[-1]['seq'] if batch else since,
+        'latest_seq': latest_seq,
+        'epoch': epoch,
+        'has_more': bool(batch) and batch[-1]['seq'] < latest_seq,
+    })
+
+def queue_job(kind, **params):
+    """
+    Queue a background job against this app's database and make sure workers are running.
+
+    Returns:
+        int: The new job's id.
+    """
+    params['db_path'] = os.path.abspath(DB_PATH)
+    if not CATALOG_PATH:
+        params['snapshot_path'] = os.path.abspath(SNAPSHOT_PATH)  # republished when a writing job finishes
+    job_id = jobqueue.submit_job(kind, params, jobs_db_path=JOBS_DB_PATH)
+    jobqueue.ensure_workers(JOB_WORKERS, jobs_db_path=JOBS_DB_PATH)
+    return job_id
+
+@app.route('/jobs', methods=['GET', 'POST'])
+def jobs():
+    """
+    Background jobs page.
+
+    GET: Lists recent jobs and a form to start a new one
+    POST: Queues the chosen job and shows its progress page
+
+    Returns:
+        HTML page: The job list (GET) or a redirect to the new job (POST)
+    """
+    if request.method == 'POST':
+        kind = request.form.get('kind', '')
+        params = {}
+        if kind == 'reload':
+            params['from_current'] = bool(request.form.get('from_current'))
+        elif kind == 'reports' and request.form.get('only', '').strip():
+            params['only'] = request.form.get('only').split()
+        elif kind == 'reclassify':
+            params['name'] = request.form.get('reclassification', '')
+            if params['name'] not in reclassify.RECLASSIFICATIONS:
+                flash('Choose a reclassification to run.', 'error')
+                return redirect(url_for('jobs'))
+        try:
+            job_id = queue_job(kind, **params)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('jobs'))
+        return redirect(url_for('job_status', job_id=job_id))
+
+    return render_template('jobs.html', jobs=jobqueue.list_jobs(jobs_db_path=JOBS_DB_PATH),
+                           kinds={kind: spec['label'] for kind, spec in jobqueue.JOB_KINDS.items()
+                                  if kind != 'bulk_edit'},  # bulk edits are started from /bulk_edit
+                           reclassifications={name: spec['description']
+                                              for name, spec in reclassify.RECLASSIFICATIONS.items()})
+
+@app.route('/jobs/<int:job_id>', methods=['GET', 'POST'])
+def job_status(job_id):
+    """
+    Progress page for one job; refreshes itself while the job is queued or running.
+
+    POST: Cancels the job
+
+    Returns:
+        HTML page: The job's status, progress counters and console output
+    """
+    if request.method == 'POST':
+        jobqueue.cancel_job(job_id, jobs_db_path=JOBS_DB_PATH)
+        flash(f'Cancelling job {job_id}.', 'success')
+        return redirect(url_for('job_status', job_id=job_id))
+
+    job = jobqueue.get_job(job_id, jobs_db_path=JOBS_DB_PATH)
+    if job is None:
+        flash('Job not found!', 'error')
+        return redirect(url_for('jobs'))
+    return render_template('job.html', job=job, label=jobqueue.JOB_KINDS[job['kind']]['label'])
+
+def prepare_database():
+    """
+    Bring the primary database up to date and publish it if the snapshot is missing or
+    older. Runs when the app is imported, so `python app.py`, `flask run`, gunicorn and
+    asgi.py all start from a current snapshot (scripts that wrote to zines.db since the
+    last publish are picked up here too).
+    """
+    if CATALOG_PATH or not os.path.exists(DB_PATH):
+        return
+    # Make sure every change is captured for /changes, and the issue page's indexes and
+    # the bulk edit journal exist, so GET requests never write (all no-ops once installed)
+    conn = dedupe.register_content_hash(sqlite3.connect(DB_PATH))
+    try:
+        changelog.ensure_change_log(conn)
+        createdb.create_lookup_indexes(conn.cursor())
+        bulkedit.ensure_bulk_tables(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    if publish.snapshot_is_stale(DB_PATH, SNAPSHOT_PATH):
+        snapshot_publisher.publish_now()
+
+prepare_database()
+
 if __name__ == '__main__':
     # Start the Flask development server
     # Parameters explained:
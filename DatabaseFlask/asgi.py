@@ -0,0 +1,208 @@
+"""
+Async (ASGI) read path for the browse, search, issue and event pages.
+
+Flask handlers are synchronous, so every page view holds a worker until its queries
+finish. This module serves the read-only pages from one event loop instead:
+the home page (browse, search, sorting and paging), /event/<id>, /issue/<id> and
+/api/issue/<id>. It uses the same queries (load_index_context, EVENT_QUERY,
+ISSUE_QUERY from app.py) and the same templates, so pages look and behave the same.
+
+SQLite calls block, so each page's queries and rendering run on a small thread pool.
+Each thread keeps one read connection from get_db_connection() and reopens it when
+publish.py swaps in a new snapshot. At most POOL_SIZE pages touch the database at
+once; further requests wait as coroutines rather than as threads or processes, so a
+single process holds thousands of concurrent readers.
+
+Any other path (forms, edits, jobs, ...) is passed to the Flask app when asgiref is
+installed; otherwise run app.py next to this and route writes to it.
+
+Run with any ASGI server, from the DatabaseFlask folder:
+    uvicorn asgi:app --port 5002
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from jinja2 import Environment, select_autoescape
+from werkzeug.datastructures import MultiDict
+
+import app as flask_module
+from app import EVENT_QUERY, ISSUE_QUERY, get_db_connection, load_index_context
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    fallback_app = WsgiToAsgi(flask_module.app)
+except ImportError:
+    fallback_app = None
+
+# Pages allowed to query SQLite at the same time (one pooled thread and connection each)
+POOL_SIZE = int(os.environ.get('ZINES_ASGI_POOL_SIZE', 8))
+
+# Failed pages are logged with their traceback (the ASGI server's logging config applies)
+logger = logging.getLogger(__name__)
+
+
+def _snapshot_identity():
+    """Changes whenever publish.py replaces the snapshot file (it is renamed into place)."""
+    if flask_module.CATALOG_PATH or not os.path.exists(flask_module.SNAPSHOT_PATH):
+        return None  # shards and the primary are read live
+    stat = os.stat(flask_module.SNAPSHOT_PATH)
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+class ReadPool:
+    """Thread pool where each thread owns one read connection, with bounded concurrency."""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='sqlite-read')
+        self.local = threading.local()
+        self.semaphore = None  # created on first use, inside the server's event loop
+
+    def _connection(self):
+        identity = _snapshot_identity()
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None and self.local.identity != identity:
+            conn.close()  # an immutable connection would keep reading the old snapshot
+            conn = None
+        if conn is None:
+            conn = get_db_connection()
+            self.local.conn, self.local.identity = conn, identity
+        return conn
+
+    def _call(self, function, args):
+        return function(self._connection(), *args)
+
+    async def run(self, function, *args):
+        """Run function(conn, *args) on a pooled thread and wait for it without blocking the loop."""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.size)
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, function, args)
+
+
+pool = ReadPool()
+
+
+def _url_for(endpoint, **values):
+    """url_for for templates rendered outside a Flask request, built from the Flask app's routes."""
+    return flask_module.app.url_map.bind('localhost').build(endpoint, values)
+
+
+templates = Environment(loader=flask_module.app.jinja_loader, autoescape=select_autoescape(['html']))
+templates.globals.update(url_for=_url_for, get_flashed_messages=lambda **kwargs: [])
+
+
+class _Request:
+    """The part of Flask's request the templates use (request.args)."""
+
+    def __init__(self, args):
+        self.args = args
+
+
+# --- page functions: run on a pool thread with its connection ---
+
+def _index_page(conn, args):
+    context = load_index_context(conn, args)
+    return templates.get_template('index.html').render(request=_Request(args), **context)
+
+
+def _event_page(conn, event_id):
+    record = conn.execute(EVENT_QUERY + ' WHERE e.event_id = ?', (event_id,)).fetchone()
+    return None if record is None else templates.get_template('event.html').render(event=record)
+
+
+def _issue_json(conn, pub_id):
+    row = conn.execute(ISSUE_QUERY, (pub_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _issue_page(conn, pub_id):
+    issue_json = _issue_json(conn, pub_id)
+    return None if issue_json is None else templates.get_template('issue.html').render(issue=json.loads(issue_json))
+
+
+# Routes served here: path pattern -> (page function, content type)
+ROUTES = [
+    (re.compile(r'/'), _index_page, 'text/html; charset=utf-8'),
+    (re.compile(r'/event/(\d+)'), _event_page, 'text/html; charset=utf-8'),
+    (re.compile(r'/issue/(\d+)'), _issue_page, 'text/html; charset=utf-8'),
+    (re.compile(r'/api/issue/(\d+)'), _issue_json, 'application/json'),
+]
+
+
+async def _respond(send, status, body, content_type='text/plain; charset=utf-8', headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode('latin-1'))] + list(headers)})
+    await send({'type': 'http.response.body', 'body': body.encode('utf-8')})
+
+
+async def app(scope, receive, send):
+    """The ASGI application."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                pool.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+    if scope['method'] in ('GET', 'HEAD'):
+        for pattern, page, content_type in ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match:
+                await _serve(scope, send, page, content_type, match)
+                return
+    if fallback_app is not None:
+        await fallback_app(scope, receive, send)
+    else:
+        await _respond(send, 404, 'Not found here: forms and edits are served by app.py.')
+
+
+async def _serve(scope, send, page, content_type, match):
+    if match.groups():
+        argument = int(match.group(1))
+    else:
+        argument = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    try:
+        body = await pool.run(page, argument)
+    except sqlite3.OperationalError as e:
+        if 'locked' in str(e) or 'busy' in str(e):
+            await _respond(send, 503, json.dumps({'error': 'The database is busy, please try again.'}),
+                           'application/json', [(b'retry-after', b'1')])
+            return
+        logger.exception('Database error serving %s', scope.get('path'))
+        await _respond(send, 500, 'Internal Server Error')
+        return
+    except Exception:
+        logger.exception('Error serving %s', scope.get('path'))
+        await _respond(send, 500, 'Internal Server Error')
+        return
+
+    if body is None:
+        if content_type == 'application/json':
+            await _respond(send, 404, json.dumps({'error': f'No publication with id {argument}'}), content_type)
+        else:
+            # Like the Flask pages: a missing record sends you back to the home page
+            await _respond(send, 302, '', headers=[(b'location', _url_for('index').encode('latin-1'))])
+        return
+    await _respond(send, 200, body, content_type)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Install an ASGI server (pip install uvicorn) and run: uvicorn asgi:app --port 5002")
+    uvicorn.run(app, host='0.0.0.0', port=5002)
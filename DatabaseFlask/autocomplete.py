@@ -0,0 +1,149 @@
+"""
+Prefix autocomplete for the event and publication forms.
+
+Every suggestable value (publications, places, event types, source publications,
+event titles) is kept in memory as a sorted list of lowercase keys, and a prefix
+lookup is two binary searches (bisect) into that list, so suggestions come back in
+well under a millisecond however many rows there are. Every word of a value is a
+key, so "fran" finds "San Francisco".
+
+The lists are rebuilt when the data changes: at most once a second a lookup checks
+the database's version (change_log epoch and latest seq plus the highest id in each table) and
+rebuilds everything if it moved.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+import changelog
+
+# How often (seconds) a lookup may check whether the data changed
+VERSION_CHECK_INTERVAL = 1.0
+
+# Rows for each field: (value filled into the form, label shown, how often it's used).
+# Combined event types are split so each type is suggested on its own.
+FIELD_QUERIES = {
+    'publication': '''
+        SELECT pub_id, pub_title || ' Vol. ' || volume || ', No. ' || issue_number || ' (ID ' || pub_id || ')', 1
+        FROM publications
+    ''',
+    'pub_title': 'SELECT pub_title, pub_title, COUNT(*) FROM publications GROUP BY pub_title',
+    'event_title': 'SELECT event_title, event_title, COUNT(*) FROM events GROUP BY event_title',
+    'city': '''
+        SELECT city, city, COUNT(*) FROM (SELECT city FROM events UNION ALL SELECT city FROM resources)
+        GROUP BY city
+    ''',
+    'state': '''
+        SELECT state, state, COUNT(*) FROM (SELECT state FROM events UNION ALL SELECT state FROM resources)
+        GROUP BY state
+    ''',
+    'country': '''
+        SELECT country, country, COUNT(*) FROM (SELECT country FROM events UNION ALL SELECT country FROM resources)
+        GROUP BY country
+    ''',
+    'source_publication': '''
+        SELECT source_publication, source_publication, COUNT(*) FROM (
+            SELECT source_publication FROM events UNION ALL SELECT source_publication FROM resources
+        )
+        GROUP BY source_publication
+    ''',
+    'event_type': '''
+        WITH RECURSIVE split(event_type, rest) AS (
+            SELECT '', event_type || ',' FROM events
+            UNION ALL
+            SELECT TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1)), SUBSTR(rest, INSTR(rest, ',') + 1)
+            FROM split WHERE rest != ''
+        )
+        SELECT event_type, event_type, COUNT(*) FROM split WHERE event_type != '' GROUP BY event_type
+    ''',
+}
+
+# Placeholder values that shouldn't be suggested
+IGNORED_VALUES = {'', 'NA', 'N/A'}
+
+
+class PrefixIndex:
+    """Sorted (key, entry number) pairs for one field, searched with bisect."""
+
+    def __init__(self, rows):
+        self.entries = []
+        pairs = []
+        for value, label, count in rows:
+            if value is None or str(value).strip() in IGNORED_VALUES:
+                continue
+            number = len(self.entries)
+            self.entries.append({'value': value, 'label': label, 'count': count})
+            words = str(label).lower().split()
+            # The whole label, then the label from each later word on ("san francisco", "francisco")
+            for start in range(len(words)):
+                pairs.append((' '.join(words[start:]), number))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.numbers = [number for _, number in pairs]
+
+    def lookup(self, prefix, limit=10):
+        """The most used entries with a word starting with prefix (case-insensitive)."""
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\U0010ffff', lo=start)
+        matches = {self.numbers[position] for position in range(start, end)}
+        best = heapq.nsmallest(limit, matches,
+                               key=lambda number: (-self.entries[number]['count'], str(self.entries[number]['label'])))
+        return [self.entries[number] for number in best]
+
+
+class Autocomplete:
+    """
+    All prefix indexes for the forms, kept up to date with the database.
+
+    Args:
+        connect: Function returning a new database connection (the app's get_db_connection).
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.indexes = {}
+        self.version = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _data_version(self, conn):
+        """Changes whenever rows are added, edited or deleted (cheap: primary key and seq lookups)."""
+        return (changelog.log_epoch(conn), changelog.current_seq(conn)) + tuple(conn.execute('''
+            SELECT (SELECT MAX(event_id) FROM events), (SELECT MAX(pub_id) FROM publications),
+                   (SELECT MAX(resource_id) FROM resources)
+        ''').fetchone())
+
+    def refresh(self, force=False):
+        """Rebuild the indexes if the data changed since they were built."""
+        if not force and time.monotonic() - self.checked_at < VERSION_CHECK_INTERVAL:
+            return
+        with self.lock:
+            conn = self.connect()
+            try:
+                version = self._data_version(conn)
+                self.checked_at = time.monotonic()
+                if version == self.version and not force:
+                    return
+                # Build the new set completely, then swap it in for lookups
+                self.indexes = {field: PrefixIndex(conn.execute(query).fetchall())
+                                for field, query in FIELD_QUERIES.items()}
+                self.version = version
+            finally:
+                conn.close()
+
+    def suggest(self, field, prefix, limit=10):
+        """
+        Suggestions for a form field.
+
+        Returns:
+            list: Dicts with value, label and count, most used first
+        """
+        if field not in FIELD_QUERIES:
+            raise ValueError(f"Unknown field '{field}'. Choose from: {', '.join(FIELD_QUERIES)}")
+        self.refresh()
+        return self.indexes[field].lookup(prefix, limit)
@@ -0,0 +1,292 @@
+"""
+Faceted counts for the home page's event filters.
+
+Next to each filter value the browse page shows how many events it would leave
+("Protest Report (1,204)"). Asking SQLite means one GROUP BY per facet on every page
+view. Instead, every value of every facet (event type, state, country, year and
+publication title) has a bitmap with one bit per event, packed eight events to a byte:
+
+- the events matching the current filters are the AND of the selected values' bitmaps
+  (and of the title search and city, checked once per distinct value)
+- a facet's counts are that AND, minus the facet's own filter, ANDed with all of its
+  value bitmaps at once (one 2-D array per facet) and popcounted
+
+Edits only flip the bits of the changed events: the index follows change_log like
+readmodel.py, and reloads databases without one (sharded mode) when their row counts
+or ids change.
+"""
+
+import threading
+
+import numpy as np
+
+import changelog
+from readmodel import COMPACT_THRESHOLD, Column, event_year, fold_case, title_matcher
+
+# Facets counted on the home page, in the order they are shown
+FACETS = ['event_type', 'state', 'country', 'year', 'publication']
+
+LOAD_QUERY = '''
+    SELECT event_id, publication_id, event_type, state, country, event_date, event_title, city
+    FROM events
+'''
+
+
+def _pack(mask):
+    return np.packbits(mask, bitorder='little')
+
+
+class FacetIndex:
+    """
+    Per-value bitmaps for each facet, one bit per event slot.
+    Loaded on the first refresh(conn) with a connection from the app's get_db_connection.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+
+    # --- loading and refreshing ---
+
+    def _load(self, conn):
+        rows = conn.execute(LOAD_QUERY).fetchall()
+        self.size = len(rows)
+        # Room to grow before the arrays have to be copied (whole 64-bit words, see counts())
+        self.capacity = max(64, (self.size * 5 // 4 + 63) // 64 * 64)
+        self.event_ids = np.zeros(self.capacity, dtype=np.int64)
+        self.event_ids[:self.size] = [row[0] for row in rows]
+        self.publication_ids = np.full(self.capacity, -1, dtype=np.int64)
+        self.publication_ids[:self.size] = [-1 if row[1] is None else row[1] for row in rows]
+        self.publication_titles = dict(conn.execute('SELECT pub_id, pub_title FROM publications').fetchall())
+        self.slot_by_id = {row[0]: slot for slot, row in enumerate(rows)}
+
+        values = {
+            'event_type': [row[2] for row in rows],
+            'state': [row[3] for row in rows],
+            'country': [row[4] for row in rows],
+            'year': [event_year(row[5]) for row in rows],
+            'publication': [self.publication_titles.get(row[1]) for row in rows],
+            'event_title': [row[6] for row in rows],
+            'city': [row[7] for row in rows],
+        }
+        self.columns = {}
+        for name, column_values in values.items():
+            column = Column(column_values, sortable=False)
+            column.codes = np.pad(column.codes, (0, self.capacity - self.size))
+            self.columns[name] = column
+        self._lower_titles = None
+
+        active = np.zeros(self.capacity, dtype=bool)
+        active[:self.size] = True
+        self.active = _pack(active)
+        self.bitmaps = {}
+        for facet in FACETS:
+            column = self.columns[facet]
+            matrix = np.zeros((len(column.values), self.capacity // 8), dtype=np.uint8)
+            # Slots grouped by value, so each value's bitmap is set from its own slots only
+            codes = column.codes[:self.size]
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(column.values) + 1))
+            scratch = np.zeros(self.capacity, dtype=bool)
+            for code in range(len(column.values)):
+                slots = order[bounds[code]:bounds[code + 1]]
+                scratch[slots] = True
+                matrix[code] = _pack(scratch)
+                scratch[slots] = False
+            self.bitmaps[facet] = matrix
+
+        self.seq = changelog.current_seq(conn)
+        self.epoch = changelog.log_epoch(conn)
+        self.version = self._fallback_version(conn)
+        self.loaded = True
+
+    def _fallback_version(self, conn):
+        """Row counts and highest ids, for databases without a change_log."""
+        if changelog.has_change_log(conn):
+            return None
+        return tuple(conn.execute('''
+            SELECT (SELECT COUNT(*) FROM events), (SELECT MAX(event_id) FROM events),
+                   (SELECT COUNT(*) FROM publications), (SELECT MAX(pub_id) FROM publications)
+        ''').fetchone())
+
+    def _grow(self):
+        """Double the slot capacity."""
+        extra = self.capacity
+        self.capacity *= 2
+        self.event_ids = np.pad(self.event_ids, (0, extra))
+        self.publication_ids = np.pad(self.publication_ids, (0, extra), constant_values=-1)
+        for column in self.columns.values():
+            column.codes = np.pad(column.codes, (0, extra))
+        self.active = np.pad(self.active, (0, extra // 8))
+        for facet in FACETS:
+            self.bitmaps[facet] = np.pad(self.bitmaps[facet], ((0, 0), (0, extra // 8)))
+
+    @staticmethod
+    def _set_bit(bitmap, slot, on):
+        if on:
+            bitmap[slot >> 3] |= np.uint8(1 << (slot & 7))
+        else:
+            bitmap[slot >> 3] &= np.uint8(0xFF ^ (1 << (slot & 7)))
+
+    def _assign(self, facet, slot, value):
+        """Give a slot its value for a facet (a new value gets a new, empty bitmap first)."""
+        column = self.columns[facet]
+        known = len(column.values)
+        column.set([slot], [value])
+        if len(column.values) != known:
+            self.bitmaps[facet] = np.vstack([self.bitmaps[facet], np.zeros((1, self.capacity // 8), dtype=np.uint8)])
+        self._set_bit(self.bitmaps[facet][column.codes[slot]], slot, True)
+
+    def _unassign(self, facet, slot):
+        self._set_bit(self.bitmaps[facet][self.columns[facet].codes[slot]], slot, False)
+
+    def _fill_slot(self, slot, row):
+        publication_id = row['publication_id']
+        self.publication_ids[slot] = -1 if publication_id is None else publication_id
+        self._assign('event_type', slot, row['event_type'])
+        self._assign('state', slot, row['state'])
+        self._assign('country', slot, row['country'])
+        self._assign('year', slot, event_year(row['event_date']))
+        self._assign('publication', slot, self.publication_titles.get(publication_id))
+        self.columns['event_title'].set([slot], [row['event_title']])
+        self.columns['city'].set([slot], [row['city']])
+        self._set_bit(self.active, slot, True)
+
+    def _rename_publication(self, pub_id, title):
+        """Move a publication's events to the bitmap of its new title."""
+        self.publication_titles[pub_id] = title
+        for slot in np.flatnonzero(self.publication_ids[:self.size] == pub_id):
+            slot = int(slot)
+            if self.slot_by_id.get(int(self.event_ids[slot])) == slot:  # skip deleted events' slots
+                self._unassign('publication', slot)
+                self._assign('publication', slot, title)
+
+    def _apply(self, changes):
+        """Apply a batch from changelog.read_changes."""
+        events = {}
+        for change in changes:
+            if change['table'] == 'publications':
+                if change['row'] is None:
+                    self.publication_titles.pop(change['id'], None)  # its events are deleted with it
+                elif self.publication_titles.get(change['id']) != change['row']['pub_title']:
+                    self._rename_publication(change['id'], change['row']['pub_title'])
+            elif change['table'] == 'events':
+                events[change['id']] = change['row']
+        self._lower_titles = None
+
+        for event_id, row in events.items():
+            slot = self.slot_by_id.get(event_id)
+            if slot is not None:
+                # Edited in place: clear the old values first
+                self._set_bit(self.active, slot, False)
+                for facet in FACETS:
+                    self._unassign(facet, slot)
+            if row is None:
+                self.slot_by_id.pop(event_id, None)
+                continue
+            if slot is None:
+                if self.size == self.capacity:
+                    self._grow()
+                slot = self.size
+                self.size += 1
+                self.event_ids[slot] = event_id
+                self.slot_by_id[event_id] = slot
+            self._fill_slot(slot, row)
+
+    def refresh(self, conn):
+        """
+        Bring the bitmaps up to date with the database conn reads (cheap when nothing
+        changed: one primary-key lookup on change_log).
+        """
+        with self.lock:
+            if not self.loaded:
+                self._load(conn)
+                return
+            if not changelog.has_change_log(conn):
+                if self._fallback_version(conn) != self.version:
+                    self._load(conn)
+                return
+            latest_seq = changelog.current_seq(conn)
+            if changelog.log_epoch(conn) != self.epoch or latest_seq < self.seq or latest_seq - self.seq > self.size * COMPACT_THRESHOLD:
+                self._load(conn)  # rebuilt, or a large import: reloading is quicker than bit by bit
+                return
+            while self.seq < latest_seq:
+                batch = changelog.read_changes(conn, self.seq)
+                if not batch:
+                    break
+                self._apply(batch)
+                self.seq = batch[-1]['seq']
+            if self.size and 1 - len(self.slot_by_id) / self.size > COMPACT_THRESHOLD:
+                self._load(conn)
+
+    # --- counting ---
+
+    def _column_mask(self, column_name, matching):
+        """Packed bitmap of the slots whose value's code is True in matching."""
+        mask = np.zeros(self.capacity, dtype=bool)
+        mask[:self.size] = matching[self.columns[column_name].codes[:self.size]]
+        return _pack(mask)
+
+    def _search_mask(self, search):
+        """Titles matching LIKE '%search%', wildcards included (NULL titles never match)."""
+        titles = self.columns['event_title']
+        if self._lower_titles is None:
+            self._lower_titles = [None if value is None else fold_case(str(value)) for value in titles.values]
+        matches = title_matcher(search)
+        matching = np.fromiter((title is not None and matches(title) for title in self._lower_titles),
+                               dtype=bool, count=len(self._lower_titles))
+        return self._column_mask('event_title', matching)
+
+    def _city_mask(self, city):
+        column = self.columns['city']
+        matching = np.zeros(len(column.values), dtype=bool)
+        if city in column.lookup:
+            matching[column.lookup[city]] = True
+        return self._column_mask('city', matching)
+
+    def _value_bitmap(self, facet, value):
+        code = self.columns[facet].lookup.get(value)
+        return self.bitmaps[facet][code] if code is not None else np.zeros(self.capacity // 8, dtype=np.uint8)
+
+    def counts(self, search='', filters=None):
+        """
+        Counts of every facet value among the events matching the search and filters.
+        Each facet is counted with every filter but its own, so the other values of a
+        selected facet show how many events choosing them instead would give.
+
+        Args:
+            search (str): Title search, as in the events table.
+            filters (dict): Selected values by name: facets plus 'city'.
+
+        Returns:
+            tuple: ({facet: [(value, count), ...] by count, then value; blank values are
+            left out, as they can't be selected}, total matching events)
+        """
+        filters = {name: value for name, value in (filters or {}).items() if value not in (None, '')}
+        with self.lock:
+            base = self.active
+            if search or None in self.columns['event_title'].lookup:
+                base = base & self._search_mask(search)
+            if 'city' in filters:
+                base = base & self._city_mask(filters['city'])
+            selected = {facet: self._value_bitmap(facet, filters[facet]) for facet in FACETS if facet in filters}
+
+            results = {}
+            for facet in FACETS:
+                mask = base
+                for other, bitmap in selected.items():
+                    if other != facet:
+                        mask = mask & bitmap
+                # Every value of the facet at once: (values x words) AND, popcount, sum per row
+                words = self.bitmaps[facet].view(np.uint64) & mask.view(np.uint64)
+                counts = np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+                values = self.columns[facet].values
+                results[facet] = sorted(
+                    ((values[code], int(count)) for code, count in enumerate(counts)
+                     if values[code] not in (None, '') and (count or values[code] == filters.get(facet))),
+                    key=lambda item: (-item[1], str(item[0])))
+
+            total = base
+            for bitmap in selected.values():
+                total = total & bitmap
+            return results, int(np.bitwise_count(total.view(np.uint64)).sum(dtype=np.int64))
@@ -0,0 +1,346 @@
+"""
+In-memory columnar read model for the home page's events table.
+
+index() sorts with ORDER BY <column>, which is a full sort in SQLite on every page
+view. With the read model turned on (ZINES_READ_MODEL=1), events joined with their
+publication titles are loaded once into NumPy columns instead:
+
+- every text column is interned: an int32 code per row plus one list of distinct values
+- each distinct value has a sort rank, so comparing two rows is comparing two integers
+- a sort permutation (row numbers in order) is kept for every sortable column
+
+A page is then a slice of a permutation, however many events there are. A search
+(event_title LIKE '%text%', wildcards included) checks each distinct title once and
+filters the permutation.
+
+On every request the model compares the database's change_log seq with its own and
+applies just the changed rows: new or edited rows are inserted into each permutation
+at their sorted position (a binary search), deleted rows are taken out. Databases
+without a change_log (sharded mode) are reloaded when their row counts or ids change.
+"""
+
+import bisect
+import re
+import string
+import threading
+
+import numpy as np
+import pandas as pd
+
+import changelog
+
+# Columns the home page can sort by
+SORT_COLUMNS = ['event_title', 'event_date', 'city', 'state', 'country', 'event_type']
+
+# Columns of each event row handed to the template (as in load_index_context's query)
+TEXT_COLUMNS = SORT_COLUMNS + ['description', 'location', 'address', 'source_publication']
+
+LOAD_QUERY = '''
+    SELECT event_id, publication_id, event_title, event_date, city, state, country, event_type,
+           description, location, address, source_publication
+    FROM events
+'''
+
+# Filters the page can narrow the events by (the home page's facets plus city)
+FILTER_COLUMNS = ['event_type', 'state', 'country', 'city']
+
+# Rebuild from scratch once more than this share of row slots belongs to deleted rows
+COMPACT_THRESHOLD = 0.25
+
+# SQLite's LIKE ignores case for ASCII letters only
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def event_year(event_date):
+    """An event's year: the date's first four characters if they are digits (substr(event_date, 1, 4) in SQL)."""
+    if event_date is None:
+        return None
+    prefix = str(event_date)[:4]
+    return prefix if len(prefix) == 4 and prefix.isdigit() else None
+
+
+def fold_case(text):
+    """Lowercase ASCII letters only, as LIKE compares them."""
+    return text.translate(_ASCII_LOWER)
+
+
+def title_matcher(search):
+    """
+    A function telling whether a title (already passed through fold_case) matches
+    event_title LIKE '%search%' as SQLite evaluates it: % in the search is any run of
+    characters and _ any single character.
+    """
+    needle = fold_case(search)
+    if '%' not in needle and '_' not in needle:
+        return lambda title: needle in title
+    pattern = re.compile(''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char)
+                                 for char in needle), re.DOTALL)
+    return lambda title: pattern.search(title) is not None
+
+
+def _sort_key(value):
+    """SQLite's ORDER BY order: NULL, then numbers, then text, then blobs."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, bytes(value))
+
+
+class Column:
+    """
+    One interned column: int32 codes per row and the distinct values, plus each value's
+    sort rank for sortable columns.
+    """
+
+    def __init__(self, values, sortable=True):
+        self.sortable = sortable
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        self.values = list(uniques)
+        self.lookup = {value: code for code, value in enumerate(self.values)}
+        codes = codes.astype(np.int32)
+        if (codes < 0).any():
+            codes[codes < 0] = self._code(None)
+        self.codes = codes
+        self._rank()
+
+    def _code(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def _rank(self):
+        if not self.sortable:
+            return
+        if all(isinstance(value, str) for value in self.values):
+            # The usual case, sorted by NumPy (code point order, the same as SQLite's BINARY collation)
+            order = np.argsort(np.array(self.values, dtype=str), kind='stable')
+        else:
+            order = sorted(range(len(self.values)), key=lambda code: _sort_key(self.values[code]))
+        self.order = [int(code) for code in order]  # codes in sort order
+        self.rank = np.empty(len(self.values), dtype=np.int64)
+        self.rank[order] = np.arange(len(order))
+
+    def _rank_new(self, code):
+        """Give a new value its rank: one binary search, then shift the ranks above it."""
+        key = _sort_key(self.values[code])
+        position = bisect.bisect_left(self.order, key, key=lambda other: _sort_key(self.values[other]))
+        self.order.insert(position, code)
+        self.rank[self.rank >= position] += 1
+        self.rank = np.append(self.rank, position)
+
+    def set(self, rows, values):
+        """
+        Store values for these rows (appending slots as needed); re-rank if a value is new.
+
+        Returns:
+            bool: True if the ranks changed
+        """
+        known = len(self.values)
+        codes = [self._code(value) for value in values]
+        reranked = len(self.values) != known
+        if reranked and self.sortable:
+            # Existing values keep their relative order, so existing permutations stay sorted
+            for code in range(known, len(self.values)):
+                self._rank_new(code)
+        needed = max(rows, default=-1) + 1
+        if needed > len(self.codes):
+            self.codes = np.concatenate([self.codes, np.zeros(needed - len(self.codes), dtype=np.int32)])
+        self.codes[rows] = codes
+        return reranked
+
+    def get(self, row):
+        return self.values[self.codes[row]]
+
+
+class EventReadModel:
+    """
+    The events table as columns with a sort permutation per sortable column.
+    Loaded on the first refresh(conn) with a connection from the app's get_db_connection.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+
+    # --- loading and refreshing ---
+
+    def _load(self, conn):
+        rows = conn.execute(LOAD_QUERY).fetchall()
+        self.event_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.publication_ids = np.array([-1 if row[1] is None else row[1] for row in rows], dtype=np.int64)
+        self.columns = {name: Column([row[2 + number] for row in rows], sortable=name in SORT_COLUMNS)
+                        for number, name in enumerate(TEXT_COLUMNS)}
+        self.active = np.ones(len(rows), dtype=bool)
+        self.row_by_id = {int(event_id): row for row, event_id in enumerate(self.event_ids)}
+        self.publication_titles = dict(conn.execute('SELECT pub_id, pub_title FROM publications').fetchall())
+        # Sort by (rank, row number): stable, so equal values keep table order like SQLite's scan
+        self.permutations = {name: np.lexsort((np.arange(len(rows)), self.columns[name].rank[self.columns[name].codes]))
+                             .astype(np.int64) for name in SORT_COLUMNS}
+        self.sorted_keys = {name: self._sort_keys(name, self.permutations[name]) for name in SORT_COLUMNS}
+        self._lower_titles = None
+        self.seq = changelog.current_seq(conn)
+        self.epoch = changelog.log_epoch(conn)
+        self.version = self._fallback_version(conn)
+        self.loaded = True
+
+    def _fallback_version(self, conn):
+        """Row counts and highest ids, for databases without a change_log."""
+        if changelog.has_change_log(conn):
+            return None
+        return tuple(conn.execute('''
+            SELECT (SELECT COUNT(*) FROM events), (SELECT MAX(event_id) FROM events),
+                   (SELECT COUNT(*) FROM publications), (SELECT MAX(pub_id) FROM publications)
+        ''').fetchone())
+
+    def _sort_keys(self, name, rows):
+        """
+        (rank, row) packed into one int64 per row, the order each permutation is kept in
+        (sorted_keys holds them for the permutation, so updates can binary search it).
+        """
+        return self.columns[name].rank[self.columns[name].codes[rows]] * (1 << 32) + rows
+
+    def _remove_rows(self, rows):
+        if not len(rows):
+            return
+        self.active[rows] = False
+        for name in SORT_COLUMNS:
+            # Removed rows keep their codes (edits get a new slot), so their keys still find them
+            positions = np.searchsorted(self.sorted_keys[name], self._sort_keys(name, rows))
+            self.permutations[name] = np.delete(self.permutations[name], positions)
+            self.sorted_keys[name] = np.delete(self.sorted_keys[name], positions)
+
+    def _insert_rows(self, rows):
+        if not len(rows):
+            return
+        for name in SORT_COLUMNS:
+            new_keys = self._sort_keys(name, rows)
+            order = np.argsort(new_keys)
+            positions = np.searchsorted(self.sorted_keys[name], new_keys[order])
+            self.permutations[name] = np.insert(self.permutations[name], positions, rows[order])
+            self.sorted_keys[name] = np.insert(self.sorted_keys[name], positions, new_keys[order])
+
+    def _apply(self, changes):
+        """Apply a batch from changelog.read_changes."""
+        latest = {}
+        for change in changes:
+            if change['table'] == 'publications':
+                if change['row'] is None:
+                    self.publication_titles.pop(change['id'], None)
+                else:
+                    self.publication_titles[change['id']] = change['row']['pub_title']
+            elif change['table'] == 'events':
+                latest[change['id']] = change['row']
+        if not latest:
+            return
+
+        # Edited and deleted rows leave the permutations; edited and new rows go back in
+        old_rows = np.array([self.row_by_id.pop(event_id) for event_id in latest if event_id in self.row_by_id],
+                            dtype=np.int64)
+        self._remove_rows(old_rows)
+        new_rows = [(event_id, row) for event_id, row in latest.items() if row is not None]
+        if not new_rows:
+            return
+        first = len(self.event_ids)
+        slots = list(range(first, first + len(new_rows)))
+        self.event_ids = np.concatenate([self.event_ids, [event_id for event_id, _ in new_rows]])
+        self.publication_ids = np.concatenate([self.publication_ids, [
+            -1 if row['publication_id'] is None else row['publication_id'] for _, row in new_rows]])
+        self.active = np.concatenate([self.active, np.ones(len(new_rows), dtype=bool)])
+        for (event_id, _), slot in zip(new_rows, slots):
+            self.row_by_id[event_id] = slot
+        for name in TEXT_COLUMNS:
+            if self.columns[name].set(slots, [row[name] for _, row in new_rows]) and name in SORT_COLUMNS:
+                # New ranks: same order, different numbers, so recompute the kept keys
+                self.sorted_keys[name] = self._sort_keys(name, self.permutations[name])
+        self._lower_titles = None
+        self._insert_rows(np.array(slots, dtype=np.int64))
+
+    def refresh(self, conn):
+        """
+        Bring the model up to date with the database conn reads (cheap when nothing changed:
+        one primary-key lookup on change_log).
+        """
+        with self.lock:
+            if not self.loaded:
+                self._load(conn)
+                return
+            if not changelog.has_change_log(conn):
+                if self._fallback_version(conn) != self.version:
+                    self._load(conn)
+                return
+            latest_seq = changelog.current_seq(conn)
+            if changelog.log_epoch(conn) != self.epoch or latest_seq < self.seq:
+                self._load(conn)  # the database was rebuilt
+                return
+            while self.seq < latest_seq:
+                batch = changelog.read_changes(conn, self.seq)
+                if not batch:
+                    break
+                self._apply(batch)
+                self.seq = batch[-1]['seq']
+            if 1 - self.active.mean() > COMPACT_THRESHOLD:
+                self._load(conn)
+
+    # --- queries ---
+
+    def _matching_rows(self, search):
+        """
+        Boolean mask of rows whose title matches LIKE '%search%' (see title_matcher; a
+        NULL title never matches, even an empty search).
+        """
+        titles = self.columns['event_title']
+        if self._lower_titles is None:
+            self._lower_titles = [None if value is None else fold_case(str(value)) for value in titles.values]
+        matches = title_matcher(search)
+        matching = np.fromiter((title is not None and matches(title) for title in self._lower_titles),
+                               dtype=bool, count=len(self._lower_titles))
+        return matching[titles.codes]
+
+    def _filter_mask(self, filters):
+        """Boolean mask of rows with every filter's value (filters: FILTER_COLUMNS plus year and publication)."""
+        mask = np.ones(len(self.event_ids), dtype=bool)
+        for name in FILTER_COLUMNS:
+            if name in filters:
+                column = self.columns[name]
+                code = column.lookup.get(filters[name])
+                mask &= column.codes == (code if code is not None else -1)
+        if 'year' in filters:
+            dates = self.columns['event_date']
+            in_year = np.array([event_year(value) == filters['year'] for value in dates.values], dtype=bool)
+            mask &= in_year[dates.codes]
+        if 'publication' in filters:
+            pub_ids = [pub_id for pub_id, title in self.publication_titles.items() if title == filters['publication']]
+            mask &= np.isin(self.publication_ids, pub_ids)
+        return mask
+
+    def page(self, sort, order, search, limit, offset, filters=None):
+        """
+        One page of events in the same shape as load_index_context's query.
+
+        Returns:
+            tuple: (list of row dicts, total number of matching events)
+        """
+        with self.lock:
+            permutation = self.permutations[sort]
+            if order.lower() == 'desc':
+                permutation = permutation[::-1]
+            if search or None in self.columns['event_title'].lookup or filters:
+                mask = self._matching_rows(search)
+                if filters:
+                    mask &= self._filter_mask(filters)
+                permutation = permutation[mask[permutation]]
+            offset = max(offset, 0)  # SQLite treats a negative OFFSET as 0
+            rows = permutation[offset:offset + limit]
+            return [self._row(row) for row in rows], len(permutation)
+
+    def _row(self, row):
+        record = {'event_id': int(self.event_ids[row])}
+        for name in TEXT_COLUMNS:
+            record[name] = self.columns[name].get(row)
+        record['publication_title'] = self.publication_titles.get(int(self.publication_ids[row]))
+        return record
@@ -0,0 +1,233 @@
+"""
+Static export of the archive for the public read-only mirror.
+
+Renders the browse pages (index.html and its pagination), every issue page and every
+event page from the app's templates into plain HTML files, plus the issue and event
+data as JSON, under ../static_site/. Any web server can serve the result without
+touching a database.
+
+Each page's inputs (the rows it shows plus the template sources) are hashed and the
+hashes are kept in static_site/manifest.json. A rebuild after an edit re-renders only
+pages whose hash changed (the edited event's page, its issue page and the listing
+pages it appears on), and deletes pages that no longer exist. Pages are rendered in
+parallel worker processes.
+
+Run from the DatabaseFlask folder, like the app: python staticexport.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app import EVENT_QUERY, ISSUE_QUERY, get_db_connection
+
+# Where the site is written, and the URL it is served under (a folder on a web server)
+OUTPUT_DIR = '../static_site'
+BASE_URL = os.environ.get('ZINES_STATIC_BASE_URL', '/')
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Rows per listing page (the same as the app's index page)
+PER_PAGE = 10
+
+# Below this many changed pages, render in this process instead of starting workers
+PARALLEL_THRESHOLD = 50
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def static_path(endpoint, **values):
+    """
+    The file a page is written to, for the app endpoints the public pages link to.
+    Listings have one fixed order, so sort parameters are ignored.
+    """
+    if endpoint == 'index':
+        if int(values.get('page_events', 1)) > 1:
+            return f"browse/events-{values['page_events']}.html"
+        if int(values.get('page_publications', 1)) > 1:
+            return f"browse/publications-{values['page_publications']}.html"
+        return 'index.html'
+    if endpoint == 'issue':
+        return f"issue/{values['pub_id']}.html"
+    if endpoint == 'issue_api':
+        return f"api/issue/{values['pub_id']}.json"
+    if endpoint == 'event':
+        return f"event/{values['event_id']}.html"
+    raise ValueError(f"Page '{endpoint}' is not part of the static site")
+
+
+def static_url_for(endpoint, **values):
+    """url_for for static pages: links between the exported files."""
+    return BASE_URL + static_path(endpoint, **values)
+
+
+def _environment():
+    environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+    environment.globals.update(url_for=static_url_for, static_site=True)
+    return environment
+
+
+def _templates_digest():
+    """Hash of every template, so a template edit re-renders every page."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(TEMPLATE_DIR)):
+        with open(os.path.join(TEMPLATE_DIR, name), 'rb') as file:
+            digest.update(name.encode('utf-8') + file.read())
+    return digest.hexdigest()
+
+
+def _rows(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, values)) for values in cursor]
+
+
+def _listing_context(events, publications, page_events=1, page_publications=1):
+    """Template variables for index.html showing one page of each table."""
+    return {
+        'events': events[(page_events - 1) * PER_PAGE:page_events * PER_PAGE],
+        'publications': publications[(page_publications - 1) * PER_PAGE:page_publications * PER_PAGE],
+        'page_events': page_events,
+        'total_pages_events': max((len(events) + PER_PAGE - 1) // PER_PAGE, 1),
+        'page_publications': page_publications,
+        'total_pages_publications': max((len(publications) + PER_PAGE - 1) // PER_PAGE, 1),
+    }
+
+
+def collect_pages():
+    """
+    Read everything the site shows and describe every page.
+
+    Returns:
+        list: Dicts with path, template (None for JSON files) and context
+    """
+    conn = get_db_connection()
+    try:
+        events = _rows(conn.execute(EVENT_QUERY + ' ORDER BY e.event_title, e.event_id'))
+        publications = _rows(conn.execute('''
+            SELECT pub_id, pub_title, volume, issue_number, issue_date, author_org, location
+            FROM publications ORDER BY pub_title, pub_id
+        '''))
+        issues = [json.loads(conn.execute(ISSUE_QUERY, (publication['pub_id'],)).fetchone()[0])
+                  for publication in publications]
+    finally:
+        conn.close()
+
+    pages = [{'path': 'index.html', 'template': 'index.html', 'context': _listing_context(events, publications)}]
+    for page in range(2, (len(events) + PER_PAGE - 1) // PER_PAGE + 1):
+        pages.append({'path': static_path('index', page_events=page), 'template': 'index.html',
+                      'context': _listing_context(events, publications, page_events=page)})
+    for page in range(2, (len(publications) + PER_PAGE - 1) // PER_PAGE + 1):
+        pages.append({'path': static_path('index', page_publications=page), 'template': 'index.html',
+                      'context': _listing_context(events, publications, page_publications=page)})
+    for issue in issues:
+        pages.append({'path': static_path('issue', pub_id=issue['pub_id']), 'template': 'issue.html',
+                      'context': {'issue': issue}})
+        pages.append({'path': static_path('issue_api', pub_id=issue['pub_id']), 'template': None,
+                      'context': issue})
+    for event in events:
+        pages.append({'path': static_path('event', event_id=event['event_id']), 'template': 'event.html',
+                      'context': {'event': event}})
+        pages.append({'path': f"api/event/{event['event_id']}.json", 'template': None, 'context': event})
+    return pages
+
+
+def page_hash(page, templates_digest):
+    """Hash of everything that goes into a page."""
+    digest = hashlib.sha256(templates_digest.encode('utf-8'))
+    digest.update(json.dumps([page['path'], page['template'], page['context']], sort_keys=True,
+                             default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+_worker_environment = None
+
+
+def render_page(page, output_dir=OUTPUT_DIR):
+    """Render one page and write it under output_dir (through a temporary file, so readers never see half a page)."""
+    global _worker_environment
+    if page['template'] is None:
+        content = json.dumps(page['context'], ensure_ascii=False)
+    else:
+        if _worker_environment is None:
+            _worker_environment = _environment()
+        content = _worker_environment.get_template(page['template']).render(**page['context'])
+    path = os.path.join(output_dir, page['path'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+    return page['path']
+
+
+def _render_chunk(pages, output_dir):
+    return [render_page(page, output_dir) for page in pages]
+
+
+def export_site(output_dir=OUTPUT_DIR, workers=None, force=False):
+    """
+    Bring the static site up to date with the database.
+
+    Args:
+        output_dir (str): Folder the site is written to.
+        workers (int): Rendering processes (default: one per CPU).
+        force (bool): Re-render every page even if its hash is unchanged.
+
+    Returns:
+        dict: Counts of pages rendered, unchanged and removed
+    """
+    start = time.perf_counter()
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, 'r') as file:
+            previous = json.load(file)['pages']
+
+    templates_digest = _templates_digest()
+    pages = collect_pages()
+    hashes = {page['path']: page_hash(page, templates_digest) for page in pages}
+    changed = [page for page in pages
+               if previous.get(page['path']) != hashes[page['path']]
+               or not os.path.exists(os.path.join(output_dir, page['path']))]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(changed) >= PARALLEL_THRESHOLD:
+        # Hand pages to the workers in chunks so each process renders many per round trip
+        chunk_size = max(len(changed) // (workers * 4), 1)
+        chunks = [changed[index:index + chunk_size] for index in range(0, len(changed), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(_render_chunk, chunks, [output_dir] * len(chunks)):
+                pass
+    else:
+        _render_chunk(changed, output_dir)
+
+    removed = [path for path in previous if path not in hashes]
+    for path in removed:
+        if os.path.exists(os.path.join(output_dir, path)):
+            os.remove(os.path.join(output_dir, path))
+
+    # Written last: if the export stops early, the next run re-renders what it missed
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump({'pages': hashes}, file, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    counts = {'rendered': len(changed), 'unchanged': len(pages) - len(changed), 'removed': len(removed)}
+    print(f"✓ {counts['rendered']} pages rendered, {counts['unchanged']} unchanged, "
+          f"{counts['removed']} removed in {time.perf_counter() - start:.2f}s ({output_dir})")
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the archive as a static site.")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="folder to write the site to")
+    parser.add_argument('--workers', type=int, help="rendering processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="re-render every page")
+    args = parser.parse_args()
+
+    print("=== Exporting the Static Site ===")
+    export_site(args.output, args.workers, args.force)
@@ -0,0 +1,261 @@
+# Persistent Cache for Analysis Results
+# Re-running an analysis when the data hasn't changed repeats the query, the pandas
+# work and the plotting. Decorating an analysis function with @cached_analysis stores
+# everything it produced on disk: its return value (e.g. a DataFrame), what it printed,
+# and its figures as PNGs. The next call with the same arguments against the same data
+# replays the output and figures and returns the stored value right away.
+#
+# The cache key is the function (name and source code), the source of the helper
+# modules the analyses share (HELPER_MODULES), its arguments, and a cheap database
+# version: the latest change_log seq plus each table's row count and highest id.
+# Without a change_log, the database file's size and modification time are used.
+# Entries are kept in analysis_cache/ and evicted least-recently-used first once the
+# folder grows past MAX_CACHE_BYTES or MAX_ENTRIES.
+#
+# Set ZINES_ANALYSIS_CACHE=off to always run the analyses.
+
+import argparse
+import contextlib
+import functools
+import hashlib
+import importlib.util
+import inspect
+import io
+import json
+import os
+import pickle
+import sqlite3
+import sys
+
+import changelog
+
+# Path to the SQLite database the analyses read, and the cache folder (next to this
+# file, so report runs that chdir into their output folder share it)
+DB_PATH = 'zines.db'
+CACHE_DIR = os.environ.get('ZINES_ANALYSIS_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis_cache'))
+
+# Eviction limits
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+MAX_ENTRIES = 500
+
+# Bump to invalidate every entry when the stored format changes
+CACHE_FORMAT = 1
+
+# Modules the analyses call into: a change to any of them invalidates every entry
+HELPER_MODULES = ('locationqueries', 'reportrender', 'snapshot')
+
+
+def database_version(db_path=DB_PATH):
+    """
+    Cheap data version: change_log epoch and seq plus row count and highest id per table
+    (primary key lookups and count(*) on small tables). Opened through sqlite3.connect,
+    so reportrunner.py's read-only redirection applies here too.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        version = {'epoch': changelog.log_epoch(conn), 'seq': changelog.current_seq(conn)}
+        for table, primary_key in changelog.TRACKED_TABLES.items():
+            version[table] = list(conn.execute(f'SELECT COUNT(*), MAX({primary_key}) FROM {table}').fetchone())
+        if not changelog.has_change_log(conn):
+            # Updates don't change counts or ids, so fall back to the file itself
+            for _, name, path in conn.execute('PRAGMA database_list'):
+                if name == 'main' and path:
+                    stat = os.stat(path)
+                    version['file'] = [stat.st_size, stat.st_mtime_ns]
+        return version
+    finally:
+        conn.close()
+
+
+def helper_sources():
+    """Hash of each helper module's source file (None if it can't be found)."""
+    hashes = {}
+    for name in HELPER_MODULES:
+        spec = importlib.util.find_spec(name)
+        try:
+            with open(spec.origin, 'rb') as file:
+                hashes[name] = hashlib.sha256(file.read()).hexdigest()
+        except (AttributeError, TypeError, OSError):
+            hashes[name] = None
+    return hashes
+
+
+def cache_key(function, args, kwargs, version):
+    """Hash of the function's identity and source, the helper modules, its arguments and the data version."""
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = ''
+    payload = json.dumps({
+        'format': CACHE_FORMAT,
+        'function': f'{function.__module__}.{function.__qualname__}',
+        'source': source,
+        'helpers': helper_sources(),
+        'args': repr(args),
+        'kwargs': repr(sorted(kwargs.items())),
+        'version': version,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Tee(io.TextIOBase):
+    """Write to the real stdout and keep a copy."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    def write(self, text):
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _figure_png(figure):
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+
+@contextlib.contextmanager
+def _capture_figures(figures):
+    """Record a PNG of every figure passed to plt.show(), then show it as usual."""
+    plt = sys.modules.get('matplotlib.pyplot')
+    if plt is None:
+        yield
+        return
+    original_show = plt.show
+
+    def show(*args, **kwargs):
+        for number in plt.get_fignums():
+            figures.append({'png': _figure_png(plt.figure(number)), 'shown': True})
+        return original_show(*args, **kwargs)
+
+    plt.show = show
+    try:
+        yield
+    finally:
+        plt.show = original_show
+
+
+def _replay_figures(figures):
+    """Redraw stored figures as images and show the ones the analysis showed."""
+    if not figures:
+        return
+    import matplotlib.image
+    import matplotlib.pyplot as plt
+
+    for figure in figures:
+        image = matplotlib.image.imread(io.BytesIO(figure['png']), format='png')
+        height, width = image.shape[:2]
+        dpi = 100
+        fig = plt.figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        fig.figimage(image)
+        if figure['shown']:
+            plt.show()
+
+
+def _evict(cache_dir=CACHE_DIR):
+    """Delete least recently used entries until the folder is within its limits."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.pkl'):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    while entries and (total > MAX_CACHE_BYTES or len(entries) > MAX_ENTRIES):
+        _, size, name = entries.pop(0)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(cache_dir, name))
+        total -= size
+
+
+def cached_analysis(function=None, *, db_path=DB_PATH):
+    """
+    Decorator: cache an analysis function's result, printed output and figures on disk.
+
+    Use as @cached_analysis, or @cached_analysis(db_path='other.db') for a function
+    that reads another database.
+    """
+    if function is None:
+        return lambda inner: cached_analysis(inner, db_path=db_path)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if os.environ.get('ZINES_ANALYSIS_CACHE', '').lower() in ('off', '0', 'false'):
+            return function(*args, **kwargs)
+        try:
+            key = cache_key(function, args, kwargs, database_version(db_path))
+        except sqlite3.Error:
+            return function(*args, **kwargs)  # no database to fingerprint: just run it
+        path = os.path.join(CACHE_DIR, f'{key}.pkl')
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as file:
+                    entry = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                entry = None
+            if entry is not None:
+                os.utime(path)  # mark as recently used
+                sys.stdout.write(entry['stdout'])
+                _replay_figures(entry['figures'])
+                return entry['result']
+
+        figures = []
+        tee = _Tee(sys.stdout)
+        with contextlib.redirect_stdout(tee), _capture_figures(figures):
+            result = function(*args, **kwargs)
+        plt = sys.modules.get('matplotlib.pyplot')
+        if plt is not None:
+            # Figures drawn but never shown are stored too (and left open for the caller)
+            figures.extend({'png': _figure_png(plt.figure(number)), 'shown': False} for number in plt.get_fignums())
+
+        try:
+            data = pickle.dumps({'result': result, 'stdout': tee.copy.getvalue(), 'figures': figures})
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return result  # not storable: still correct, just not cached
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        _evict()
+        return result
+
+    return wrapper
+
+
+def cache_stats(cache_dir=CACHE_DIR):
+    """Number of entries and total size of the cache."""
+    if not os.path.isdir(cache_dir):
+        return {'entries': 0, 'bytes': 0}
+    sizes = [os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir) if name.endswith('.pkl')]
+    return {'entries': len(sizes), 'bytes': sum(sizes)}
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """Delete every cached result."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    names = [name for name in os.listdir(cache_dir) if name.endswith('.pkl')]
+    for name in names:
+        os.remove(os.path.join(cache_dir, name))
+    return len(names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the analysis result cache.")
+    parser.add_argument('--clear', action='store_true', help="delete every cached result")
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"✓ Removed {clear_cache()} cached results")
+    stats = cache_stats()
+    print(f"=== Analysis Cache ({CACHE_DIR}) ===")
+    print(f"{stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} MB "
+          f"(limits: {MAX_ENTRIES} entries, {MAX_CACHE_BYTES / 1024 / 1024:.0f} MB)")
@@ -1,71 +1,76 @@
+import os
 import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
+import reportrender
+import snapshot
+from analysiscache import cached_analysis
 
 # filepath: /Users/amberedwards/Library/CloudStorage/OneDrive-ClemsonUniversity/FA2025/8510/DatabaseProject/analysisquery.py
-def analyze_publications_and_events():
-    """Analyze publications and events with valid source publications and output results as a PNG table."""
+
+# What the table below is built from; part of the rendered pages' cache key
+PUBLICATIONS_AND_EVENTS_QUERY = """
+    snapshot events (already LEFT JOINed with publications):
+        event_title, event_type, event_date (as entered), source_publication, volume, issue_number
+    WHERE source_publication IS NOT NULL AND source_publication != 'NA'
+    ORDER BY event_date
+    """
+
+@cached_analysis
+def load_publications_and_events():
+    """
+    The events with valid source publications, printed and returned as a DataFrame
+    (None if there are none or the snapshot can't be read). Cached, so a re-run
+    against unchanged data doesn't rebuild or reprint the table from scratch.
+    """
     
     print("=== Publications and Events Analysis ===")
     print("History 8510 - Clemson University")
     print("=" * 60)
     
-    # Connect to zines.db database
-    try:
-        conn = sqlite3.connect('zines.db')
-        print("✓ Connected to Zines database (zines.db)")
-    except sqlite3.Error as e:
-        print(f"❌ Database connection error: {e}")
-        return
-    
-    # SQL query to join publications and events, including volume and issue numbers
-    query = """
-    SELECT 
-        e.event_title AS event_title,
-        e.event_type AS event_type,
-        e.event_date AS event_date,
-        e.source_publication AS source_publication,
-        p.volume AS volume_number,
-        p.issue_number AS issue_number
-    FROM events e
-    LEFT JOIN publications p
-    ON e.publication_id = p.pub_id
-    WHERE e.source_publication IS NOT NULL AND e.source_publication != 'NA'
-    ORDER BY e.event_date
-    """
-    
     try:
-        # Execute the query and load the results into a DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Load the events, with their publication's volume and issue, from the columnar snapshot
+        df = snapshot.read_frame('events', ['event_title', 'event_type', 'event_date_text',
+                                            'source_publication', 'volume', 'issue_number'])
+        print(f"✓ Loaded {len(df)} events from the columnar snapshot")
+        
+        # Keep valid source publications and order by the date text, as the SQL version did
+        source = df['source_publication'].astype(object)
+        df = df[source.notna() & (source != 'NA')]
+        df = df.rename(columns={'event_date_text': 'event_date', 'volume': 'volume_number'})
+        df = df.sort_values('event_date', kind='stable', na_position='first').reset_index(drop=True)
         
         # Check if the DataFrame is empty
         if df.empty:
             print("No results found for the query.")
-            return
+            return None
         
         # Display the data in the console
         print("\nPublications and Events (Filtered by Valid Source Publications):")
         print(df.to_string(index=False))
-        
-        # Create a PNG table from the DataFrame
-        fig, ax = plt.subplots(figsize=(12, len(df) * 0.5))  # Adjust height based on number of rows
-        ax.axis('tight')
-        ax.axis('off')
-        table = ax.table(cellText=df.values, colLabels=df.columns, cellLoc='center', loc='center')
-        table.auto_set_font_size(False)
-        table.set_fontsize(10)
-        table.auto_set_column_width(col=list(range(len(df.columns))))  # Adjust column widths
-        
-        # Save the table as a PNG file
-        output_path = "publications_and_events_table.png"
-        plt.savefig(output_path, bbox_inches='tight', dpi=300)
-        print(f"\n✓ Table saved as PNG: {output_path}")
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        # Close the database connection
-        conn.close()
-        print("\n✓ Database connection closed.")
+        return df
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
+        return None
+
+def analyze_publications_and_events(output_format='png', output_dir=reportrender.REPORTS_DIR):
+    """
+    Analyze publications and events with valid source publications and output results as a table.
+
+    output_format is 'png' (paginated, rendered in parallel), 'html' or 'csv'.
+    """
+    df = load_publications_and_events()
+    if df is None:
+        return
+    
+    try:
+        # Render the table as fixed-size PNG pages (or a single HTML/CSV file) into output_dir;
+        # pages whose rows haven't changed since the last run are not re-rendered
+        outputs = reportrender.render_table(df, 'publications_and_events_table',
+                                            query=PUBLICATIONS_AND_EVENTS_QUERY,
+                                            output_dir=output_dir, fmt=output_format)
+        print(f"\n✓ Table saved as {output_format.upper()}: {len(outputs)} file(s) in "
+              f"{os.path.dirname(outputs[0])}")
+    except OSError as e:
+        print(f"❌ Report error: {e}")
 
 # Run the analysis
 if __name__ == "__main__":
@@ -79,38 +84,28 @@ import sqlite3
 # Define the path to the SQLite database
 DB_PATH = 'zines.db'  # Replace with the actual path to your database
 
+@cached_analysis
 def rank_source_publications():
     """
     Count and rank the instances of each source_publication from most to least frequent.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
     try:
-        # Execute the query
-        query = '''
-            SELECT 
-                source_publication, 
-                COUNT(*) AS count
-            FROM events
-            WHERE source_publication IS NOT NULL AND source_publication != 'NA'
-            GROUP BY source_publication
-            ORDER BY count DESC;
-        '''
-        cursor.execute(query)
-        results = cursor.fetchall()
+        # Count the valid source publications in the columnar snapshot
+        source = snapshot.read_frame('events', ['source_publication'], db_path=DB_PATH)['source_publication']
+        source = source.astype(object)
+        counts = source[source.notna() & (source != 'NA')].value_counts().reset_index()
+
+        # Most frequent first; ties in descending name order, as the GROUP BY query returned them
+        counts = counts.sort_values(['count', 'source_publication'], ascending=[False, False])
 
         # Print the results
         print("=== Source Publication Rankings ===")
         print(f"{'Source Publication':<30} {'Count':<10}")
         print("-" * 40)
-        for row in results:
+        for row in counts.itertuples(index=False):
             print(f"{row[0]:<30} {row[1]:<10}")
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        conn.close()
-        print("\n✓ Database connection closed.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
 
 # Run the function
 if __name__ == "__main__":
@@ -165,29 +160,18 @@ import sqlite3
 # Path to the SQLite database
 DB_PATH = 'zines.db'
 
+@cached_analysis
 def calculate_source_publication_ratio():
     """
     Calculate the ratio of events where source_publication is not 'NA' to the total number of events.
     Output the result as both a number and a percentage.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
     try:
-        # Query to count events where source_publication is not 'NA'
-        cursor.execute('''
-            SELECT COUNT(*) 
-            FROM events
-            WHERE source_publication IS NOT NULL AND source_publication != 'NA'
-        ''')
-        events_with_source = cursor.fetchone()[0]
-
-        # Query to count total events
-        cursor.execute('''
-            SELECT COUNT(*) 
-            FROM events
-        ''')
-        total_events = cursor.fetchone()[0]
+        # Count events with a source_publication other than 'NA', and all events
+        source = snapshot.read_frame('events', ['source_publication'], db_path=DB_PATH)['source_publication']
+        source = source.astype(object)
+        events_with_source = int((source.notna() & (source != 'NA')).sum())
+        total_events = len(source)
 
         # Calculate the ratio and percentage
         if total_events > 0:
@@ -202,12 +186,8 @@ def calculate_source_publication_ratio():
         print(f"Total Events: {total_events}")
         print(f"Events with Source Publication (not 'NA'): {events_with_source}")
         print(f"Ratio: {events_with_source}/{total_events} ({percentage:.2f}%)")
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        # Close the database connection
-        conn.close()
-        print("\n✓ Database connection closed.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
 
 # Run the analysis
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Unique Location Query Check and Benchmark
+History 8510 - Clemson University
+
+1. Regression check: the set-based queries in locationqueries.py must return exactly
+   the same rows as the original nested queries testqueries.py used to run, both on zines.db
+   and on a synthetic database with awkward cases (NULL parts, repeated locations,
+   locations whose strings collide across different city/state/country splits).
+2. Benchmark: times both versions on a synthetic database with 1,000,000 events.
+
+Run with:  python benchlocations.py [number_of_events]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import locationqueries
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# The original queries testqueries.py used to run, kept verbatim as the reference
+LEGACY_UNIQUE_LOCATIONS_QUERY = """
+    SELECT
+        e.event_title AS event_title,
+        e.event_date AS event_date,
+        e.city || ', ' || e.state || ', ' || e.country AS location,
+        p.volume AS volume_number,
+        p.issue_number AS issue_number
+    FROM
+        events e
+    LEFT JOIN
+        publications p
+    ON
+        e.publication_id = p.pub_id
+    WHERE
+        (e.city || ', ' || e.state || ', ' || e.country) IN (
+            SELECT
+                city || ', ' || state || ', ' || country AS location
+            FROM
+                events
+            GROUP BY
+                city, state, country
+            HAVING
+                COUNT(*) = 1
+        )
+    ORDER BY
+        e.event_date ASC;
+"""
+
+LEGACY_UNIQUE_NON_USA_LOCATIONS_QUERY = """
+    SELECT
+        e.event_title AS event_title,
+        e.event_date AS event_date,
+        e.city || ', ' || e.state || ', ' || e.country AS location,
+        p.volume AS volume_number,
+        p.issue_number AS issue_number
+    FROM
+        events e
+    LEFT JOIN
+        publications p
+    ON
+        e.publication_id = p.pub_id
+    WHERE
+        e.country != 'USA'
+        AND (e.city || ', ' || e.state || ', ' || e.country) IN (
+            SELECT
+                city || ', ' || state || ', ' || country AS location
+            FROM
+                events
+            WHERE
+                country != 'USA'
+            GROUP BY
+                city, state, country
+            HAVING
+                COUNT(*) = 1
+        )
+    ORDER BY
+        e.event_date ASC;
+"""
+
+CITIES = ['Berkeley', 'San Francisco', 'Oakland', 'Los Angeles', 'New York', 'Chicago',
+          'London', 'Paris', 'Toronto', 'Tokyo', 'Boston', 'Seattle']
+STATES = ['CA', 'NY', 'IL', 'MA', 'WA', 'NA', None]
+COUNTRIES = ['USA', 'USA', 'USA', 'UK', 'France', 'Canada', 'Japan', None]
+
+
+def build_synthetic_database(path, event_count, seed=8510):
+    """
+    Build a database with the zines.db schema and `event_count` random events.
+    About one location in ten is made unique so both queries return real results.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE publications (
+            pub_id INTEGER PRIMARY KEY AUTOINCREMENT, pub_title TEXT NOT NULL,
+            volume INTEGER NOT NULL, issue_number INTEGER NOT NULL, issue_date DATE,
+            volume_title TEXT, author_org TEXT, location TEXT
+        );
+        CREATE TABLE events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT, event_title TEXT NOT NULL,
+            event_date DATE, description TEXT, city TEXT, state TEXT, country TEXT,
+            location TEXT, address TEXT, event_type TEXT, publication_id INTEGER,
+            source_publication TEXT, FOREIGN KEY (publication_id) REFERENCES publications (pub_id)
+        );
+    ''')
+    conn.executemany(
+        'INSERT INTO publications (pub_title, volume, issue_number) VALUES (?, ?, ?)',
+        [("It Ain't Me Babe", volume, issue) for volume in range(1, 11) for issue in range(1, 21)])
+
+    def random_event(number):
+        if rng.random() < 0.1:
+            city = f'Town {number}'  # (almost always) a one-off location
+        else:
+            city = rng.choice(CITIES)
+        return (f'Event {number}', f'1970-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                city, rng.choice(STATES), rng.choice(COUNTRIES), rng.randint(1, 220))
+
+    batch = []
+    for number in range(event_count):
+        batch.append(random_event(number))
+        if len(batch) == 50000:
+            conn.executemany('INSERT INTO events (event_title, event_date, city, state, country, publication_id) '
+                             'VALUES (?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    # Edge cases: a location string shared by two different (city, state, country) splits,
+    # NULL parts, and a repeated one-off location
+    batch += [
+        ('Collision A', '1970-01-01', 'A, B', 'C', 'D', 1),
+        ('Collision B', '1970-01-02', 'A', 'B, C', 'D', 1),
+        ('Null state', '1970-01-03', 'Nowhere', None, 'UK', 1),
+        ('Twice 1', '1970-01-04', 'Twice', 'XX', 'UK', 1),
+        ('Twice 2', '1970-01-05', 'Twice', 'XX', 'UK', 1),
+    ]
+    conn.executemany('INSERT INTO events (event_title, event_date, city, state, country, publication_id) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', batch)
+    conn.commit()
+    return conn
+
+
+def _timed(function):
+    """Run function() and return (result, seconds)."""
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def compare(conn, label):
+    """
+    Check that both versions return the same rows for both analyses.
+    Rows are compared in order after sorting, since the original ORDER BY event_date
+    leaves the order of events on the same date unspecified.
+
+    Returns:
+        bool: True if every result matched.
+    """
+    all_match = True
+    for non_usa, legacy_query in ((False, LEGACY_UNIQUE_LOCATIONS_QUERY),
+                                  (True, LEGACY_UNIQUE_NON_USA_LOCATIONS_QUERY)):
+        legacy = pd.read_sql_query(legacy_query, conn)
+        current = locationqueries.unique_event_locations(conn, non_usa=non_usa)
+        dates_sorted = current['event_date'].fillna('').is_monotonic_increasing or current.empty
+        legacy_sorted = legacy.sort_values(list(legacy.columns), na_position='first').reset_index(drop=True)
+        current_sorted = current.sort_values(list(current.columns), na_position='first').reset_index(drop=True)
+        matches = legacy_sorted.equals(current_sorted) and list(legacy.columns) == list(current.columns)
+        name = 'non-USA' if non_usa else 'all'
+        print(f"{'✓' if matches and dates_sorted else '❌'} {label} ({name}): "
+              f"{len(legacy)} original rows, {len(current)} set-based rows")
+        all_match = all_match and matches and dates_sorted
+    return all_match
+
+
+def benchmark(conn, event_count):
+    """
+    Time the original queries on the schema as it is today (no location indexes),
+    then the original and set-based queries once the location indexes exist.
+    """
+    print(f"\n=== Benchmark on {event_count:,} events ===")
+    cases = ((False, LEGACY_UNIQUE_LOCATIONS_QUERY), (True, LEGACY_UNIQUE_NON_USA_LOCATIONS_QUERY))
+
+    baseline = {}
+    for non_usa, legacy_query in cases:
+        _, baseline[non_usa] = _timed(lambda: pd.read_sql_query(legacy_query, conn))
+
+    locationqueries.ensure_location_indexes(conn)
+    conn.execute('ANALYZE')
+
+    print(f"{'':<8} {'original':>10} {'original+idx':>13} {'set-based':>10} {'speedup':>8}")
+    for non_usa, legacy_query in cases:
+        name = 'non-USA' if non_usa else 'all'
+        _, indexed_seconds = _timed(lambda: pd.read_sql_query(legacy_query, conn))
+        _, current_seconds = _timed(lambda: locationqueries.unique_event_locations(conn, non_usa=non_usa))
+        print(f"{name:<8} {baseline[non_usa]:>9.2f}s {indexed_seconds:>12.2f}s {current_seconds:>9.2f}s "
+              f"{baseline[non_usa] / current_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ok = True
+
+    if os.path.exists(DB_PATH):
+        conn = sqlite3.connect(DB_PATH)
+        ok = compare(conn, 'zines.db') and ok
+        conn.close()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"\nBuilding synthetic database with {event_count:,} events...")
+        conn = build_synthetic_database(os.path.join(tmp_dir, 'bench.db'), event_count)
+        benchmark(conn, event_count)
+        ok = compare(conn, 'synthetic') and ok
+        conn.close()
+
+    sys.exit(0 if ok else 1)
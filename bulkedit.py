@@ -0,0 +1,422 @@
+# Bulk Edits for zines.db
+# Filter-driven update/delete operations that replace the one-off scripts in editdata.py.
+# Each operation is previewed with an indexed COUNT(*), journaled in bulk_operations,
+# and applied in rowid-keyed chunks so an interrupted run can be resumed.
+
+import re
+import sqlite3
+
+import dedupe
+import publish
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Tables that bulk operations may touch, with their primary key column
+BULK_TABLES = {
+    'events': 'event_id',
+    'publications': 'pub_id',
+    'resources': 'resource_id',
+}
+
+ACTIONS = ('update', 'delete')
+DEFAULT_CHUNK_SIZE = 5000
+
+# Columns that bulk fixes filter on most often; indexed so previews are counted from the index
+FILTER_INDEXES = {
+    'idx_events_event_type': 'events(event_type)',
+    'idx_events_source_publication': 'events(source_publication)',
+    'idx_resources_resource_type': 'resources(resource_type)',
+}
+
+# Tokens of the filter language: quoted strings, numbers, words, comparison operators, parens, commas
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<op><=|>=|!=|<>|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+
+class FilterError(ValueError):
+    """Raised when a filter expression can't be parsed or uses an unknown column."""
+
+
+def get_connection(db_path=DB_PATH):
+    """
+    Open a connection with rows accessible by column name. Foreign keys are enforced,
+    as on the web app's write connections, and content_hash() is registered so
+    updated rows get a new content_key.
+    """
+    conn = dedupe.register_content_hash(sqlite3.connect(db_path))
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def ensure_bulk_tables(conn):
+    """Create the operations journal and the filter indexes if they don't exist yet."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bulk_operations (
+            op_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            filter_expression TEXT NOT NULL,
+            action TEXT NOT NULL,              -- 'update' or 'delete'
+            set_column TEXT,                   -- column changed by an update
+            set_value TEXT,                    -- new value for set_column
+            status TEXT NOT NULL DEFAULT 'pending',  -- 'pending', 'done' or 'failed'
+            last_rowid INTEGER NOT NULL DEFAULT 0,  -- resume point, everything up to here is applied
+            rows_affected INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT,
+            rows_skipped INTEGER NOT NULL DEFAULT 0,  -- matching rows an update left alone (duplicates)
+            error TEXT                         -- why a failed operation stopped
+        )
+    ''')
+    # Journals created before rows_skipped and error existed
+    columns = _table_columns(conn, 'bulk_operations')
+    if 'rows_skipped' not in columns:
+        conn.execute('ALTER TABLE bulk_operations ADD COLUMN rows_skipped INTEGER NOT NULL DEFAULT 0')
+    if 'error' not in columns:
+        conn.execute('ALTER TABLE bulk_operations ADD COLUMN error TEXT')
+    for index_name, target in FILTER_INDEXES.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {target}')
+    conn.commit()
+
+
+def _has_journal(conn):
+    """Whether bulk_operations exists (readers check instead of creating it, so they never write)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bulk_operations'"
+    ).fetchone() is not None
+
+
+def _tokenize(expression):
+    """Split a filter expression into (kind, text) tokens."""
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match or match.end() == position:
+            raise FilterError(f"Unexpected text in filter near: {expression[position:position + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def _table_columns(conn, table):
+    """Return the set of column names of a table."""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def parse_filter(conn, table, expression):
+    """
+    Turn a filter expression into a parameterized WHERE clause.
+
+    Supported conditions, joined with AND:
+        column = value   (also !=, <>, <, <=, >, >=, LIKE, NOT LIKE)
+        column BETWEEN value AND value
+        column IN (value, value, ...)
+        column IS NULL / column IS NOT NULL
+    Values are quoted strings ('Advocacy') or numbers. Column names are checked
+    against the table so nothing from the expression is pasted into SQL unchecked.
+
+    Returns:
+        tuple: (where_sql, params)
+    """
+    if table not in BULK_TABLES:
+        raise FilterError(f"Bulk operations are not allowed on table: {table}")
+    columns = _table_columns(conn, table)
+    tokens = _tokenize(expression)
+    if not tokens:
+        raise FilterError("A filter expression is required.")
+
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def take(kind=None, word=None):
+        nonlocal position
+        token_kind, text = peek()
+        if token_kind is None:
+            raise FilterError("Filter expression ended unexpectedly.")
+        if kind and token_kind != kind:
+            raise FilterError(f"Expected {kind} but found {text!r}")
+        if word and text.upper() != word:
+            raise FilterError(f"Expected {word} but found {text!r}")
+        position += 1
+        return text
+
+    def take_value():
+        token_kind, text = peek()
+        if token_kind == 'string':
+            take()
+            return text[1:-1].replace("''", "'")
+        if token_kind == 'number':
+            take()
+            return float(text) if '.' in text else int(text)
+        raise FilterError(f"Expected a quoted string or number but found {text!r}")
+
+    clauses = []
+    params = []
+    while True:
+        column = take('word')
+        if column not in columns:
+            raise FilterError(f"Unknown column for {table}: {column}")
+        token_kind, text = peek()
+        keyword = (text or '').upper()
+
+        if token_kind == 'op':
+            take()
+            clauses.append(f'{column} {text} ?')
+            params.append(take_value())
+        elif keyword == 'LIKE':
+            take()
+            clauses.append(f'{column} LIKE ?')
+            params.append(take_value())
+        elif keyword == 'NOT':
+            take()
+            take('word', 'LIKE')
+            clauses.append(f'{column} NOT LIKE ?')
+            params.append(take_value())
+        elif keyword == 'BETWEEN':
+            take()
+            low = take_value()
+            take('word', 'AND')
+            high = take_value()
+            clauses.append(f'{column} BETWEEN ? AND ?')
+            params.extend([low, high])
+        elif keyword == 'IN':
+            take()
+            if take('punct') != '(':
+                raise FilterError("Expected ( to open the IN list.")
+            values = [take_value()]
+            while peek()[1] == ',':
+                take()
+                values.append(take_value())
+            if take('punct') != ')':
+                raise FilterError("Expected ) to close the IN list.")
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        elif keyword == 'IS':
+            take()
+            if peek()[1] and peek()[1].upper() == 'NOT':
+                take()
+                take('word', 'NULL')
+                clauses.append(f'{column} IS NOT NULL')
+            else:
+                take('word', 'NULL')
+                clauses.append(f'{column} IS NULL')
+        else:
+            raise FilterError(f"Expected a comparison after {column} but found {text!r}")
+
+        if position == len(tokens):
+            break
+        take('word', 'AND')
+
+    return ' AND '.join(clauses), params
+
+
+def preview(table, expression, db_path=DB_PATH, sample_size=10):
+    """
+    Count the rows a filter matches and return a few of them, without changing anything.
+
+    Returns:
+        tuple: (row_count, sample_rows)
+    """
+    conn = get_connection(db_path)
+    try:
+        ensure_bulk_tables(conn)
+        where_sql, params = parse_filter(conn, table, expression)
+        count = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {where_sql}', params).fetchone()[0]
+        sample = conn.execute(
+            f'SELECT * FROM {table} WHERE {where_sql} ORDER BY rowid LIMIT ?', params + [sample_size]
+        ).fetchall()
+        return count, sample
+    finally:
+        conn.close()
+
+
+def create_operation(table, expression, action, set_column=None, set_value=None, db_path=DB_PATH):
+    """
+    Validate a bulk operation and record it in the journal as pending.
+
+    Returns:
+        int: The op_id of the new operation.
+    """
+    if action not in ACTIONS:
+        raise FilterError(f"Unknown bulk action: {action}")
+    conn = get_connection(db_path)
+    try:
+        ensure_bulk_tables(conn)
+        parse_filter(conn, table, expression)  # fail now rather than halfway through
+        if action == 'update':
+            if set_column not in _table_columns(conn, table):
+                raise FilterError(f"Unknown column for {table}: {set_column}")
+            if set_column == BULK_TABLES[table]:
+                raise FilterError("The primary key can't be changed with a bulk update.")
+        cursor = conn.execute('''
+            INSERT INTO bulk_operations (table_name, filter_expression, action, set_column, set_value)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (table, expression, action, set_column if action == 'update' else None,
+              set_value if action == 'update' else None))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def run_operation(op_id, db_path=DB_PATH, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Apply a journaled operation, starting after its last completed chunk.
+
+    Each chunk covers the next `chunk_size` matching rowids. The change and the
+    journal's resume point are committed together, so stopping at any moment
+    leaves the operation either fully applied up to last_rowid or untouched past
+    it, and running it again picks up where it stopped.
+
+    Updates run as UPDATE OR IGNORE: a row that would become a duplicate of another
+    (same content_key) is left as it is and counted in rows_skipped. A chunk that
+    breaks a foreign key is rolled back and the operation is marked 'failed' with
+    the reason in its error column, instead of staying pending and failing on
+    every resume; the IntegrityError is raised again for the caller.
+
+    Args:
+        progress: Optional callback called as progress(rows_done, rows_total) after each chunk.
+
+    Returns:
+        int: Total number of rows affected by the operation.
+    """
+    conn = get_connection(db_path)
+    try:
+        ensure_bulk_tables(conn)
+        op = conn.execute('SELECT * FROM bulk_operations WHERE op_id = ?', (op_id,)).fetchone()
+        if op is None:
+            raise FilterError(f"No bulk operation with id {op_id}")
+        if op['status'] == 'done':
+            return op['rows_affected']
+        if op['status'] == 'failed':
+            raise sqlite3.IntegrityError(f"Bulk operation {op_id} failed: {op['error']}")
+
+        table = op['table_name']
+        where_sql, params = parse_filter(conn, table, op['filter_expression'])
+        last_rowid = op['last_rowid']
+        rows_affected = op['rows_affected']
+        rows_skipped = op['rows_skipped']
+        remaining = conn.execute(
+            f'SELECT COUNT(*) FROM {table} WHERE rowid > ? AND {where_sql}', [last_rowid] + params
+        ).fetchone()[0]
+        total = rows_affected + rows_skipped + remaining
+
+        while True:
+            # Upper rowid bound of the next chunk of matching rows
+            chunk_end = conn.execute(f'''
+                SELECT MAX(rowid) FROM (
+                    SELECT rowid FROM {table}
+                    WHERE rowid > ? AND {where_sql}
+                    ORDER BY rowid LIMIT ?
+                )
+            ''', [last_rowid] + params + [chunk_size]).fetchone()[0]
+            if chunk_end is None:
+                break
+
+            try:
+                with conn:
+                    if op['action'] == 'delete':
+                        cursor = conn.execute(
+                            f'DELETE FROM {table} WHERE rowid > ? AND rowid <= ? AND {where_sql}',
+                            [last_rowid, chunk_end] + params)
+                        skipped = 0
+                    else:
+                        matched = conn.execute(
+                            f'SELECT COUNT(*) FROM {table} WHERE rowid > ? AND rowid <= ? AND {where_sql}',
+                            [last_rowid, chunk_end] + params).fetchone()[0]
+                        cursor = conn.execute(
+                            f"UPDATE OR IGNORE {table} SET {op['set_column']} = ? "
+                            f'WHERE rowid > ? AND rowid <= ? AND {where_sql}',
+                            [op['set_value'], last_rowid, chunk_end] + params)
+                        skipped = matched - cursor.rowcount
+                    rows_affected += cursor.rowcount
+                    rows_skipped += skipped
+                    last_rowid = chunk_end
+                    conn.execute('''
+                        UPDATE bulk_operations SET last_rowid = ?, rows_affected = ?, rows_skipped = ?
+                        WHERE op_id = ?
+                    ''', (last_rowid, rows_affected, rows_skipped, op_id))
+            except sqlite3.IntegrityError as e:
+                # Retrying can't help (e.g. a foreign key), so stop here for good
+                with conn:
+                    conn.execute('''
+                        UPDATE bulk_operations SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP
+                        WHERE op_id = ?
+                    ''', (f'{e} (after row {last_rowid})', op_id))
+                raise
+
+            if progress:
+                progress(rows_affected + rows_skipped, total)
+
+        with conn:
+            conn.execute('''
+                UPDATE bulk_operations SET status = 'done', finished_at = CURRENT_TIMESTAMP
+                WHERE op_id = ?
+            ''', (op_id,))
+        return rows_affected
+    finally:
+        conn.close()
+
+
+def get_operation(op_id, db_path=DB_PATH):
+    """Return one journaled operation (status, rows_affected, rows_skipped, error, ...) or None."""
+    conn = get_connection(db_path)
+    try:
+        if not _has_journal(conn):
+            return None
+        return conn.execute('SELECT * FROM bulk_operations WHERE op_id = ?', (op_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def pending_operations(db_path=DB_PATH):
+    """Return operations that were started but never finished."""
+    conn = get_connection(db_path)
+    try:
+        if not _has_journal(conn):
+            return []
+        return conn.execute(
+            "SELECT * FROM bulk_operations WHERE status = 'pending' ORDER BY op_id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def bulk_update(table, expression, set_column, set_value, db_path=DB_PATH, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Set `set_column` to `set_value` on every row matching the filter. Returns rows affected."""
+    op_id = create_operation(table, expression, 'update', set_column, set_value, db_path)
+    return run_operation(op_id, db_path, chunk_size)
+
+
+def bulk_delete(table, expression, db_path=DB_PATH, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete every row matching the filter. Returns rows affected."""
+    op_id = create_operation(table, expression, 'delete', db_path=db_path)
+    return run_operation(op_id, db_path, chunk_size)
+
+
+# Run any operations that were interrupted
+if __name__ == '__main__':
+    print("=== Resuming Pending Bulk Operations ===")
+    for op in pending_operations():
+        print(f"Operation {op['op_id']}: {op['action']} {op['table_name']} WHERE {op['filter_expression']}")
+        try:
+            affected = run_operation(op['op_id'])
+        except sqlite3.IntegrityError as e:
+            print(f"❌ {e}")
+            continue
+        skipped = get_operation(op['op_id'])['rows_skipped']
+        print(f"✓ {affected} rows affected, {skipped} skipped (would duplicate another row)")
+    print("\n✓ No pending operations left.")
+    publish.refresh_snapshot()  # so a running web app shows the edits
@@ -0,0 +1,180 @@
+# Change Log for zines.db
+# Triggers on events, publications and resources append one row per insert, update
+# or delete to change_log, whoever makes the change (the web app, bulkedit.py, the
+# import scripts or the sqlite3 shell). Mirrors read the log from their last seq
+# onward instead of re-pulling the whole database. Running this file installs the
+# log in an existing database; createdb.py includes it for new ones.
+#
+# Seqs only count within one log: a rebuilt database (publish.full_reload) starts
+# again from 1. change_log_meta holds a random epoch id that is replaced on every
+# rebuild, so a mirror records the epoch next to its seq and re-pulls everything
+# when the epoch changes.
+
+import sqlite3
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Tables whose changes are captured, with their primary keys
+TRACKED_TABLES = {
+    'events': 'event_id',
+    'publications': 'pub_id',
+    'resources': 'resource_id',
+}
+
+# How many changes to read per batch
+BATCH_SIZE = 500
+
+
+def ensure_change_log(conn):
+    """Create the change_log table and its triggers if they don't exist yet."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- increases with every change, never reused
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,                       -- 'insert', 'update' or 'delete'
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch TEXT NOT NULL                     -- random id of this log, replaced on every rebuild
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO change_log_meta (id, epoch) VALUES (1, lower(hex(randomblob(8))))")
+    for table, primary_key in TRACKED_TABLES.items():
+        conn.executescript(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_log_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', NEW.{primary_key}, 'insert');
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {table}_log_update AFTER UPDATE ON {table}
+            BEGIN
+                -- A changed primary key is a delete of the old id plus an insert of the new one
+                INSERT INTO change_log (table_name, row_id, op)
+                SELECT '{table}', OLD.{primary_key}, 'delete' WHERE OLD.{primary_key} IS NOT NEW.{primary_key};
+                INSERT INTO change_log (table_name, row_id, op)
+                VALUES ('{table}', NEW.{primary_key},
+                        CASE WHEN OLD.{primary_key} IS NEW.{primary_key} THEN 'update' ELSE 'insert' END);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {table}_log_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', OLD.{primary_key}, 'delete');
+            END;
+        ''')
+    conn.commit()
+
+
+def has_change_log(conn):
+    """True if the database has a change_log table."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'"
+    ).fetchone() is not None
+
+
+def current_seq(conn):
+    """The seq of the latest change (0 if nothing has been logged). Doubles as a data version."""
+    if not has_change_log(conn):
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+
+
+def log_epoch(conn):
+    """
+    The log's epoch id (None if the database has no change_log_meta). Seqs from two
+    different epochs can't be compared: when it changes, reload everything.
+    """
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log_meta'"
+    ).fetchone() is None:
+        return None
+    row = conn.execute('SELECT epoch FROM change_log_meta WHERE id = 1').fetchone()
+    return row[0] if row else None
+
+
+def new_epoch(conn):
+    """Replace the log's epoch id; call after rebuilding the database, so mirrors reload."""
+    conn.execute("INSERT OR REPLACE INTO change_log_meta (id, epoch) VALUES (1, lower(hex(randomblob(8))))")
+    conn.commit()
+    return log_epoch(conn)
+
+
+def read_changes(conn, since=0, limit=BATCH_SIZE):
+    """
+    Return up to `limit` changes with seq > since, oldest first.
+
+    Each change is a dict with seq, table, id, op and changed_at, plus `row`: the row
+    as it is now (None if it has since been deleted). Rows are fetched with one query
+    per table for the whole batch.
+    """
+    log = conn.execute('''
+        SELECT seq, table_name, row_id, op, changed_at FROM change_log
+        WHERE seq > ? ORDER BY seq LIMIT ?
+    ''', (since, limit)).fetchall()
+
+    current_rows = {}
+    for table, primary_key in TRACKED_TABLES.items():
+        ids = sorted({change[2] for change in log if change[1] == table})
+        for start in range(0, len(ids), 500):  # stay under SQLite's bound parameter limit
+            chunk = ids[start:start + 500]
+            cursor = conn.execute(
+                f"SELECT * FROM {table} WHERE {primary_key} IN ({', '.join('?' * len(chunk))})", chunk)
+            columns = [column[0] for column in cursor.description]
+            for values in cursor:
+                row = dict(zip(columns, values))
+                row.pop('content_key', None)  # derived from the other columns
+                current_rows[(table, row[primary_key])] = row
+
+    return [{
+        'seq': seq,
+        'table': table,
+        'id': row_id,
+        'op': op,
+        'changed_at': changed_at,
+        'row': current_rows.get((table, row_id)),
+    } for seq, table, row_id, op, changed_at in log]
+
+
+def iter_changes(since=0, batch_size=BATCH_SIZE, db_path=DB_PATH):
+    """
+    Yield every change after `since`, one batch (a list from read_changes) at a time.
+    Remember the last seq of the last batch and pass it as `since` next time, together
+    with log_epoch(): if the epoch has changed since, re-pull everything instead.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        while True:
+            batch = read_changes(conn, since, batch_size)
+            if not batch:
+                return
+            yield batch
+            since = batch[-1]['seq']
+    finally:
+        conn.close()
+
+
+def prune_changes(before_seq, db_path=DB_PATH):
+    """Delete changes older than before_seq once every mirror has read past them."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            deleted = conn.execute('DELETE FROM change_log WHERE seq < ?', (before_seq,)).rowcount
+        print(f"✓ Removed {deleted} old changes")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=== Installing the Change Log in zines.db ===")
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        ensure_change_log(conn)
+        print(f"✓ change_log and triggers in place (latest seq: {current_seq(conn)}, epoch {log_epoch(conn)})")
+    except sqlite3.Error as e:
+        print(f"❌ Error while installing the change log: {e}")
+    finally:
+        conn.close()
@@ -0,0 +1,243 @@
+# Sparse Co-occurrence Engine
+# Answers "which event types appear together" or "which source publications feed which
+# places" without nested loops. Events are turned into sparse incidence matrices once
+# (event x type, event x place, event x source), and every pair count is a single
+# sparse matrix product (A.T @ B). Counts, PMI and Jaccard scores are computed on the
+# non-zero pairs only, and results can be exported as edge lists for network tools
+# like Gephi.
+#
+# The incidence matrices are built from the columnar snapshot (snapshot.py) and cached
+# next to it, keyed on the snapshot's database fingerprint, so they are only rebuilt
+# after zines.db changes.
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import snapshot
+
+# Path to the SQLite database, the cache folder and where edge lists are exported
+DB_PATH = 'zines.db'
+CACHE_DIR = os.path.join(snapshot.SNAPSHOT_DIR, 'cooccurrence')
+EXPORT_DIR = os.path.join('reports', 'cooccurrence')
+
+# Values that mean "unknown" and are left out of every matrix
+MISSING_VALUES = {'', 'NA', 'NA, NA, NA', 'N/A', 'Unknown'}
+
+# Columns read from the events snapshot
+EVENT_COLUMNS = ['event_id', 'event_type', 'city', 'state', 'country', 'source_publication', 'pub_title']
+
+
+def _categories(series):
+    """Category codes per event (-1 for missing) and the distinct values, without touching every string."""
+    values = series.astype('category')
+    return values.cat.codes.to_numpy(), [str(category) for category in values.cat.categories]
+
+
+def _type_labels(events):
+    """Combined types like 'Protest Report,Advocacy' are split, so one category can have several labels."""
+    codes, categories = _categories(events['event_type'])
+    return codes, [[part.strip() for part in category.split(',')] for category in categories]
+
+
+def _column_labels(column):
+    def labels(events):
+        codes, categories = _categories(events[column])
+        return codes, [[category.strip()] for category in categories]
+    return labels
+
+
+def _place_labels(events):
+    """'city, state, country', built once per distinct combination rather than once per event."""
+    parts = [_categories(events[column]) for column in ('city', 'state', 'country')]
+    # One integer key per combination (codes shifted by one so missing (-1) becomes 0)
+    key = np.zeros(len(events), dtype=np.int64)
+    for codes, categories in parts:
+        key = key * (len(categories) + 1) + (codes + 1)
+    codes, combinations = pd.factorize(key)
+    labels = []
+    for combination in combinations:
+        names = []
+        for _, categories in reversed(parts):
+            combination, code = divmod(int(combination), len(categories) + 1)
+            names.append('NA' if code == 0 else categories[code - 1])
+        labels.append([', '.join(reversed(names))])
+    return codes, labels
+
+
+# Every dimension an event can be linked to: name -> function returning
+# (category code per event, list of labels for each category)
+DIMENSIONS = {
+    'type': _type_labels,
+    'place': _place_labels,
+    'city': _column_labels('city'),
+    'state': _column_labels('state'),
+    'country': _column_labels('country'),
+    'source': _column_labels('source_publication'),
+    'zine': _column_labels('pub_title'),
+}
+
+
+def build_incidence(events, dimension):
+    """
+    Build the sparse event x label incidence matrix for one dimension.
+
+    Events are first one-hot encoded by their distinct value (event x category), then
+    multiplied by a small category x label matrix, so string work is done once per
+    distinct value instead of once per event.
+
+    Returns:
+        tuple: (scipy.sparse.csr_matrix of 0/1 with one row per event, numpy array of labels)
+    """
+    codes, category_labels = DIMENSIONS[dimension](events)
+    label_numbers = {}
+    mapping_rows, mapping_cols = [], []
+    for category, labels in enumerate(category_labels):
+        for label in labels:
+            if label in MISSING_VALUES:
+                continue
+            mapping_rows.append(category)
+            mapping_cols.append(label_numbers.setdefault(label, len(label_numbers)))
+    mapping = sparse.csr_matrix((np.ones(len(mapping_rows), dtype=np.int32), (mapping_rows, mapping_cols)),
+                                shape=(len(category_labels), len(label_numbers)))
+
+    present = codes >= 0
+    events_by_category = sparse.csr_matrix(
+        (np.ones(int(present.sum()), dtype=np.int32), (np.flatnonzero(present), codes[present])),
+        shape=(len(codes), len(category_labels)))
+    matrix = (events_by_category @ mapping).tocsr()
+    matrix.data[:] = 1  # an event listing the same type twice still counts once
+    return matrix, np.array(list(label_numbers), dtype=object)
+
+
+def _cache_key(db_path):
+    snapshot.create_snapshot(db_path)
+    return json.dumps(snapshot.read_manifest()['fingerprint'], sort_keys=True)
+
+
+def load_incidence(dimension, db_path=DB_PATH, cache_dir=CACHE_DIR, events=None):
+    """
+    Return the incidence matrix and labels for a dimension, from the cache when the
+    snapshot hasn't changed since it was built.
+    """
+    key = _cache_key(db_path)
+    matrix_path = os.path.join(cache_dir, f'{dimension}.npz')
+    labels_path = os.path.join(cache_dir, f'{dimension}.json')
+    if os.path.exists(matrix_path) and os.path.exists(labels_path):
+        with open(labels_path, 'r') as file:
+            cached = json.load(file)
+        if cached['key'] == key:
+            return sparse.load_npz(matrix_path).tocsr(), np.asarray(cached['labels'], dtype=object)
+
+    if events is None:
+        events = snapshot.read_frame('events', EVENT_COLUMNS, db_path, refresh=False)
+    matrix, labels = build_incidence(events, dimension)
+    os.makedirs(cache_dir, exist_ok=True)
+    sparse.save_npz(matrix_path, matrix)
+    with open(labels_path, 'w') as file:
+        json.dump({'key': key, 'labels': [str(label) for label in labels]}, file)
+    return matrix, labels
+
+
+def cooccurrence(a, a_labels, b, b_labels, min_count=1, same_dimension=False):
+    """
+    Score every pair of labels that share at least min_count events.
+
+    counts = A.T @ B gives, for label i of A and label j of B, the number of events
+    linked to both. With n events and per-label totals a_i and b_j:
+        pmi     = log2(count * n / (a_i * b_j))   (> 0: together more often than chance)
+        jaccard = count / (a_i + b_j - count)
+
+    Returns:
+        DataFrame: source, target, count, pmi, jaccard; strongest counts first
+    """
+    n_events = a.shape[0]
+    counts = (a.T @ b).tocoo()
+    a_totals = np.asarray(a.sum(axis=0)).ravel()
+    b_totals = np.asarray(b.sum(axis=0)).ravel()
+
+    keep = counts.data >= min_count
+    if same_dimension:
+        keep &= counts.row < counts.col  # each unordered pair once, no self pairs
+    rows, cols, values = counts.row[keep], counts.col[keep], counts.data[keep].astype(float)
+
+    expected = a_totals[rows] * b_totals[cols]
+    edges = pd.DataFrame({
+        'source': a_labels[rows],
+        'target': b_labels[cols],
+        'count': values.astype(int),
+        'pmi': np.log2(values * n_events / expected),
+        'jaccard': values / (a_totals[rows] + b_totals[cols] - values),
+    })
+    return edges.sort_values(['count', 'pmi'], ascending=False, ignore_index=True)
+
+
+def analyze_cooccurrence(first, second=None, min_count=1, db_path=DB_PATH):
+    """Co-occurrence scores between two dimensions (or within one, if second is omitted)."""
+    second = second or first
+    a, a_labels = load_incidence(first, db_path)
+    b, b_labels = (a, a_labels) if second == first else load_incidence(second, db_path)
+    return cooccurrence(a, a_labels, b, b_labels, min_count, same_dimension=(second == first))
+
+
+def export_edges(edges, name, output_dir=EXPORT_DIR):
+    """Write an edge list CSV (source, target, count, pmi, jaccard) that Gephi and networkx can read."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'{name}.csv')
+    edges.to_csv(path, index=False)
+    print(f"✓ Exported {len(edges)} edges to {path}")
+    return path
+
+
+def benchmark(event_count, seed=8510):
+    """Build incidence matrices and score type x type and source x place for synthetic events."""
+    rng = np.random.default_rng(seed)
+    types = np.array(['Protest Report', 'Meeting Advertisement', 'Event Advertisement', 'Call to Action',
+                      'Meeting Report', 'Direct Advocacy', 'Oppression Report', 'Courses'])
+    first, second = rng.integers(0, len(types), event_count), rng.integers(0, len(types), event_count)
+    combined = np.where(rng.random(event_count) < 0.2,
+                        np.char.add(np.char.add(types[first], ','), types[second]), types[first])
+    events = pd.DataFrame({
+        'event_type': pd.Categorical(combined),  # categorical, like the snapshot's event_type
+        'city': pd.Categorical.from_codes(rng.integers(0, 2000, event_count), [f'City {i}' for i in range(2000)]),
+        'state': 'CA',
+        'country': 'USA',
+        'source_publication': pd.Categorical.from_codes(rng.integers(0, 300, event_count),
+                                                        [f'Source {i}' for i in range(300)]),
+    })
+    print(f"=== Co-occurrence benchmark on {event_count:,} events ===")
+    start = time.perf_counter()
+    type_matrix, type_labels = build_incidence(events, 'type')
+    place_matrix, place_labels = build_incidence(events, 'place')
+    source_matrix, source_labels = build_incidence(events, 'source')
+    built = time.perf_counter()
+    type_pairs = cooccurrence(type_matrix, type_labels, type_matrix, type_labels, same_dimension=True)
+    feeds = cooccurrence(source_matrix, source_labels, place_matrix, place_labels)
+    scored = time.perf_counter()
+    print(f"Incidence matrices: {built - start:.2f}s, scoring: {scored - built:.2f}s "
+          f"({len(type_pairs)} type pairs, {len(feeds)} source-place pairs)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sparse co-occurrence of event types, places and sources.")
+    parser.add_argument('pairs', nargs='*', default=['type:type', 'source:place', 'type:place'],
+                        help=f"dimension pairs to score, e.g. type:type or source:place ({', '.join(DIMENSIONS)})")
+    parser.add_argument('--min-count', type=int, default=1, help="leave out pairs seen in fewer events")
+    parser.add_argument('--top', type=int, default=10, help="pairs to print for each dimension pair")
+    parser.add_argument('--benchmark', type=int, metavar='EVENTS', help="time the engine on synthetic events")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        for pair in args.pairs:
+            first, _, second = pair.partition(':')
+            edges = analyze_cooccurrence(first, second or first, args.min_count)
+            print(f"\n=== {first} x {second or first}: top {args.top} of {len(edges)} pairs ===")
+            print(edges.head(args.top).to_string(index=False))
+            export_edges(edges, f'{first}_{second or first}')
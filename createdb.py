@@ -1,67 +1,179 @@
 # Amber Edwards
 # Sept 11, 2025
 # Creating the Database Structure
-# database - publications table - events table
+# database - publications table - events table - resources table
+# (the table definitions are functions so shard databases can reuse them, see sharding.py)
+# While the web app is running, use `python publish.py --reload` instead: it builds the
+# new database offline and swaps it in, rather than deleting zines.db first.
 
 import sqlite3
 import os
+import dedupe
+import changelog
 
-print("=== Creating Zines Database Structure ===")
-
-# Step 1: Delete the existing database file (if it exists)
-db_path = 'zines.db'
-if os.path.exists(db_path):
-    print("\nStep 1: Deleting existing zines.db...")
-    os.remove(db_path)
-    print("✓ Deleted existing zines.db")
-else:
-    print("\nStep 1: No existing zines.db found, skipping deletion.")
-
-# Step 2: Connect to zines.db (creates file if it doesn't exist)
-print("\nStep 2: Connecting to zines.db...")
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-print("✓ Connected to zines.db")
-
-# Step 3: Create publications table with updated schema
-print("\nStep 3: Creating publications table...")
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS publications (
-    pub_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique ID for each publication
-    pub_title TEXT NOT NULL,                 -- Title of the publication
-    volume INTEGER NOT NULL,                 -- Volume number
-    issue_number INTEGER NOT NULL,           -- Issue number within the volume
-    issue_date DATE,                         -- Full issue date (year, month, day)
-    volume_title TEXT,                       -- Title of the volume (if applicable)
-    author_org TEXT,                         -- Author or organization responsible for the publication
-    location TEXT                            -- Location associated with the publication
-)
-''')
-print("✓ Created publications table with updated schema")
-
-# Step 4: Create events table
-print("\nStep 4: Creating events table...")
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS events (
-    event_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique ID for each event
-    event_title TEXT NOT NULL,                  -- Title of the event
-    event_date DATE,                            -- Date of the event
-    description TEXT,                           -- Description of the event
-    city TEXT,                                  -- City where the event occurred
-    state TEXT,                                 -- State where the event occurred
-    country TEXT,                               -- Country where the event occurred
-    location TEXT,                              -- Specific location of the event (e.g., venue name)
-    address TEXT,                               -- Street address of the event
-    event_type TEXT,                            -- Type of event (e.g., conference, workshop)
-    publication_id INTEGER,                     -- Foreign key to publications table
-    source_publication TEXT,                    -- Source publication for the event if reprinted
-    FOREIGN KEY (publication_id) REFERENCES publications (pub_id)
-)
-''')
-print("✓ Created events table with all columns")
-
-# Step 5: Commit changes and close the connection
-print("\nStep 5: Saving changes and closing the database connection...")
-conn.commit()
-conn.close()
-print("✓ Database structure created successfully!")
\ No newline at end of file
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+
+def create_publications_table(cursor):
+    """Create the publications table."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS publications (
+        pub_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique ID for each publication
+        pub_title TEXT NOT NULL,                 -- Title of the publication
+        volume INTEGER NOT NULL,                 -- Volume number
+        issue_number INTEGER NOT NULL,           -- Issue number within the volume
+        issue_date DATE,                         -- Full issue date (year, month, day)
+        volume_title TEXT,                       -- Title of the volume (if applicable)
+        author_org TEXT,                         -- Author or organization responsible for the publication
+        location TEXT                            -- Location associated with the publication
+    )
+    ''')
+
+
+def create_events_table(cursor):
+    """Create the events table."""
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS events (
+        event_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique ID for each event
+        event_title TEXT NOT NULL,                  -- Title of the event
+        event_date DATE,                            -- Date of the event
+        description TEXT,                           -- Description of the event
+        city TEXT,                                  -- City where the event occurred
+        state TEXT,                                 -- State where the event occurred
+        country TEXT,                               -- Country where the event occurred
+        location TEXT,                              -- Specific location of the event (e.g., venue name)
+        address TEXT,                               -- Street address of the event
+        event_type TEXT,                            -- Type of event (e.g., conference, workshop)
+        publication_id INTEGER,                     -- Foreign key to publications table
+        source_publication TEXT,                    -- Source publication for the event if reprinted
+        {dedupe.content_key_column('events')}, -- Hash of all content columns, for duplicate prevention
+        FOREIGN KEY (publication_id) REFERENCES publications (pub_id)
+    )
+    ''')
+
+
+def create_resources_table(cursor):
+    """Create the resources table (same columns as resources.py recreate_resources_table)."""
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS resources (
+        resource_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique ID for each resource
+        resource_title TEXT,                           -- Title of the resource
+        volume INTEGER,                                -- Volume of the issue it appeared in
+        issue INTEGER,                                 -- Issue number it appeared in
+        resource_type TEXT,                            -- Type of resource (e.g., Bookstore, Service)
+        location TEXT,
+        address TEXT,
+        city TEXT,
+        state TEXT,
+        country TEXT,
+        source_publication TEXT,
+        description TEXT,
+        {dedupe.content_key_column('resources')} -- Hash of all content columns, for duplicate prevention
+    )
+    ''')
+
+
+def create_unique_indexes(cursor):
+    """Unique indexes so re-running an import can't insert the same row twice."""
+    cursor.execute(dedupe.unique_index_sql('events'))
+    cursor.execute(dedupe.unique_index_sql('resources'))
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_publications_natural_key
+    ON publications(pub_title, volume, issue_number)
+    ''')
+
+
+# Indexes behind the unique-location analyses (locationqueries.py): the location string
+# as an indexed expression, plus a covering index for grouping by city, state and country
+LOCATION_INDEXES = {
+    'idx_events_location_key': "events(city || ', ' || state || ', ' || country)",
+    'idx_events_place': 'events(city, state, country)',
+}
+
+
+def create_lookup_indexes(cursor):
+    """
+    Indexes for loading everything that came from one issue (the issue page in the web app)
+    and for the unique-location analyses.
+    """
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_publication_id ON events(publication_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_resources_volume_issue ON resources(volume, issue)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_publications_volume_issue ON publications(volume, issue_number)')
+    for index_name, target in LOCATION_INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {target}')
+
+
+def set_storage_options(conn):
+    """
+    Let maintenance.py hand free pages back to the file system (PRAGMA incremental_vacuum).
+    Only takes effect on a database with no tables yet; older ones switch on a full VACUUM.
+    """
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
+
+def create_tables(conn):
+    """
+    Create every table and index of the zines schema on an open connection.
+    Registers content_hash() on it (see dedupe.py), so the connection can also load rows.
+    """
+    dedupe.register_content_hash(conn)
+    set_storage_options(conn)
+    cursor = conn.cursor()
+    create_publications_table(cursor)
+    create_events_table(cursor)
+    create_resources_table(cursor)
+    create_unique_indexes(cursor)
+    create_lookup_indexes(cursor)
+    conn.commit()
+    changelog.ensure_change_log(conn)
+
+
+if __name__ == '__main__':
+    print("=== Creating Zines Database Structure ===")
+
+    # Step 1: Delete the existing database file (if it exists)
+    db_path = DB_PATH
+    if os.path.exists(db_path):
+        print("\nStep 1: Deleting existing zines.db...")
+        os.remove(db_path)
+        print("✓ Deleted existing zines.db")
+    else:
+        print("\nStep 1: No existing zines.db found, skipping deletion.")
+
+    # Step 2: Connect to zines.db (creates file if it doesn't exist)
+    print("\nStep 2: Connecting to zines.db...")
+    conn = dedupe.register_content_hash(sqlite3.connect(db_path))
+    set_storage_options(conn)
+    cursor = conn.cursor()
+    print("✓ Connected to zines.db")
+
+    # Step 3: Create publications table with updated schema
+    print("\nStep 3: Creating publications table...")
+    create_publications_table(cursor)
+    print("✓ Created publications table with updated schema")
+
+    # Step 4: Create events table
+    print("\nStep 4: Creating events table...")
+    create_events_table(cursor)
+    print("✓ Created events table with all columns")
+
+    # Step 5: Create resources table
+    print("\nStep 5: Creating resources table...")
+    create_resources_table(cursor)
+    print("✓ Created resources table")
+
+    create_unique_indexes(cursor)
+    print("✓ Created unique indexes for duplicate prevention")
+
+    create_lookup_indexes(cursor)
+    print("✓ Created indexes for looking up an issue's events and resources")
+
+    changelog.ensure_change_log(conn)
+    print("✓ Created change_log and its triggers")
+
+    # Step 6: Commit changes and close the connection
+    print("\nStep 6: Saving changes and closing the database connection...")
+    conn.commit()
+    conn.close()
+    print("✓ Database structure created successfully!")
@@ -0,0 +1,265 @@
+# Duplicate Prevention for zines.db
+# Adds a generated content_key column with a UNIQUE index to events and resources, so
+# re-running importdata.py or resources.py can't insert the same row twice
+# (importers use INSERT ... ON CONFLICT DO NOTHING). Running this file is the one-off
+# migration for an existing database: it removes the duplicates already there using
+# the key, then creates the unique indexes.
+#
+# The key is a 64-bit hash of the row's canonical form, computed by content_hash(), a
+# Python function. Any connection that inserts or updates events or resources (or runs
+# VACUUM or integrity_check) must call register_content_hash(conn) first; reading works
+# everywhere, the sqlite3 shell included.
+
+import hashlib
+import re
+import sqlite3
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Columns that make two rows "the same" (everything except the primary key).
+# The events list matches the GROUP BY of the old delete_duplicate_events in editdata.py.
+CONTENT_COLUMNS = {
+    'events': ['event_title', 'description', 'publication_id', 'event_date', 'city', 'state',
+               'country', 'event_type', 'location', 'address', 'source_publication'],
+    'resources': ['resource_title', 'volume', 'issue', 'resource_type', 'location', 'address',
+                  'city', 'state', 'country', 'source_publication', 'description'],
+}
+
+PRIMARY_KEYS = {
+    'events': 'event_id',
+    'resources': 'resource_id',
+}
+
+# Natural key for publications; only enforced if the table has no duplicates yet
+PUBLICATION_KEY = ['pub_title', 'volume', 'issue_number']
+
+
+def content_hash(canonical):
+    """
+    64-bit BLAKE2b hash of a row's canonical form, as a signed integer so it fits an
+    SQLite INTEGER. Registered on connections as the SQL function content_hash().
+    """
+    digest = hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def register_content_hash(conn):
+    """Make content_hash() available to SQL on conn (needed to write events and resources)."""
+    conn.create_function('content_hash', 1, content_hash, deterministic=True)
+    return conn
+
+
+def content_key_expression(table, expressions=None):
+    """
+    SQL expression for a table's content key.
+
+    The canonical form is the quote()d value of every content column joined with commas:
+    quote() keeps NULL and 'NULL' apart and escapes quotes, so two rows have the same
+    canonical form only if every column matches. Only its hash is stored and indexed,
+    not a second copy of the row's text. Pass expressions (one per content column, in
+    CONTENT_COLUMNS order) to build the key of a row that isn't in the table yet.
+    """
+    if expressions is None:
+        expressions = CONTENT_COLUMNS[table]
+    canonical = " || ',' || ".join(f'quote({expression})' for expression in expressions)
+    return f'content_hash({canonical})'
+
+
+def content_key_column(table):
+    """
+    Column definition for the generated content_key column (for CREATE TABLE).
+
+    STORED, so reading a row never needs content_hash(). ALTER TABLE can't add a stored
+    column, which is why add_content_keys() rebuilds older tables instead.
+    """
+    return f'content_key INTEGER GENERATED ALWAYS AS ({content_key_expression(table)}) STORED'
+
+
+def has_hashed_key(conn, table):
+    """Whether a table already has the hashed (INTEGER, stored) content_key column."""
+    for row in conn.execute(f'PRAGMA table_xinfo({table})'):
+        if row[1] == 'content_key':
+            return row[2].upper() == 'INTEGER'
+    return False
+
+
+def missing_unique_keys(conn):
+    """
+    The unique keys that ON CONFLICT DO NOTHING relies on and that conn's database lacks:
+    the hashed content_key and its index on events and resources, and the natural key
+    index on publications. An empty list means re-imports can't duplicate rows.
+    """
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    missing = []
+    for table in PRIMARY_KEYS:
+        if _table_exists(conn, table) and not (has_hashed_key(conn, table)
+                                               and f'idx_{table}_content_key' in indexes):
+            missing.append(f'{table}.content_key')
+    if _table_exists(conn, 'publications') and 'idx_publications_natural_key' not in indexes:
+        missing.append('idx_publications_natural_key')
+    return missing
+
+
+def unique_index_sql(table):
+    """CREATE statement for the UNIQUE index on a table's content key."""
+    return f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_content_key ON {table}(content_key)'
+
+
+def _columns(conn, table):
+    """Column names of a table in table order, including generated columns."""
+    return [row[1] for row in conn.execute(f'PRAGMA table_xinfo({table})')]
+
+
+def _table_exists(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def _split_definitions(create_sql):
+    """
+    Return the column and constraint definitions between the outer parentheses of a
+    CREATE TABLE statement. Commas inside parentheses, quotes or comments don't split.
+    """
+    start = create_sql.index('(')
+    definitions = []
+    depth = 0
+    position = item_start = start + 1
+    while position < len(create_sql):
+        char = create_sql[position]
+        if create_sql.startswith('--', position):
+            newline = create_sql.find('\n', position)
+            position = len(create_sql) if newline == -1 else newline
+        elif create_sql.startswith('/*', position):
+            position = create_sql.index('*/', position) + 1
+        elif char in '\'"`[':
+            position = create_sql.index(']' if char == '[' else char, position + 1)
+        elif char == '(':
+            depth += 1
+        elif char == ')' and depth:
+            depth -= 1
+        elif char in ',)':
+            definitions.append(create_sql[item_start:position])
+            item_start = position + 1
+            if char == ')':
+                break
+        position += 1
+    return definitions
+
+
+def _first_word(definition):
+    """First word of a column or constraint definition, skipping leading comments."""
+    text = re.sub(r'--[^\n]*|/\*.*?\*/', ' ', definition, flags=re.S).strip()
+    return text.split(None, 1)[0].strip('"`[]').lower() if text else ''
+
+
+def _rebuild_with_content_key(conn, table):
+    """
+    Rebuild a table with the hashed content_key column, since ALTER TABLE can't add a
+    stored generated column. Follows SQLite's procedure for other schema changes:
+    create the new table, copy the rows, drop the old table, rename the new one and
+    recreate the old table's indexes and triggers (the change_log triggers among them).
+    An older quote()d content_key and its index are replaced. Call inside a transaction.
+    """
+    create_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    dependents = conn.execute('''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''', (table,)).fetchall()
+    sequence = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+
+    definitions = [definition for definition in _split_definitions(create_sql)
+                   if _first_word(definition) != 'content_key']
+    # The new column goes after the last column, before the table constraints
+    constraint_words = {'constraint', 'primary', 'unique', 'check', 'foreign'}
+    column_count = sum(1 for definition in definitions if _first_word(definition) not in constraint_words)
+    column = f'\n    {content_key_column(table)}'
+    if column_count < len(definitions):
+        # A comment after the previous column's comma stays on that column's line
+        comment = re.match(r'[ \t]*--[^\n]*', definitions[column_count])
+        if comment:
+            column = comment.group(0) + column
+            definitions[column_count] = definitions[column_count][comment.end():]
+    definitions.insert(column_count, column)
+    columns = ', '.join(column for column in _columns(conn, table) if column != 'content_key')
+
+    rebuilt = f'{table}_rebuild'
+    if not conn.in_transaction:
+        conn.execute('BEGIN')  # so the CREATE TABLE is rolled back with the rest on failure
+    conn.execute(f"CREATE TABLE {rebuilt} ({','.join(definitions)})")
+    conn.execute(f'INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table}')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {rebuilt} RENAME TO {table}')
+    if sequence is not None:
+        # Keep the AUTOINCREMENT high-water mark, so ids of deleted rows are never reused
+        conn.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ?', (sequence[0], table))
+    for kind, name, sql in dependents:
+        if name != f'idx_{table}_content_key':  # recreated on the new key once duplicates are gone
+            conn.execute(sql)
+
+
+def add_content_keys(db_path=DB_PATH):
+    """
+    One-off migration: add the hashed content_key to events and resources (replacing
+    an older quote()d one), delete existing duplicates (keeping the lowest id of each),
+    and create the UNIQUE indexes. Safe to run more than once.
+
+    Returns:
+        dict: Number of duplicate rows deleted per table.
+    """
+    conn = register_content_hash(sqlite3.connect(db_path))
+    deleted = {}
+    try:
+        for table, primary_key in PRIMARY_KEYS.items():
+            if not _table_exists(conn, table):
+                print(f"Table {table} doesn't exist, skipping.")
+                continue
+            with conn:
+                if not has_hashed_key(conn, table):
+                    _rebuild_with_content_key(conn, table)
+                    print(f"✓ Rebuilt {table} with a hashed content_key column")
+
+                # One sort over the key instead of the NOT IN (SELECT MIN(...) GROUP BY 11 columns) scan
+                cursor = conn.execute(f'''
+                    DELETE FROM {table}
+                    WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid,
+                                   ROW_NUMBER() OVER (PARTITION BY content_key ORDER BY {primary_key}) AS copy_number
+                            FROM {table}
+                        )
+                        WHERE copy_number > 1
+                    )
+                ''')
+                deleted[table] = cursor.rowcount
+                conn.execute(unique_index_sql(table))
+            print(f"✓ {table}: removed {deleted[table]} duplicate rows, unique content key index in place")
+
+        # Publications: a natural-key unique index, unless merging duplicates is needed first
+        duplicate_publications = conn.execute(f'''
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM publications GROUP BY {', '.join(PUBLICATION_KEY)} HAVING COUNT(*) > 1
+            )
+        ''').fetchone()[0]
+        if duplicate_publications:
+            print(f"❌ {duplicate_publications} publications are listed more than once; "
+                  "merge them by hand before a unique index can be added.")
+        else:
+            with conn:
+                conn.execute(f'''
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_publications_natural_key
+                    ON publications({', '.join(PUBLICATION_KEY)})
+                ''')
+            print("✓ publications: unique (pub_title, volume, issue_number) index in place")
+    except sqlite3.Error as e:
+        print(f"❌ Error while adding content keys: {e}")
+    finally:
+        conn.close()
+    return deleted
+
+
+if __name__ == '__main__':
+    print("=== Adding Content Keys to zines.db ===")
+    add_content_keys()
@@ -1,38 +1,33 @@
-#import sqlite3
+# -------- rename an event type --------
+# Goes through bulkedit like delete_events below, so the update is previewed,
+# journaled and resumable
+import sqlite3
+import bulkedit
 
 # Path to the SQLite database
-#DB_PATH = 'zines.db'
+DB_PATH = 'zines.db'
 
-#def update_event_type():
-#    """
-#    Update all entries in the events table where event_type is 'Advocacy'
-#    and change it to 'Direct Advocacy'.
-#    """
-#    try:
-#        # Connect to the database
-#        conn = sqlite3.connect(DB_PATH)
-#        cursor = conn.cursor()
-#
-#        # Execute the update query
-#        cursor.execute('''
-#            UPDATE events
-#            SET event_type = 'Direct Advocacy'
-#            WHERE event_type = 'Advocacy';
-#        ''')
-#
-#        # Commit the changes and close the connection
-#        conn.commit()
-#        print("Successfully updated event_type from 'Advocacy' to 'Direct Advocacy'.")
-#    except Exception as e:
-#        print(f"An error occurred: {e}")
-#    finally:
-#        conn.close()
+def update_event_type(old_type='Advocacy', new_type='Direct Advocacy'):
+    """
+    Update all entries in the events table where event_type is old_type
+    and change it to new_type ('Advocacy' -> 'Direct Advocacy' by default).
+    """
+    expression = "event_type = '{}'".format(old_type.replace("'", "''"))
+
+    try:
+        count, _ = bulkedit.preview('events', expression, db_path=DB_PATH)
+        print(f"{count} events match: {expression}")
+        updated = bulkedit.bulk_update('events', expression, 'event_type', new_type, db_path=DB_PATH)
+        print(f"Successfully updated event_type from '{old_type}' to '{new_type}' ({updated} rows).")
+    except (bulkedit.FilterError, sqlite3.Error) as e:
+        print(f"An error occurred: {e}")
 
-# Run the function
+# Run the function (already applied to zines.db)
 #if __name__ == '__main__':
 #    update_event_type()
 
 # ------------------delete any duplicates-----------------------
+# (replaced by dedupe.py, which prevents duplicates with a unique content_key index)
 
 #import sqlite3
 
@@ -68,7 +63,9 @@
 #    delete_duplicate_events()
 
 # -------- delete NULL rows--------
+# Now goes through bulkedit so the delete is previewed, journaled and resumable
 import sqlite3
+import bulkedit
 
 # Path to the SQLite database
 DB_PATH = 'zines.db'
@@ -77,21 +74,15 @@ def delete_events():
     """
     Delete rows with event_id between 289 and 405 (inclusive) from the 'events' table.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    expression = 'event_id BETWEEN 289 AND 405'
 
     try:
-        # Delete rows with event_id between 289 and 405
-        cursor.execute('''
-            DELETE FROM events
-            WHERE event_id BETWEEN 289 AND 405
-        ''')
-        conn.commit()
-        print("Events with event_id between 289 and 405 have been deleted successfully.")
-    except sqlite3.Error as e:
+        count, _ = bulkedit.preview('events', expression, db_path=DB_PATH)
+        print(f"{count} events match: {expression}")
+        deleted = bulkedit.bulk_delete('events', expression, db_path=DB_PATH)
+        print(f"Events with event_id between 289 and 405 have been deleted successfully ({deleted} rows).")
+    except (bulkedit.FilterError, sqlite3.Error) as e:
         print(f"Error while deleting events: {e}")
-    finally:
-        conn.close()
 
 if __name__ == '__main__':
     delete_events()
\ No newline at end of file
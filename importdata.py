@@ -5,31 +5,68 @@
 
 import sqlite3
 import csv
+import dedupe
+
+import maintenance
 
 # File paths for the database and CSV files
 database_file = 'zines.db'
 publications_csv = 'babepubs.csv'
 events_csv = 'babeevents.csv'
 
-print("=== Importing Data into zines.db ===")
+# Report progress every this many CSV rows
+PROGRESS_EVERY = 50
+
+def import_data(database_file=database_file, publications_csv=publications_csv, events_csv=events_csv,
+                progress=None):
+    """
+    Import the publications and events CSVs into database_file (publish.py reuses this to build a fresh database).
+    progress is an optional callback called as progress(rows_done, rows_total) every PROGRESS_EVERY rows.
+    """
+    print("=== Importing Data into zines.db ===")
+
+    # Step 1: Connect to the SQLite database
+    print("\nStep 1: Connecting to zines.db...")
+    conn = dedupe.register_content_hash(sqlite3.connect(database_file))  # computes each row's content_key
+    print("✓ Connected to zines.db")
 
-# Step 1: Connect to the SQLite database
-print("\nStep 1: Connecting to zines.db...")
-conn = sqlite3.connect(database_file)
-cursor = conn.cursor()
-print("✓ Connected to zines.db")
+    # Without the unique keys ON CONFLICT DO NOTHING never fires and every row would be imported twice
+    missing = dedupe.missing_unique_keys(conn)
+    if missing:
+        print(f"\nAdding the unique keys re-imports rely on (missing: {', '.join(missing)})...")
+        conn.close()
+        dedupe.add_content_keys(database_file)
+        conn = dedupe.register_content_hash(sqlite3.connect(database_file))
+        missing = dedupe.missing_unique_keys(conn)
+        if missing:
+            conn.close()
+            raise sqlite3.IntegrityError(
+                f"{database_file} still lacks {', '.join(missing)}; fix the duplicates dedupe.py reported "
+                "before importing, or the import would duplicate rows")
+    cursor = conn.cursor()
 
-# Step 2: Import data into the publications table
-print("\nStep 2: Importing data into the publications table...")
-try:
+    # Read both CSVs up front so progress can be reported against the total
     with open(publications_csv, 'r') as file:
-        reader = csv.DictReader(file)  # Use DictReader to map column names
-        for row in reader:
+        publication_rows = list(csv.DictReader(file))  # Use DictReader to map column names
+    with open(events_csv, 'r') as file:
+        event_rows = list(csv.DictReader(file))
+    rows_total = len(publication_rows) + len(event_rows)
+    rows_done = 0
+
+    def report_progress():
+        if progress and (rows_done % PROGRESS_EVERY == 0 or rows_done == rows_total):
+            progress(rows_done, rows_total)
+
+    # Step 2: Import data into the publications table
+    print("\nStep 2: Importing data into the publications table...")
+    try:
+        for row in publication_rows:
             # Combine year, month, and day into a single date string (YYYY-MM-DD)
             issue_date = f"{row['issue_year']}-{row['issue_month'].zfill(2)}-{row['issue_day'].zfill(2)}"
             cursor.execute('''
                 INSERT INTO publications (pub_title, volume, issue_number, issue_date, volume_title, author_org, location)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT DO NOTHING  -- already imported
             ''', (
                 row['pub_title'], 
                 row['volume'], 
@@ -39,16 +76,16 @@ try:
                 row['author_org'], 
                 row['location']
             ))
-    print("✓ Imported data into the publications table")
-except Exception as e:
-    print(f"Error importing data into publications table: {e}")
+            rows_done += 1
+            report_progress()
+        print("✓ Imported data into the publications table")
+    except Exception as e:
+        print(f"Error importing data into publications table: {e}")
 
-# Step 3: Import data into the events table
-print("\nStep 3: Importing data into the events table...")
-try:
-    with open(events_csv, 'r') as file:
-        reader = csv.DictReader(file)  # Use DictReader to map column names
-        for row in reader:
+    # Step 3: Import data into the events table
+    print("\nStep 3: Importing data into the events table...")
+    try:
+        for row in event_rows:
             # Combine year, month, and day into a single date string (YYYY-MM-DD)
             event_date = f"{row['event_year']}-{row['event_month'].zfill(2)}-{row['event_date'].zfill(2)}"
 
@@ -65,15 +102,32 @@ try:
                 cursor.execute('''
                     INSERT INTO events (publication_id, event_title, event_type, event_date, location, address, city, state, country, description, source_publication)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT DO NOTHING  -- already imported (same content_key)
                 ''', (publication_id, row['event_title'], row['event_type'], event_date, row['location'], row['address'], row['city'], row['state'], row['country'], row['description'], row['source_publication']))
             else:
                 print(f"Warning: No matching publication found for event: {row['event_title']} (Volume: {row['volume']}, Issue: {row['issue_number']})")
-    print("✓ Data imported into events table")
-except Exception as e:
-    print(f"Error importing data into events table: {e}")
-
-# Step 4: Commit changes and close the connection
-print("\nStep 4: Saving changes and closing the database connection...")
-conn.commit()
-conn.close()
-print("✓ Data imported successfully!")
\ No newline at end of file
+            rows_done += 1
+            report_progress()
+        print("✓ Data imported into events table")
+    except Exception as e:
+        print(f"Error importing data into events table: {e}")
+
+    # Step 4: Commit changes and close the connection
+    print("\nStep 4: Saving changes and closing the database connection...")
+    conn.commit()
+    conn.close()
+    print("✓ Data imported successfully!")
+
+    # Step 5: Fresh planner statistics and free pages returned after the load
+    print("\nStep 5: Updating statistics...")
+    maintenance.after_load(database_file)
+
+if __name__ == '__main__':
+    import publish  # publish.py imports this module for its full reload, so only the script needs it
+
+    try:
+        import_data()
+    except sqlite3.IntegrityError as e:
+        print(f"❌ Import stopped: {e}")
+    else:
+        publish.refresh_snapshot()  # so a running web app shows the new rows
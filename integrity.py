@@ -0,0 +1,231 @@
+# Referential Integrity Checker for zines.db
+# PRAGMA foreign_keys was never switched on, so nothing stopped an event pointing at a
+# publication that doesn't exist, the add-event form storing '' as a publication id, or
+# an edit saving a date SQLite can't read. This script finds those rows with set-based
+# queries (NOT EXISTS anti-joins and one scan per check, never a Python loop over rows),
+# reports how many each check found with a few examples, and repairs the ones a rule
+# covers in batched transactions:
+#
+# - publication ids stored as text: digits become the integer id, anything else NULL
+# - blank event dates become 'NA-NA-NA' and blank issue dates 'NA' (what the edit form saves)
+# - with --unlink-orphans, publication ids pointing at no publication become NULL
+#
+# Resources without (or with more than one) publication for their volume/issue, and
+# dates in no known format, are reported for a person to fix.
+#
+# Examples:
+#   python integrity.py                    # report only
+#   python integrity.py --repair           # report, then repair what the rules cover
+
+import argparse
+import sqlite3
+import time
+
+import dedupe
+import publish
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Rows repaired per transaction
+BATCH_SIZE = 5000
+
+# Rows shown per problem in the report
+SAMPLE_SIZE = 5
+
+# Dates the app reads: real dates, plus the importer's partial dates with NA for unknown parts
+VALID_DATE = '''({column} IS NULL OR date({column}) IS {column} OR {column} = 'NA-NA-NA'
+    OR (({column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-NA' AND substr({column}, 6, 2) BETWEEN '01' AND '12')
+        OR {column} GLOB '[0-9][0-9][0-9][0-9]-NA-NA'))'''
+
+# Every check: the table, a WHERE clause for the bad rows, the columns shown for them,
+# and the repair (a SET clause) if there is a rule for it. Checks with a `flag` only
+# repair when that option is given.
+CHECKS = [
+    {
+        'name': 'events_bad_publication_id',
+        'description': 'Events whose publication id is text, not an integer',
+        'table': 'events',
+        'where': "publication_id IS NOT NULL AND typeof(publication_id) != 'integer'",
+        'show': ['event_id', 'event_title', 'publication_id'],
+        # The id if the text is digits naming an existing publication, otherwise no publication
+        'repair': '''publication_id = (SELECT p.pub_id FROM publications p
+                                       WHERE trim(events.publication_id) != ''
+                                         AND trim(events.publication_id) NOT GLOB '*[^0-9]*'
+                                         AND p.pub_id = CAST(trim(events.publication_id) AS INTEGER))''',
+    },
+    {
+        'name': 'events_orphaned',
+        'description': 'Events linked to a publication that does not exist',
+        'table': 'events',
+        'where': '''typeof(publication_id) = 'integer'
+                    AND NOT EXISTS (SELECT 1 FROM publications p WHERE p.pub_id = events.publication_id)''',
+        'show': ['event_id', 'event_title', 'publication_id'],
+        'repair': 'publication_id = NULL',
+        'flag': 'unlink_orphans',
+    },
+    {
+        'name': 'events_without_publication',
+        'description': 'Events not linked to any publication',
+        'table': 'events',
+        'where': 'publication_id IS NULL',
+        'show': ['event_id', 'event_title', 'source_publication'],
+    },
+    {
+        'name': 'events_blank_date',
+        'description': 'Events with a blank date',
+        'table': 'events',
+        'where': "event_date IS NOT NULL AND trim(event_date) = ''",
+        'show': ['event_id', 'event_title', 'event_date'],
+        'repair': "event_date = 'NA-NA-NA'",
+    },
+    {
+        'name': 'events_invalid_date',
+        'description': 'Events with a date in no known format',
+        'table': 'events',
+        'where': f"trim(event_date) != '' AND NOT {VALID_DATE.format(column='event_date')}",
+        'show': ['event_id', 'event_title', 'event_date'],
+    },
+    {
+        'name': 'publications_blank_issue_date',
+        'description': 'Publications with a blank issue date',
+        'table': 'publications',
+        'where': "issue_date IS NOT NULL AND trim(issue_date) = ''",
+        'show': ['pub_id', 'pub_title', 'volume', 'issue_number', 'issue_date'],
+        'repair': "issue_date = 'NA'",
+    },
+    {
+        'name': 'publications_invalid_issue_date',
+        'description': 'Publications with an issue date in no known format',
+        'table': 'publications',
+        'where': f'''trim(issue_date) != '' AND issue_date != 'NA'
+                     AND NOT {VALID_DATE.format(column='issue_date')}''',
+        'show': ['pub_id', 'pub_title', 'issue_date'],
+    },
+    {
+        'name': 'resources_incomplete_issue',
+        'description': 'Resources with a volume but no issue, or an issue but no volume',
+        'table': 'resources',
+        'where': '(volume IS NULL) != (issue IS NULL)',
+        'show': ['resource_id', 'resource_title', 'volume', 'issue'],
+    },
+    {
+        'name': 'resources_orphaned',
+        'description': 'Resources whose volume/issue matches no publication',
+        'table': 'resources',
+        'where': '''volume IS NOT NULL AND issue IS NOT NULL
+                    AND NOT EXISTS (SELECT 1 FROM publications p
+                                    WHERE p.volume = resources.volume AND p.issue_number = resources.issue)''',
+        'show': ['resource_id', 'resource_title', 'volume', 'issue'],
+    },
+    {
+        'name': 'resources_ambiguous_issue',
+        'description': 'Resources whose volume/issue matches more than one publication',
+        'table': 'resources',
+        'where': '''(SELECT COUNT(*) FROM publications p
+                     WHERE p.volume = resources.volume AND p.issue_number = resources.issue) > 1''',
+        'show': ['resource_id', 'resource_title', 'volume', 'issue'],
+    },
+]
+
+
+def _table_exists(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def count_problems(conn, check):
+    """Number of rows a check finds, and the first few of them."""
+    count = conn.execute(f"SELECT COUNT(*) FROM {check['table']} WHERE {check['where']}").fetchone()[0]
+    samples = conn.execute(
+        f"SELECT {', '.join(check['show'])} FROM {check['table']} WHERE {check['where']} LIMIT ?",
+        (SAMPLE_SIZE,)).fetchall() if count else []
+    return count, samples
+
+
+def repair(conn, check, batch_size=BATCH_SIZE):
+    """
+    Apply a check's repair to its rows, batch_size rowids per transaction.
+    UPDATE OR IGNORE skips a row whose repaired form would duplicate another row
+    (its content_key is UNIQUE); such rows stay in the report.
+
+    Returns:
+        int: Rows repaired
+    """
+    table, where = check['table'], check['where']
+    repaired = 0
+    last_rowid = 0
+    while True:
+        chunk_end = conn.execute(f'''
+            SELECT MAX(rowid) FROM (
+                SELECT rowid FROM {table} WHERE rowid > ? AND {where} ORDER BY rowid LIMIT ?
+            )
+        ''', (last_rowid, batch_size)).fetchone()[0]
+        if chunk_end is None:
+            return repaired
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE OR IGNORE {table} SET {check['repair']} WHERE rowid > ? AND rowid <= ? AND {where}",
+                (last_rowid, chunk_end))
+        repaired += cursor.rowcount
+        last_rowid = chunk_end
+
+
+def check_integrity(db_path=DB_PATH, fix=False, unlink_orphans=False, progress=None):
+    """
+    Run every check, repair what the rules allow if fix is set, and print a report.
+
+    Args:
+        db_path (str): Database to check.
+        fix (bool): Repair the problems that have a rule.
+        unlink_orphans (bool): Also set publication ids pointing at no publication to NULL.
+        progress: Optional callback called as progress(checks_done, checks_total).
+
+    Returns:
+        dict: Per check, the rows found, repaired and still left
+    """
+    options = {'unlink_orphans': unlink_orphans}
+    conn = dedupe.register_content_hash(sqlite3.connect(db_path, timeout=30))  # repairs update rows
+    results = {}
+    try:
+        checks = [check for check in CHECKS if _table_exists(conn, check['table'])]
+        for number, check in enumerate(checks, start=1):
+            start = time.perf_counter()
+            found, samples = count_problems(conn, check)
+            repaired = 0
+            can_repair = check.get('repair') and options.get(check.get('flag'), True)
+            if fix and found and can_repair:
+                repaired = repair(conn, check)
+            left = count_problems(conn, check)[0] if repaired else found
+            results[check['name']] = {'found': found, 'repaired': repaired, 'left': left}
+
+            mark = '✓' if not left else '❌'
+            print(f"{mark} {check['description']}: {found} found"
+                  + (f", {repaired} repaired" if repaired else '')
+                  + (f", {left} left" if repaired and left else '')
+                  + f" ({time.perf_counter() - start:.2f}s)")
+            for sample in samples if left else []:
+                print(f"    {sample}")
+            if left and check.get('repair') and not (fix and can_repair):
+                option = '--repair --unlink-orphans' if check.get('flag') else '--repair'
+                print(f"    (repairable with {option})")
+            if progress:
+                progress(number, len(checks))
+    finally:
+        conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check zines.db for broken links and invalid values.")
+    parser.add_argument('--db', default=DB_PATH, help="database to check")
+    parser.add_argument('--repair', action='store_true', help="repair the problems a rule covers")
+    parser.add_argument('--unlink-orphans', action='store_true',
+                        help="with --repair, set publication ids that point at no publication to NULL")
+    args = parser.parse_args()
+
+    print("=== Checking Referential Integrity ===")
+    check_integrity(args.db, fix=args.repair, unlink_orphans=args.unlink_orphans)
+    if args.repair and args.db == DB_PATH:
+        publish.refresh_snapshot()  # the web app's snapshot is a copy of zines.db
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Per-Issue Event Statistics Engine
+History 8510 - Clemson University
+
+Computes, in one pass over the events table, the number of events of each type
+for every (pub_title, volume, issue_number) x event type x place, together with
+running totals and issue-over-issue deltas computed with window functions.
+
+This replaces per-question queries like analyze_event_advertisements_and_protests,
+which scan events once per COUNT(CASE WHEN event_type LIKE '%...%'). Any filter can
+be applied with the same expressions bulkedit.py accepts, e.g.
+    city IN ('Berkeley', 'San Francisco')
+"""
+
+import sqlite3
+import pandas as pd
+
+import bulkedit
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Columns events can be broken down by
+PLACE_COLUMNS = ('city', 'state', 'country')
+
+# Indexes used by the join to publications and by the usual place filters
+STATS_INDEXES = {
+    'idx_events_publication_id': 'events(publication_id)',
+    'idx_events_city': 'events(city)',
+}
+
+# Event types are stored comma separated ('Protest Report,Advocacy'), so the recursive
+# CTE splits them into one row per type before counting, in the same pass as the filter.
+STATS_QUERY = """
+WITH RECURSIVE
+    filtered_events AS (
+        SELECT event_id, publication_id, event_type, {place_expression} AS place
+        FROM events
+        WHERE {event_filter}
+    ),
+    filtered_publications AS (
+        SELECT pub_id, pub_title, volume, issue_number
+        FROM publications
+        WHERE {publication_filter}
+    ),
+    split_types(pub_title, volume, issue_number, place, event_type, rest) AS (
+        SELECT p.pub_title, p.volume, p.issue_number, e.place, NULL, COALESCE(e.event_type, '') || ','
+        FROM filtered_events e
+        JOIN filtered_publications p ON e.publication_id = p.pub_id
+        UNION ALL
+        SELECT pub_title, volume, issue_number, place,
+               TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1)),
+               SUBSTR(rest, INSTR(rest, ',') + 1)
+        FROM split_types
+        WHERE rest != ''
+    ),
+    issue_counts AS (
+        SELECT pub_title, volume, issue_number, event_type, place, COUNT(*) AS event_count
+        FROM split_types
+        WHERE event_type IS NOT NULL AND event_type != '' {type_filter}
+        GROUP BY pub_title, volume, issue_number, event_type, place
+    )
+SELECT
+    pub_title AS publication_title,
+    volume AS volume_number,
+    issue_number,
+    event_type,
+    place,
+    event_count,
+    SUM(event_count) OVER type_place AS running_total,
+    event_count - COALESCE(LAG(event_count) OVER type_place, 0) AS issue_delta,
+    SUM(event_count) OVER (PARTITION BY pub_title, volume, issue_number, place) AS issue_place_total
+FROM issue_counts
+WINDOW type_place AS (PARTITION BY pub_title, event_type, place ORDER BY volume, issue_number)
+ORDER BY pub_title, volume, issue_number, place, event_type
+"""
+
+
+def ensure_stats_indexes(conn):
+    """Create the indexes the stats query relies on if they don't exist yet."""
+    for index_name, target in STATS_INDEXES.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {target}')
+    conn.commit()
+
+
+def per_issue_stats(conn, event_filter=None, publication_filter=None, event_types=None, place='city'):
+    """
+    Count events per issue x event type x place in a single query.
+
+    Args:
+        conn: An open connection to zines.db.
+        event_filter (str): Optional filter on events, e.g. "city IN ('Berkeley', 'San Francisco')".
+        publication_filter (str): Optional filter on publications, e.g. "volume = 1".
+        event_types (list): Only count these event types (after splitting combined types).
+        place (str): 'city', 'state', 'country', or None to count across all places.
+
+    Returns:
+        DataFrame: One row per (issue, event type, place) with event_count, running_total
+        (cumulative count over issues for that type and place), issue_delta (change since
+        the previous issue where that type and place appeared) and issue_place_total
+        (all counted types in that issue and place; an event with two types counts twice).
+    """
+    if place is not None and place not in PLACE_COLUMNS:
+        raise ValueError(f"place must be one of {PLACE_COLUMNS} or None")
+
+    params = []
+    event_sql = '1'
+    if event_filter:
+        event_sql, event_params = bulkedit.parse_filter(conn, 'events', event_filter)
+        params.extend(event_params)
+    publication_sql = '1'
+    if publication_filter:
+        publication_sql, publication_params = bulkedit.parse_filter(conn, 'publications', publication_filter)
+        params.extend(publication_params)
+    type_sql = ''
+    if event_types:
+        type_sql = f"AND event_type IN ({', '.join('?' for _ in event_types)})"
+        params.extend(event_types)
+
+    query = STATS_QUERY.format(
+        place_expression=place if place else "'All'",
+        event_filter=event_sql,
+        publication_filter=publication_sql,
+        type_filter=type_sql,
+    )
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def analyze_per_issue_stats(event_filter=None, publication_filter=None, event_types=None, place='city'):
+    """Print per-issue statistics for the given filters."""
+
+    print("=== Per-Issue Event Statistics ===")
+    print("History 8510 - Clemson University")
+    print("=" * 60)
+
+    # Connect to zines.db database
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        print("✓ Connected to Zines database (zines.db)")
+    except sqlite3.Error as e:
+        print(f"❌ Database connection error: {e}")
+        return
+
+    try:
+        ensure_stats_indexes(conn)
+        df = per_issue_stats(conn, event_filter, publication_filter, event_types, place)
+
+        print("\nEvent Counts by Issue, Type and Place:")
+        print(df.to_string(index=False))
+        return df
+    except (sqlite3.Error, bulkedit.FilterError) as e:
+        print(f"❌ Query execution error: {e}")
+    finally:
+        # Close the database connection
+        conn.close()
+        print("\n✓ Database connection closed.")
+
+# Same question as analyze_event_advertisements_and_protests, answered by the engine
+if __name__ == "__main__":
+    analyze_per_issue_stats(
+        event_filter="city IN ('Berkeley', 'San Francisco')",
+        event_types=['Event Advertisement', 'Protest Report'],
+    )
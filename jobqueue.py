@@ -0,0 +1,429 @@
+# Background Job Queue
+# Runs imports, table moves, bulk edits, reprint detection, integrity repairs, publishing
+# and report generation in worker processes instead of a terminal or a web request.
+# Jobs are rows in jobs.db (SQLite, no broker): the web app inserts them, workers claim
+# them one at a time and record progress there, and the /jobs pages show it.
+#
+# Jobs that write to zines.db never run at the same time as each other (SQLite has
+# one writer anyway); read-only jobs like reports and publishing run alongside them.
+#
+# Start workers by hand with `python jobqueue.py --workers 2`, or let the web app start
+# them when a job is submitted (they exit again after sitting idle for a minute).
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import bulkedit
+import importdata
+import integrity
+import maintenance
+import publish
+import reclassify
+import reportrunner
+import reprints
+import resources
+
+# Path to the job database and the database the jobs work on
+JOBS_DB_PATH = 'jobs.db'
+DB_PATH = 'zines.db'
+
+# Workers send a heartbeat this often; a worker silent for STALE_AFTER seconds is gone
+HEARTBEAT_SECONDS = 5
+STALE_AFTER = 30
+IDLE_TIMEOUT = 60
+POLL_SECONDS = 1
+
+# SQLite calls the progress handler every this many virtual machine instructions
+PROGRESS_INSTRUCTIONS = 10000
+
+# Last characters of a job's console output kept in jobs.db
+OUTPUT_LIMIT = 20000
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job when it has been cancelled (BaseException so scripts' `except Exception` can't swallow it)."""
+
+
+def _run_import(params, progress):
+    importdata.import_data(params.get('db_path', DB_PATH), progress=progress)
+
+
+def _run_reload(params, progress):
+    publish.full_reload(params.get('db_path', DB_PATH), params.get('snapshot_path', publish.SNAPSHOT_PATH),
+                        from_current=params.get('from_current', False), progress=progress)
+
+
+def _run_move_organizations(params, progress):
+    resources.DB_PATH = params.get('db_path', DB_PATH)
+    resources.move_organizations_to_events(progress=progress)
+
+
+def _run_reclassify(params, progress):
+    reclassify.run_reclassification(params['name'], db_path=params.get('db_path', DB_PATH), progress=progress)
+
+
+def _run_bulk_edit(params, progress):
+    db_path = params.get('db_path', DB_PATH)
+    affected = bulkedit.run_operation(params['op_id'], db_path=db_path, progress=progress)
+    skipped = bulkedit.get_operation(params['op_id'], db_path=db_path)['rows_skipped']
+    print(f"✓ {affected} rows affected, {skipped} skipped (would duplicate another row)")
+
+
+def _run_reports(params, progress):
+    analyses = reportrunner.ANALYSES
+    if params.get('only'):
+        analyses = [(module_name, function_name) for module_name, function_name in analyses
+                    if any(word in f'{module_name}.{function_name}' for word in params['only'])]
+    reportrunner.run_suite(analyses, db_path=params.get('db_path', DB_PATH), progress=progress,
+                           report_dir=params.get('report_dir'))
+
+
+def _run_reprints(params, progress):
+    reprints.update_reprints(params.get('db_path', DB_PATH), progress=progress)
+
+
+def _run_integrity(params, progress):
+    integrity.check_integrity(params.get('db_path', DB_PATH), fix=params.get('repair', True),
+                              unlink_orphans=params.get('unlink_orphans', False), progress=progress)
+
+
+def _run_maintenance(params, progress):
+    maintenance.run_maintenance(params.get('db_path', DB_PATH), full_vacuum=params.get('vacuum', False),
+                                page_size=params.get('page_size'), progress=progress)
+
+
+def _run_publish(params, progress):
+    seconds = publish.publish_snapshot(params.get('db_path', DB_PATH), params.get('snapshot_path', publish.SNAPSHOT_PATH))
+    print(f"✓ Published in {seconds:.2f}s")
+
+
+# Every kind of job: the function that runs it, whether it writes to zines.db,
+# and whether the snapshot should be republished when it finishes
+JOB_KINDS = {
+    'import': {'function': _run_import, 'writes': True, 'publish': True,
+               'label': 'Import the CSVs (importdata.py)'},
+    'reload': {'function': _run_reload, 'writes': True, 'publish': False,
+               'label': 'Rebuild the database offline and swap it in (publish.py --reload)'},
+    'move_organizations': {'function': _run_move_organizations, 'writes': True, 'publish': True,
+                           'label': 'Move Organization resources to events (resources.py)'},
+    'reclassify': {'function': _run_reclassify, 'writes': True, 'publish': True,
+                   'label': 'Run a reclassification (reclassify.py)'},
+    'bulk_edit': {'function': _run_bulk_edit, 'writes': True, 'publish': True,
+                  'label': 'Run a bulk edit operation (bulkedit.py)'},
+    'reprints': {'function': _run_reprints, 'writes': True, 'publish': True,
+                 'label': 'Find reprinted events after an import (reprints.py)'},
+    'integrity': {'function': _run_integrity, 'writes': True, 'publish': True,
+                  'label': 'Check and repair broken links and invalid values (integrity.py)'},
+    'maintenance': {'function': _run_maintenance, 'writes': True, 'publish': False,
+                    'label': 'Update statistics and reclaim free pages (maintenance.py)'},
+    'reports': {'function': _run_reports, 'writes': False, 'publish': False,
+                'label': 'Run the analysis suite (reportrunner.py)'},
+    'publish': {'function': _run_publish, 'writes': False, 'publish': False,
+                'label': 'Publish a new read-only snapshot (publish.py)'},
+}
+
+
+def get_connection(jobs_db_path=JOBS_DB_PATH):
+    """Open jobs.db, creating its tables on first use. WAL lets pages read while workers write."""
+    conn = sqlite3.connect(jobs_db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',     -- JSON arguments for the job function
+            writes INTEGER NOT NULL,               -- 1 if the job writes to zines.db
+            status TEXT NOT NULL DEFAULT 'queued', -- queued, running, done, failed or cancelled
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            rows_done INTEGER,                     -- per-batch counters reported by the job
+            rows_total INTEGER,
+            sqlite_steps INTEGER NOT NULL DEFAULT 0, -- SQLite instructions run so far (x PROGRESS_INSTRUCTIONS)
+            output TEXT,
+            error TEXT,
+            worker_pid INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            started_at TEXT,
+            updated_at TEXT,
+            finished_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id);
+        CREATE TABLE IF NOT EXISTS workers (
+            pid INTEGER PRIMARY KEY,
+            started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            heartbeat REAL NOT NULL                -- time.time() of the last heartbeat
+        );
+    ''')
+    return conn
+
+
+def submit_job(kind, params=None, jobs_db_path=JOBS_DB_PATH):
+    """
+    Queue a job.
+
+    Returns:
+        int: The new job's id.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind '{kind}'. Choose from: {', '.join(JOB_KINDS)}")
+    conn = get_connection(jobs_db_path)
+    try:
+        with conn:
+            cursor = conn.execute('INSERT INTO jobs (kind, params, writes) VALUES (?, ?, ?)',
+                                  (kind, json.dumps(params or {}), int(JOB_KINDS[kind]['writes'])))
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def get_job(job_id, jobs_db_path=JOBS_DB_PATH):
+    """Return one job row, or None."""
+    conn = get_connection(jobs_db_path)
+    try:
+        return conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def list_jobs(limit=50, jobs_db_path=JOBS_DB_PATH):
+    """Return the most recent jobs, newest first."""
+    conn = get_connection(jobs_db_path)
+    try:
+        return conn.execute('SELECT * FROM jobs ORDER BY job_id DESC LIMIT ?', (limit,)).fetchall()
+    finally:
+        conn.close()
+
+
+def cancel_job(job_id, jobs_db_path=JOBS_DB_PATH):
+    """Cancel a queued job, or ask a running job to stop at its next progress check."""
+    conn = get_connection(jobs_db_path)
+    try:
+        with conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND status = 'queued'
+            ''', (job_id,))
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+    finally:
+        conn.close()
+
+
+def _fail_abandoned_jobs(conn):
+    """Jobs still 'running' on a worker that stopped sending heartbeats failed with it."""
+    with conn:
+        conn.execute('DELETE FROM workers WHERE heartbeat < ?', (time.time() - STALE_AFTER,))
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', error = 'The worker running this job stopped.',
+                            finished_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND worker_pid NOT IN (SELECT pid FROM workers)
+        ''')
+
+
+def claim_job(conn, pid):
+    """
+    Atomically take the oldest queued job this worker may run, or return None.
+
+    One UPDATE ... RETURNING both picks and marks the job, so two workers can never
+    claim the same one. A writing job is skipped while another writing job runs.
+    """
+    with conn:
+        return conn.execute('''
+            UPDATE jobs
+            SET status = 'running', worker_pid = ?, started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = (
+                SELECT job_id FROM jobs
+                WHERE status = 'queued'
+                  AND (writes = 0 OR NOT EXISTS (SELECT 1 FROM jobs WHERE status = 'running' AND writes = 1))
+                ORDER BY job_id
+                LIMIT 1
+            )
+            RETURNING job_id, kind, params
+        ''', (pid,)).fetchone()
+
+
+class JobProgress:
+    """
+    Progress reporting for one running job.
+
+    Calling it as progress(rows_done, rows_total) records the job's per-batch counters
+    (the same callback bulkedit.run_operation and friends accept). sqlite_handler is
+    installed with set_progress_handler on every connection the job opens, so long
+    single statements still show activity, and returning 1 from it interrupts the
+    statement when the job is cancelled.
+    """
+
+    def __init__(self, conn, job_id):
+        self.conn = conn
+        self.job_id = job_id
+        self.sqlite_steps = 0
+        self.cancelled = False
+        self.last_flush = 0.0
+
+    def _flush(self, rows_done=None, rows_total=None):
+        with self.conn:
+            self.conn.execute('''
+                UPDATE jobs SET rows_done = COALESCE(?, rows_done), rows_total = COALESCE(?, rows_total),
+                                sqlite_steps = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ?
+            ''', (rows_done, rows_total, self.sqlite_steps, self.job_id))
+        self.cancelled = bool(self.conn.execute(
+            'SELECT cancel_requested FROM jobs WHERE job_id = ?', (self.job_id,)).fetchone()[0])
+        self.last_flush = time.monotonic()
+
+    def __call__(self, rows_done, rows_total):
+        self._flush(rows_done, rows_total)
+        if self.cancelled:
+            raise JobCancelled()
+
+    def sqlite_handler(self):
+        self.sqlite_steps += 1
+        if time.monotonic() - self.last_flush > 0.5:
+            self._flush()
+        return 1 if self.cancelled else 0
+
+
+@contextlib.contextmanager
+def _watch_connections(progress):
+    """
+    Install the job's progress handler on every sqlite3 connection opened inside the block.
+    Only this process is watched: process pools the job starts (reportrunner.py) put the
+    real sqlite3.connect back in their workers, which can't report to this job's jobs.db connection.
+    """
+    original_connect = sqlite3.connect
+
+    def connect_with_progress(*args, **kwargs):
+        conn = original_connect(*args, **kwargs)
+        conn.set_progress_handler(progress.sqlite_handler, PROGRESS_INSTRUCTIONS)
+        return conn
+
+    sqlite3.connect = connect_with_progress
+    try:
+        yield
+    finally:
+        sqlite3.connect = original_connect
+
+
+def run_job(conn, job):
+    """Run a claimed job in this process and record how it ended."""
+    spec = JOB_KINDS[job['kind']]
+    params = json.loads(job['params'])
+    progress = JobProgress(conn, job['job_id'])
+    output = io.StringIO()
+    status, error = 'done', None
+    try:
+        with contextlib.redirect_stdout(output), _watch_connections(progress):
+            spec['function'](params, progress)
+            if spec['publish'] and params.get('snapshot_path'):
+                publish.publish_snapshot(params.get('db_path', DB_PATH), params['snapshot_path'])
+        if progress.cancelled:
+            status = 'cancelled'
+    except JobCancelled:
+        status = 'cancelled'
+    except Exception as e:
+        status = 'cancelled' if progress.cancelled else 'failed'
+        error = f'{type(e).__name__}: {e}'
+    with conn:
+        conn.execute('''
+            UPDATE jobs SET status = ?, error = ?, output = ?, sqlite_steps = ?,
+                            finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ?
+        ''', (status, error, output.getvalue()[-OUTPUT_LIMIT:], progress.sqlite_steps, job['job_id']))
+    return status
+
+
+def _heartbeat(jobs_db_path, pid, stop):
+    """Keep this worker's heartbeat fresh, even while a job is busy outside SQLite."""
+    conn = get_connection(jobs_db_path)
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            with conn:
+                conn.execute('UPDATE workers SET heartbeat = ? WHERE pid = ?', (time.time(), pid))
+    finally:
+        conn.close()
+
+
+def work(jobs_db_path=JOBS_DB_PATH, idle_timeout=IDLE_TIMEOUT):
+    """Worker loop: claim and run jobs until there has been nothing to do for idle_timeout seconds."""
+    pid = os.getpid()
+    conn = get_connection(jobs_db_path)
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO workers (pid, heartbeat) VALUES (?, ?)', (pid, time.time()))
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(jobs_db_path, pid, stop), daemon=True)
+    heartbeat.start()
+    try:
+        idle_since = time.monotonic()
+        while idle_timeout is None or time.monotonic() - idle_since < idle_timeout:
+            _fail_abandoned_jobs(conn)
+            job = claim_job(conn, pid)
+            if job is None:
+                time.sleep(POLL_SECONDS)
+                continue
+            print(f"Job {job['job_id']} ({job['kind']}) started")
+            status = run_job(conn, job)
+            print(f"Job {job['job_id']} ({job['kind']}) {status}")
+            idle_since = time.monotonic()
+    finally:
+        stop.set()
+        with conn:
+            conn.execute('DELETE FROM workers WHERE pid = ?', (pid,))
+        conn.close()
+
+
+def ensure_workers(count=2, jobs_db_path=JOBS_DB_PATH):
+    """
+    Start worker processes in the background until `count` are alive.
+    Workers run from the repository folder so the job functions' relative paths work.
+    Each new worker's row is added in the same write transaction that counted the live
+    ones, so two requests submitting jobs at once can't both start the missing workers.
+    """
+    conn = get_connection(jobs_db_path)
+    try:
+        _fail_abandoned_jobs(conn)
+        conn.execute('BEGIN IMMEDIATE')  # one caller at a time from the count to the new rows
+        try:
+            alive = conn.execute('SELECT COUNT(*) FROM workers').fetchone()[0]
+            for _ in range(count - alive):
+                process = subprocess.Popen(
+                    [sys.executable, os.path.join(REPO_DIR, 'jobqueue.py'), '--jobs-db', os.path.abspath(jobs_db_path)],
+                    cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+                # The worker replaces this row when it starts; if it never does, it goes stale
+                conn.execute('INSERT OR REPLACE INTO workers (pid, heartbeat) VALUES (?, ?)',
+                             (process.pid, time.time()))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument('--jobs-db', default=JOBS_DB_PATH, help="job database (default: jobs.db)")
+    parser.add_argument('--workers', type=int, default=1, help="number of worker processes")
+    parser.add_argument('--submit', choices=list(JOB_KINDS), help="queue a job of this kind and exit")
+    parser.add_argument('--forever', action='store_true', help="keep waiting for jobs instead of exiting when idle")
+    args = parser.parse_args()
+
+    if args.submit:
+        job_id = submit_job(args.submit, {'db_path': os.path.abspath(DB_PATH)}, args.jobs_db)
+        print(f"✓ Queued job {job_id} ({args.submit})")
+    else:
+        idle_timeout = None if args.forever else IDLE_TIMEOUT
+        extra = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--jobs-db', args.jobs_db]
+                                  + (['--forever'] if args.forever else []))
+                 for _ in range(args.workers - 1)]
+        work(args.jobs_db, idle_timeout)
+        for process in extra:
+            process.wait()
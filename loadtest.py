@@ -0,0 +1,305 @@
+# Load Test for the Web App
+# Starts DatabaseFlask/app.py locally against a copy of zines.db (so edits made by the
+# test never touch the real data), replays a realistic mix of requests (searches, sort
+# changes, deep pages, issue pages, edit forms and saved edits) from a growing number
+# of concurrent clients, and reports throughput, p50/p95/p99 latency and errors for each
+# concurrency level. Writes that hit SQLITE_BUSY come back from the app as 503, and saves
+# the app refuses (sent back to the edit form) are counted separately. Results go to reports/loadtest_<timestamp>/ as results.json and
+# charts, for sizing workers and checking that a change made the app faster.
+#
+# Examples:
+#   python loadtest.py                                 # Flask dev server, 1-16 clients
+#   python loadtest.py --server gunicorn --server-workers 4 --levels 1 8 32
+#   python loadtest.py --url http://localhost:5001     # an app that is already running
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+import publish
+
+# Path to the SQLite database (copied, never modified) and where results are saved
+DB_PATH = 'zines.db'
+REPORT_ROOT = 'reports'
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DatabaseFlask')
+
+# Share of requests of each kind
+REQUEST_MIX = {
+    'browse': 0.20,      # the home page
+    'search': 0.25,      # ?search=<word from a title>
+    'sort': 0.15,        # ?sort_events=<column>&order_events=asc|desc
+    'deep_page': 0.15,   # ?page_events=<a late page>
+    'issue': 0.10,       # /issue/<pub_id>
+    'edit_form': 0.08,   # GET /edit/event/<id>
+    'edit_save': 0.07,   # POST /edit/event/<id> (writes, then republishes)
+}
+
+# Fields the event edit form posts
+EDIT_FIELDS = ['event_title', 'event_date', 'city', 'state', 'country', 'event_type', 'description']
+
+SORT_COLUMNS = ['event_title', 'event_date', 'city', 'state', 'country', 'event_type']
+PER_PAGE = 10  # rows per page on the home page
+
+DEFAULT_LEVELS = [1, 2, 4, 8, 16]
+REQUEST_TIMEOUT = 30
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Count a saved edit's redirect as its response instead of also fetching the home page."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def load_workload_data(db_path=DB_PATH):
+    """Ids, search words and current event rows the requests are built from."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        events = [dict(row) for row in conn.execute('''
+            SELECT event_id, event_title, event_date, city, state, country, event_type, description FROM events
+        ''')]
+        pub_ids = [row[0] for row in conn.execute('SELECT pub_id FROM publications')]
+    finally:
+        conn.close()
+    words = sorted({word for event in events for word in str(event['event_title']).split() if len(word) > 3})
+    # The app saves a blank field as 'NA' (or 'NA-NA-NA' for the date) and strips spaces, so
+    # only events without NULL, blank or padded fields are left exactly as they were
+    saveable = [event for event in events
+                if all(event[field] is not None and str(event[field]) == str(event[field]).strip() != ''
+                       for field in EDIT_FIELDS)]
+    return {'events': events, 'saveable': saveable or events, 'pub_ids': pub_ids, 'words': words or ['a'],
+            'pages': max((len(events) + PER_PAGE - 1) // PER_PAGE, 1)}
+
+
+def make_request(kind, data, rng):
+    """(method, path, form data) for one request of the given kind."""
+    if kind == 'browse':
+        return 'GET', '/', None
+    if kind == 'search':
+        return 'GET', '/?' + urllib.parse.urlencode({'search': rng.choice(data['words'])}), None
+    if kind == 'sort':
+        return 'GET', '/?' + urllib.parse.urlencode({'sort_events': rng.choice(SORT_COLUMNS),
+                                                     'order_events': rng.choice(['asc', 'desc'])}), None
+    if kind == 'deep_page':
+        last = data['pages']
+        return 'GET', f'/?page_events={rng.randint(max(last // 2, 1), last)}', None
+    if kind == 'issue':
+        return 'GET', f"/issue/{rng.choice(data['pub_ids'])}", None
+    if kind == 'edit_form':
+        return 'GET', f"/edit/event/{rng.choice(data['events'])['event_id']}", None
+    # Save an event with its stored values, which the app writes back unchanged:
+    # a real write and republish without drifting the data
+    event = rng.choice(data['saveable'])
+    form = {field: str(event[field]) for field in EDIT_FIELDS}
+    return 'POST', f"/edit/event/{event['event_id']}", form
+
+
+def send(base_url, method, path, form):
+    """
+    Send one request.
+
+    Returns:
+        tuple: (status code or None if the connection failed, seconds taken, whether the
+        app refused a save and redirected back to the edit form)
+    """
+    body = urllib.parse.urlencode(form).encode('utf-8') if form is not None else None
+    request = urllib.request.Request(base_url + path, data=body, method=method)
+    start = time.perf_counter()
+    refused = False
+    try:
+        with _opener.open(request, timeout=REQUEST_TIMEOUT) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code  # includes the 302 after a saved edit
+        refused = method == 'POST' and status == 302 and '/edit/' in (e.headers.get('Location') or '')
+    except (urllib.error.URLError, OSError):
+        status = None
+    return status, time.perf_counter() - start, refused
+
+
+def run_level(base_url, clients, duration, data, seed=0):
+    """
+    Run `clients` closed-loop clients (each sends its next request as soon as the last
+    one finished) for `duration` seconds.
+
+    Returns:
+        dict: Throughput, latency percentiles (ms), error counts and per-kind breakdown
+    """
+    kinds, weights = zip(*REQUEST_MIX.items())
+    samples = []  # (kind, status, seconds, refused); list.append is atomic, so clients share it
+    deadline = time.perf_counter() + duration
+
+    def client(number):
+        rng = random.Random(seed * 1000 + number)
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            status, seconds, refused = send(base_url, *make_request(kind, data, rng))
+            samples.append((kind, status, seconds, refused))
+
+    threads = [threading.Thread(target=client, args=(number,), daemon=True) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    def summarize(rows):
+        latencies = np.array([seconds for _, _, seconds, _ in rows]) * 1000
+        statuses = [status for _, status, _, _ in rows]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+        return {
+            'requests': len(rows),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'busy': statuses.count(503),
+            'errors': sum(1 for status in statuses if status is None or (status >= 400 and status != 503)),
+            'refused': sum(1 for _, _, _, refused in rows if refused),  # saves sent back to the edit form
+        }
+
+    result = {'clients': clients, 'seconds': round(elapsed, 2), **summarize(samples)}
+    result['throughput_rps'] = round(result['requests'] / elapsed, 2) if elapsed else 0
+    result['by_kind'] = {kind: summarize([sample for sample in samples if sample[0] == kind]) for kind in kinds}
+    return result
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, db_copy, snapshot_copy, server_workers):
+    """
+    Start the app on a free local port against the database copy.
+
+    Returns:
+        tuple: (subprocess.Popen, base URL)
+    """
+    port = _free_port()
+    env = dict(os.environ, ZINES_DB_PATH=db_copy, ZINES_SNAPSHOT=snapshot_copy)
+    env.pop('ZINES_CATALOG', None)
+    if server == 'gunicorn':
+        command = ['gunicorn', '--workers', str(server_workers), '--threads', '4',
+                   '--bind', f'127.0.0.1:{port}', 'app:app']
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads']
+    process = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(100):  # up to 10 seconds to come up
+        if process.poll() is not None:
+            raise RuntimeError(f"The {server} server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=1):
+                return process, base_url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"The {server} server did not start on port {port}")
+
+
+def save_results(results, report_dir):
+    """Write results.json plus throughput and latency charts."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    os.makedirs(report_dir, exist_ok=True)
+    with open(os.path.join(report_dir, 'results.json'), 'w') as file:
+        json.dump(results, file, indent=2)
+
+    levels = results['levels']
+    clients = [level['clients'] for level in levels]
+    fig, (throughput_ax, latency_ax) = plt.subplots(1, 2, figsize=(12, 5))
+    throughput_ax.plot(clients, [level['throughput_rps'] for level in levels], marker='o')
+    throughput_ax.set_xlabel('Concurrent clients')
+    throughput_ax.set_ylabel('Requests per second')
+    throughput_ax.set_title('Throughput')
+    for percentile in ('p50', 'p95', 'p99'):
+        latency_ax.plot(clients, [level[f'{percentile}_ms'] for level in levels], marker='o', label=percentile)
+    latency_ax.set_xlabel('Concurrent clients')
+    latency_ax.set_ylabel('Latency (ms)')
+    latency_ax.set_title('Latency')
+    latency_ax.legend()
+    for ax in (throughput_ax, latency_ax):
+        ax.set_xscale('log', base=2)
+        ax.set_xticks(clients, [str(count) for count in clients])
+    fig.suptitle(f"{results['server']} server")
+    fig.tight_layout()
+    fig.savefig(os.path.join(report_dir, 'loadtest.png'))
+    plt.close(fig)
+
+
+def run_load_test(levels=DEFAULT_LEVELS, duration=10, server='flask', server_workers=2, url=None,
+                  db_path=DB_PATH, report_dir=None):
+    """
+    Sweep the concurrency levels and save the results.
+
+    Returns:
+        dict: The results, also written to report_dir/results.json
+    """
+    data = load_workload_data(db_path)
+    work_dir = tempfile.mkdtemp(prefix='loadtest-')
+    process = None
+    try:
+        if url is None:
+            db_copy = os.path.join(work_dir, 'zines.db')
+            snapshot_copy = os.path.join(work_dir, 'zines_published.db')
+            shutil.copyfile(db_path, db_copy)
+            publish.publish_snapshot(db_copy, snapshot_copy)  # pages read the snapshot, as in production
+            process, url = start_server(server, db_copy, snapshot_copy, server_workers)
+
+        results = {'server': server if process else url, 'duration_per_level': duration,
+                   'mix': REQUEST_MIX, 'levels': []}
+        print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'busy':>6} {'errors':>7} "
+              f"{'refused':>8}")
+        for number, clients in enumerate(levels):
+            level = run_level(url, clients, duration, data, seed=number)
+            results['levels'].append(level)
+            print(f"{clients:>8} {level['throughput_rps']:>8.1f} {level['p50_ms']:>8.1f} {level['p95_ms']:>8.1f} "
+                  f"{level['p99_ms']:>8.1f} {level['busy']:>6} {level['errors']:>7} {level['refused']:>8}")
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report_dir = report_dir or os.path.join(REPORT_ROOT, f"loadtest_{time.strftime('%Y%m%d_%H%M%S')}")
+    save_results(results, report_dir)
+    print(f"\n✓ Results saved to {report_dir}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the web app at increasing concurrency.")
+    parser.add_argument('--levels', type=int, nargs='+', default=DEFAULT_LEVELS, help="concurrent clients per level")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per level")
+    parser.add_argument('--server', choices=['flask', 'gunicorn'], default='flask', help="server to start the app with")
+    parser.add_argument('--server-workers', type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument('--url', help="test an app that is already running instead (its edits are real!)")
+    parser.add_argument('--output', help="report folder (default: reports/loadtest_<timestamp>)")
+    args = parser.parse_args()
+
+    print("=== Load Testing the Web App ===")
+    run_load_test(args.levels, args.duration, args.server, args.server_workers, args.url, report_dir=args.output)
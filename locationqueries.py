@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unique Location Queries (set-based)
+History 8510 - Clemson University
+
+Set-based versions of the unique-location analyses in testqueries.py. The original
+queries scan every event, build its city || ', ' || state || ', ' || country string
+and probe it against a GROUP BY subquery over the same table.
+
+Here a CTE finds the one-off locations from the (city, state, country) index alone,
+and only the matching events are fetched through an expression index on the location
+string, so the events table itself is only touched for rows in the result.
+(A COUNT(*) OVER (PARTITION BY city, state, country) version reads events once too,
+but has to sort every row twice and measured about ten times slower; see benchlocations.py.)
+Both indexes are needed: without the expression index every lookup is a full scan.
+
+To keep the output identical to the original IN (...) semantics, an event is kept
+when its location string matches the location string of any (city, state, country)
+group that occurs exactly once, and events whose location string is NULL are dropped.
+"""
+
+import sqlite3
+import pandas as pd
+
+import createdb
+import sharding
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# The location string as an indexed expression, plus a covering index for the GROUP BY.
+# createdb.py creates them with the other lookup indexes
+LOCATION_INDEXES = createdb.LOCATION_INDEXES
+
+UNIQUE_LOCATIONS_QUERY = """
+WITH unique_locations AS (
+    -- Read from the covering (city, state, country) index, never from the table itself
+    SELECT DISTINCT location
+    FROM (
+        SELECT city || ', ' || state || ', ' || country AS location
+        FROM events
+        {group_where}
+        GROUP BY city, state, country
+        HAVING COUNT(*) = 1
+    )
+    WHERE location IS NOT NULL
+)
+SELECT
+    e.event_title AS event_title,
+    e.event_date AS event_date,
+    e.city || ', ' || e.state || ', ' || e.country AS location,
+    p.volume AS volume_number,
+    p.issue_number AS issue_number
+FROM unique_locations u
+-- Looked up through the expression index on the location key, so only matching events are read
+JOIN events e ON (e.city || ', ' || e.state || ', ' || e.country) = u.location
+LEFT JOIN publications p ON e.publication_id = p.pub_id
+{event_where}
+ORDER BY e.event_date ASC, e.event_id ASC
+"""
+
+# For a federated connection over shard groups (sharding.FederatedConnection), which can't
+# count locations across groups in SQL: every candidate event, counted in pandas instead
+LOCATION_EVENTS_QUERY = """
+SELECT e.event_id, e.event_title, e.event_date, e.city, e.state, e.country,
+       p.volume AS volume_number, p.issue_number AS issue_number
+FROM events e
+LEFT JOIN publications p ON e.publication_id = p.pub_id
+{event_where}
+"""
+
+
+def ensure_location_indexes(conn):
+    """Create the location key indexes if they don't exist yet."""
+    for index_name, target in LOCATION_INDEXES.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {target}')
+    conn.commit()
+
+
+def unique_event_locations(conn, non_usa=False):
+    """
+    Events whose (city, state, country) location appears only once, with the
+    volume and issue number they were published in.
+
+    Args:
+        conn: An open connection to zines.db.
+        non_usa (bool): Only consider events outside the USA (both for counting and output).
+
+    Returns:
+        DataFrame: event_title, event_date, location, volume_number, issue_number
+    """
+    if isinstance(conn, sharding.FederatedConnection):
+        return _unique_event_locations_merged(conn, non_usa)
+    if non_usa:
+        query = UNIQUE_LOCATIONS_QUERY.format(group_where="WHERE country != 'USA'",
+                                              event_where="WHERE e.country != 'USA'")
+    else:
+        query = UNIQUE_LOCATIONS_QUERY.format(group_where='', event_where='')
+    return pd.read_sql_query(query, conn)
+
+
+def _unique_event_locations_merged(conn, non_usa):
+    """unique_event_locations() for a federated connection over shard groups, in pandas."""
+    events = pd.read_sql_query(
+        LOCATION_EVENTS_QUERY.format(event_where="WHERE e.country != 'USA'" if non_usa else ''), conn)
+    places = ['city', 'state', 'country']
+    # city || ', ' || state || ', ' || country: NULL if any part is NULL
+    events['location'] = [None if any(pd.isna(part) for part in row) else ', '.join(map(str, row))
+                          for row in events[places].itertuples(index=False, name=None)]
+    counts = events.groupby(places, dropna=False)['event_id'].transform('size')
+    unique = set(events.loc[counts == 1, 'location'].dropna())
+    matches = events[events['location'].isin(unique)]
+    matches = matches.sort_values(['event_date', 'event_id'], na_position='first', kind='stable')
+    columns = ['event_title', 'event_date', 'location', 'volume_number', 'issue_number']
+    return matches[columns].reset_index(drop=True).infer_objects()
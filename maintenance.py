@@ -0,0 +1,243 @@
+# Storage Maintenance for zines.db
+# zines.db had never been analyzed or vacuumed. Deletes (editdata.py, resources.py,
+# bulk edits) leave free pages that keep the file large, and without sqlite_stat1 the
+# query planner guesses how selective each index is. This script:
+#
+# 1. reports the size of every table and index (from the dbstat virtual table), how
+#    much of their pages is unused, and how many pages sit on the free list
+# 2. refreshes the planner statistics: ANALYZE (sampled, so it stays quick on large
+#    tables) when there are none yet or after a load, PRAGMA optimize otherwise
+# 3. gives free pages back to the file system: PRAGMA incremental_vacuum on databases
+#    created with auto_vacuum = INCREMENTAL (createdb.py does this now), or with
+#    --vacuum a full VACUUM that also switches an older database to incremental mode
+#    and, with --page-size, rebuilds it with a different page size
+#
+# importdata.py calls after_load() when an import finishes, so statistics and free
+# pages are taken care of as the data grows.
+#
+# Examples:
+#   python maintenance.py                      # report, analyze, reclaim free pages
+#   python maintenance.py --report-only
+#   python maintenance.py --vacuum --page-size 8192
+
+import argparse
+import os
+import sqlite3
+import time
+
+import dedupe
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Rows ANALYZE samples per index (PRAGMA analysis_limit); 0 reads everything
+ANALYSIS_LIMIT = 1000
+
+# Suggest --vacuum once this share of a non-incremental database is free pages, or
+# this share of the table and index pages is empty space (after large deletes pages
+# are left half full rather than freed, which only VACUUM compacts)
+VACUUM_SUGGESTION_THRESHOLD = 0.10
+UNUSED_SUGGESTION_THRESHOLD = 0.45
+
+# Page sizes SQLite accepts
+PAGE_SIZES = [512, 1024, 2048, 4096, 8192, 16384, 32768, 65536]
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def _pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def storage_report(conn):
+    """
+    Sizes of the database and of each table and index.
+
+    Returns:
+        dict: page_size, page_count, freelist_count, auto_vacuum, file_bytes and objects:
+        one dict per table/index with name, type, table, pages, bytes and unused_bytes,
+        largest first
+    """
+    types = {name: (kind, table) for kind, name, table in
+             conn.execute('SELECT type, name, tbl_name FROM sqlite_schema')}
+    objects = []
+    for name, pages, size, unused in conn.execute('''
+        SELECT name, COUNT(*), SUM(pgsize), SUM(unused) FROM dbstat GROUP BY name ORDER BY SUM(pgsize) DESC
+    '''):
+        kind, table = types.get(name, ('table', name))  # sqlite_schema itself isn't listed in it
+        objects.append({'name': name, 'type': kind, 'table': table, 'pages': pages,
+                        'bytes': size, 'unused_bytes': unused})
+    page_size = _pragma(conn, 'page_size')
+    return {
+        'page_size': page_size,
+        'page_count': _pragma(conn, 'page_count'),
+        'freelist_count': _pragma(conn, 'freelist_count'),
+        'auto_vacuum': AUTO_VACUUM_MODES.get(_pragma(conn, 'auto_vacuum'), 'unknown'),
+        'file_bytes': _pragma(conn, 'page_count') * page_size,
+        'objects': objects,
+    }
+
+
+def print_report(report):
+    """Print a storage report as a table."""
+    print(f"{'name':<40} {'type':<6} {'pages':>8} {'size':>10} {'unused':>7}")
+    for item in report['objects']:
+        unused = item['unused_bytes'] / item['bytes'] if item['bytes'] else 0
+        print(f"{item['name']:<40} {item['type']:<6} {item['pages']:>8} "
+              f"{_megabytes(item['bytes']):>10} {unused:>7.0%}")
+    free_bytes = report['freelist_count'] * report['page_size']
+    print(f"\nFile: {_megabytes(report['file_bytes'])} in {report['page_count']} pages of "
+          f"{report['page_size']} bytes; free list: {report['freelist_count']} pages ({_megabytes(free_bytes)}); "
+          f"auto_vacuum: {report['auto_vacuum']}")
+
+
+def _megabytes(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def update_statistics(conn, analyze=False):
+    """
+    Refresh the query planner's statistics.
+
+    ANALYZE (sampling ANALYSIS_LIMIT rows per index) when asked to, e.g. after a
+    load, or when the database has never been analyzed; otherwise PRAGMA optimize,
+    which only re-analyzes tables whose statistics look out of date.
+
+    Returns:
+        str: What was run
+    """
+    has_statistics = conn.execute(
+        "SELECT 1 FROM sqlite_schema WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone() is not None
+    if analyze or not has_statistics:
+        conn.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+        conn.execute('ANALYZE')
+        conn.commit()
+        return 'ANALYZE'
+    conn.execute('PRAGMA optimize')
+    conn.commit()
+    return 'PRAGMA optimize'
+
+
+def reclaim_free_pages(conn):
+    """
+    Give the free list back to the file system, if the database was created with
+    auto_vacuum = INCREMENTAL (other databases need a full vacuum() once).
+
+    Returns:
+        int: Pages released
+    """
+    if _pragma(conn, 'auto_vacuum') != 2:
+        return 0
+    free_pages = _pragma(conn, 'freelist_count')
+    if free_pages:
+        conn.commit()
+        # executescript steps the pragma to completion (execute() would free one page per call)
+        conn.executescript('PRAGMA incremental_vacuum;')
+    return free_pages - _pragma(conn, 'freelist_count')
+
+
+def vacuum(conn, page_size=None):
+    """
+    Rebuild the whole file: drops every free page, defragments tables and indexes,
+    switches the database to auto_vacuum = INCREMENTAL and, if page_size is given,
+    rewrites it with that page size. Needs about the database's size in free disk
+    space and a moment with no other writers.
+    """
+    if page_size is not None and page_size not in PAGE_SIZES:
+        raise ValueError(f"Page size must be one of {PAGE_SIZES}")
+    journal_mode = _pragma(conn, 'journal_mode')
+    if journal_mode == 'wal' and page_size is not None:
+        conn.execute('PRAGMA journal_mode = DELETE')  # the page size of a WAL database can't change
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    if page_size is not None:
+        conn.execute(f'PRAGMA page_size = {page_size}')
+    conn.execute('VACUUM')
+    if journal_mode == 'wal' and page_size is not None:
+        conn.execute('PRAGMA journal_mode = WAL')
+
+
+def after_load(db_path=DB_PATH):
+    """
+    Quick maintenance for the end of an import: fresh statistics for the planner and
+    free pages returned to the file system. Never a full VACUUM, so it stays cheap.
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        ran = update_statistics(conn, analyze=True)
+        released = reclaim_free_pages(conn)
+    finally:
+        conn.close()
+    print(f"✓ Maintenance: {ran}, {released} free pages released ({time.perf_counter() - start:.2f}s)")
+
+
+def run_maintenance(db_path=DB_PATH, report_only=False, full_vacuum=False, page_size=None, progress=None):
+    """
+    Report sizes, then refresh statistics and reclaim free pages (or fully vacuum).
+
+    Args:
+        db_path (str): Database to maintain.
+        report_only (bool): Only print the size report.
+        full_vacuum (bool): Run VACUUM (switching to incremental auto_vacuum).
+        page_size (int): With full_vacuum, the page size to rebuild the file with.
+        progress: Optional callback called as progress(steps_done, steps_total).
+
+    Returns:
+        dict: The storage report after maintenance
+    """
+    # VACUUM re-evaluates the content_key columns, so it needs content_hash()
+    conn = dedupe.register_content_hash(sqlite3.connect(db_path, timeout=30))
+    try:
+        before = storage_report(conn)
+        print_report(before)
+        if report_only:
+            return before
+        steps = 3
+        if progress:
+            progress(1, steps)
+
+        start = time.perf_counter()
+        print(f"\n✓ Statistics: {update_statistics(conn)} ({time.perf_counter() - start:.2f}s)")
+        if progress:
+            progress(2, steps)
+
+        start = time.perf_counter()
+        if full_vacuum or page_size is not None:
+            vacuum(conn, page_size)
+            print(f"✓ VACUUM ({time.perf_counter() - start:.2f}s)")
+        else:
+            released = reclaim_free_pages(conn)
+            if before['auto_vacuum'] == 'incremental':
+                print(f"✓ Incremental vacuum: {released} free pages released ({time.perf_counter() - start:.2f}s)")
+            elif before['page_count'] and before['freelist_count'] / before['page_count'] > VACUUM_SUGGESTION_THRESHOLD:
+                print(f"❌ {before['freelist_count']} free pages, and this database can't release them "
+                      f"incrementally: run with --vacuum once")
+            used_bytes = sum(item['bytes'] for item in before['objects'])
+            unused_bytes = sum(item['unused_bytes'] for item in before['objects'])
+            if used_bytes and unused_bytes / used_bytes > UNUSED_SUGGESTION_THRESHOLD:
+                print(f"❌ {unused_bytes / used_bytes:.0%} of the table and index pages is empty space: "
+                      f"--vacuum would compact it")
+        if progress:
+            progress(3, steps)
+
+        after = storage_report(conn)
+        saved = before['file_bytes'] - after['file_bytes']
+        print(f"\nFile: {_megabytes(before['file_bytes'])} -> {_megabytes(after['file_bytes'])}"
+              f" ({_megabytes(saved)} smaller); free list: {after['freelist_count']} pages")
+        return after
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report storage use and maintain zines.db.")
+    parser.add_argument('--db', default=DB_PATH, help="database to maintain")
+    parser.add_argument('--report-only', action='store_true', help="only print table and index sizes")
+    parser.add_argument('--vacuum', action='store_true', help="rebuild the file with VACUUM")
+    parser.add_argument('--page-size', type=int, choices=PAGE_SIZES, help="with --vacuum, the new page size")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"❌ {args.db} not found")
+    print("=== Database Maintenance ===")
+    run_maintenance(args.db, args.report_only, args.vacuum, args.page_size)
@@ -0,0 +1,238 @@
+# Publishing Read-Only Snapshots of zines.db
+# The web app reads from a published copy of the database (zines_published.db) and only
+# writes go to zines.db itself. Publishing copies the primary with the SQLite online
+# backup API into a temporary file and renames it over the published copy, so a long
+# import or a full rebuild never blocks (or breaks) the pages people are looking at.
+#
+# os.replace is atomic: a reader either opens the old snapshot or the new one. Readers
+# that already have the old file open keep reading it until they close it.
+#
+# A process that writes often (the web app) publishes through a SnapshotPublisher: each
+# write only asks for a publish, and a background thread copies at most once every
+# PUBLISH_INTERVAL seconds, one copy covering every write made in between.
+
+import atexit
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import changelog
+import createdb
+import dedupe
+import importdata
+
+# Path to the primary database and the snapshot the web app reads
+DB_PATH = 'zines.db'
+SNAPSHOT_PATH = 'zines_published.db'
+
+# Seconds a SnapshotPublisher waits between two copies (writes in between share the next one)
+PUBLISH_INTERVAL = 2.0
+
+
+def connect_snapshot(snapshot_path=SNAPSHOT_PATH):
+    """
+    Open a published snapshot for reading.
+
+    Snapshots are never changed in place (a new one is renamed over the old file),
+    so they are opened immutable: no locks, no journal checks, never SQLITE_BUSY.
+    """
+    uri = Path(snapshot_path).resolve().as_uri() + '?mode=ro&immutable=1'
+    return sqlite3.connect(uri, uri=True)
+
+
+def _copy_database(source_path, target_path):
+    """Copy a live database page by page with the online backup API."""
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+        # The snapshot is a single self-contained file, whatever journal mode the primary uses
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+        source.close()
+
+
+def publish_snapshot(db_path=DB_PATH, snapshot_path=SNAPSHOT_PATH):
+    """
+    Copy the primary database to a temporary file next to the snapshot and
+    atomically rename it into place.
+
+    Returns:
+        float: Seconds the copy took.
+    """
+    start = time.perf_counter()
+    snapshot_dir = os.path.dirname(os.path.abspath(snapshot_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.publish-', suffix='.db', dir=snapshot_dir)
+    os.close(fd)
+    try:
+        _copy_database(db_path, tmp_path)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates the file private to this user
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return time.perf_counter() - start
+
+
+def snapshot_is_stale(db_path=DB_PATH, snapshot_path=SNAPSHOT_PATH):
+    """True if the snapshot is missing or the primary (or its write-ahead log) changed after it was published."""
+    if not os.path.exists(snapshot_path):
+        return True
+    published = os.path.getmtime(snapshot_path)
+    return any(os.path.exists(path) and os.path.getmtime(path) > published
+               for path in (db_path, db_path + '-wal'))
+
+
+def refresh_snapshot(db_path=DB_PATH, snapshot_path=SNAPSHOT_PATH):
+    """
+    Republish after a script changed the primary, so a running web app shows the change.
+    Does nothing until the web app has published a first snapshot, or if it is current.
+
+    Returns:
+        bool: Whether a new snapshot was published.
+    """
+    if not os.path.exists(snapshot_path) or not snapshot_is_stale(db_path, snapshot_path):
+        return False
+    seconds = publish_snapshot(db_path, snapshot_path)
+    print(f"✓ Published {snapshot_path} in {seconds:.2f}s")
+    return True
+
+
+class SnapshotPublisher:
+    """
+    Publishes snapshots on a background thread for a process that writes often.
+
+    request() marks the primary as changed and returns at once. The thread publishes
+    as soon as it has been idle for `interval` seconds, otherwise `interval` seconds
+    after its last copy, and one copy covers every commit made before it starts. A
+    burst of edits costs one or two copies instead of one per write, and no writer
+    waits for a copy; pages show an edit at most about `interval` seconds (plus the
+    copy itself) late. A request still pending when the process exits is published then.
+    """
+
+    def __init__(self, db_path=DB_PATH, snapshot_path=SNAPSHOT_PATH, interval=PUBLISH_INTERVAL):
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.pending = False
+        self.published_at = float('-inf')   # time.monotonic() of the last copy
+        self.condition = threading.Condition()
+        self.copy_lock = threading.Lock()   # one copy at a time
+        self.thread = None
+        atexit.register(self.flush)
+
+    def request(self):
+        """Ask for a publish after a commit (starting the thread on first use, or after a fork)."""
+        with self.condition:
+            self.pending = True
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='snapshot-publisher', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def publish_now(self):
+        """
+        Publish right away on the calling thread (e.g. at startup).
+
+        Returns:
+            float: Seconds the copy took.
+        """
+        with self.copy_lock:
+            with self.condition:
+                self.pending = False  # commits from here on need the next copy
+            try:
+                return publish_snapshot(self.db_path, self.snapshot_path)
+            finally:
+                self.published_at = time.monotonic()
+
+    def flush(self):
+        """Publish now if a request is pending."""
+        if self.pending:
+            self.publish_now()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+            delay = self.published_at + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)  # requests made meanwhile are covered by this copy
+            try:
+                self.publish_now()
+            except (sqlite3.Error, OSError) as e:
+                print(f"❌ Error while publishing {self.snapshot_path}, retrying: {e}")
+                with self.condition:
+                    self.pending = True
+
+
+def full_reload(db_path=DB_PATH, snapshot_path=SNAPSHOT_PATH, from_current=False,
+                publications_csv=importdata.publications_csv, events_csv=importdata.events_csv, progress=None):
+    """
+    Rebuild the database (createdb.py + importdata.py) without taking the site down.
+
+    The new database is built in a temporary file, published as the snapshot and
+    then renamed over the primary; pages keep being served from the old snapshot
+    until then. With from_current=True the build starts from a copy of the current
+    primary instead of an empty database, keeping resources and web additions;
+    the imports skip rows that are already there, but a CSV row that has been
+    edited since is imported again.
+
+    Edits saved to the primary while the build runs are not in the new database,
+    so run this when nobody is editing. progress is passed on to importdata.import_data.
+    """
+    print("=== Full Reload of zines.db ===")
+    build_dir = os.path.dirname(os.path.abspath(db_path))
+    fd, build_path = tempfile.mkstemp(prefix='.build-', suffix='.db', dir=build_dir)
+    os.close(fd)
+    try:
+        if from_current and os.path.exists(db_path):
+            print("\nStep 1: Copying the current database...")
+            _copy_database(db_path, build_path)
+            print("✓ Copied the current database")
+            # Older copies may predate the unique content keys the imports rely on
+            dedupe.add_content_keys(build_path)
+        else:
+            print("\nStep 1: Starting from an empty database...")
+            conn = sqlite3.connect(build_path)
+            try:
+                createdb.create_tables(conn)
+            finally:
+                conn.close()
+            print("✓ Created tables")
+
+        print("\nStep 2: Importing the CSVs...")
+        importdata.import_data(build_path, publications_csv, events_csv, progress=progress)
+        # Seqs in the rebuilt log don't continue the old ones: a new epoch makes mirrors reload
+        conn = sqlite3.connect(build_path)
+        try:
+            changelog.ensure_change_log(conn)
+            changelog.new_epoch(conn)
+        finally:
+            conn.close()
+
+        print("\nStep 3: Publishing the new database...")
+        seconds = publish_snapshot(build_path, snapshot_path)
+        print(f"✓ Published snapshot in {seconds:.2f}s: {snapshot_path}")
+        os.chmod(build_path, 0o644)  # mkstemp creates the file private to this user
+        os.replace(build_path, db_path)
+        print(f"✓ Swapped the new database into place: {db_path}")
+    except BaseException:
+        if os.path.exists(build_path):
+            os.remove(build_path)
+        raise
+
+
+if __name__ == '__main__':
+    if '--reload' in sys.argv[1:]:
+        full_reload(from_current='--from-current' in sys.argv[1:])
+    else:
+        print("=== Publishing zines.db ===")
+        seconds = publish_snapshot()
+        print(f"✓ Published {SNAPSHOT_PATH} in {seconds:.2f}s")
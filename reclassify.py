@@ -0,0 +1,332 @@
+# Reclassification Engine for zines.db
+# Moving a type of row between resources and events (Courses, then Organization) used to
+# be a hand-written INSERT ... SELECT + DELETE per type, run as one transaction that held
+# the write lock for the whole table and couldn't be re-run safely. Here a move is a spec
+# in RECLASSIFICATIONS: source table and type, target table and type, and which source
+# column fills each target column. run_reclassification() then:
+#
+# 1. walks the source rows of that type in rowid order, CHUNK_SIZE rows per transaction
+# 2. in each transaction inserts them into the target (ON CONFLICT DO NOTHING, so a row
+#    already there isn't duplicated), records source id -> target id in
+#    reclassification_log, deletes exactly the logged source rows and saves how far it got
+#    in reclassification_runs
+# 3. resumes an interrupted run from its last chunk when started again with the same name
+#
+# A spec whose source and target are the same table renames a type in place (the
+# vocabulary changes in notes.txt). Only exact type values are renamed: combined types
+# like 'Meeting Report,Call to Organize' are left for bulkedit.py.
+#
+# Examples:
+#   python reclassify.py --list
+#   python reclassify.py organizations
+#   python reclassify.py courses --chunk-size 500
+
+import argparse
+import json
+import sqlite3
+import time
+
+import dedupe
+import publish
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Source rows moved per transaction
+CHUNK_SIZE = 1000
+
+# Column holding each table's type
+TYPE_COLUMNS = {
+    'events': 'event_type',
+    'resources': 'resource_type',
+}
+
+# Target columns filled from the publication the source row belongs to (resources name
+# their issue by volume/issue, events by publication_id). Ambiguous volume/issue pairs
+# take the lowest pub_id, so one resource never becomes two events.
+PUBLICATION_LINKS = {
+    ('resources', 'events'): {
+        'publication_id': '''(SELECT p.pub_id FROM publications p
+                              WHERE p.volume = s.volume AND p.issue_number = s.issue
+                              ORDER BY p.pub_id LIMIT 1)''',
+    },
+    ('events', 'resources'): {
+        'volume': '(SELECT p.volume FROM publications p WHERE p.pub_id = s.publication_id)',
+        'issue': '(SELECT p.issue_number FROM publications p WHERE p.pub_id = s.publication_id)',
+    },
+}
+
+# Target columns a moved row must have; source rows that would leave them NULL stay where
+# they are (integrity.py reports resources whose volume/issue matches no publication)
+REQUIRED_COLUMNS = {
+    'events': ['publication_id'],
+}
+
+# Target column <- source column for a resource becoming an event (event_date stays NULL)
+RESOURCE_TO_EVENT = {
+    'event_title': 'resource_title',
+    'description': 'description',
+    'city': 'city',
+    'state': 'state',
+    'country': 'country',
+    'location': 'location',
+    'address': 'address',
+    'source_publication': 'source_publication',
+}
+
+# Every reclassification, by the name it is run with
+RECLASSIFICATIONS = {
+    'organizations': {
+        'description': "Organization resources become 'Meeting Advertisement' events",
+        'source': 'resources', 'source_type': 'Organization',
+        'target': 'events', 'target_type': 'Meeting Advertisement',
+        'columns': RESOURCE_TO_EVENT,
+    },
+    'courses': {
+        'description': "Courses resources become 'Courses' events (notes.txt: moved from Resources)",
+        'source': 'resources', 'source_type': 'Courses',
+        'target': 'events', 'target_type': 'Courses',
+        'columns': RESOURCE_TO_EVENT,
+    },
+    'call_to_action': {
+        'description': "Events of type 'Call to Organize' become 'Call to Action' (notes.txt)",
+        'source': 'events', 'source_type': 'Call to Organize',
+        'target': 'events', 'target_type': 'Call to Action',
+    },
+    'bookstores': {
+        'description': "Resources of type 'Bookstore' become 'Bookstores' (notes.txt)",
+        'source': 'resources', 'source_type': 'Bookstore',
+        'target': 'resources', 'target_type': 'Bookstores',
+    },
+    'childcare': {
+        'description': "Resources of type 'Childcare' become 'Childcare Services' (notes.txt)",
+        'source': 'resources', 'source_type': 'Childcare',
+        'target': 'resources', 'target_type': 'Childcare Services',
+    },
+    'services': {
+        'description': "Resources of type 'Service' become 'Services' (notes.txt)",
+        'source': 'resources', 'source_type': 'Service',
+        'target': 'resources', 'target_type': 'Services',
+    },
+}
+
+
+def create_tables(conn):
+    """Create the run and log tables if they don't exist yet."""
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS reclassification_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            spec TEXT NOT NULL,                     -- the spec as JSON, so a resumed run does the same move
+            status TEXT NOT NULL DEFAULT 'running', -- running or done
+            last_rowid INTEGER NOT NULL DEFAULT 0,  -- source rows up to here have been handled
+            rows_moved INTEGER NOT NULL DEFAULT 0,
+            started_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS reclassification_log (
+            run_id INTEGER NOT NULL REFERENCES reclassification_runs (run_id),
+            source_id INTEGER NOT NULL,             -- id of the row in the source table (deleted after a move)
+            target_id INTEGER NOT NULL,             -- id of the row it became (or already existed as)
+            moved_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, source_id)
+        ) WITHOUT ROWID;
+    ''')
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _expressions(spec):
+    """SQL expression (over the source row `s`) for every content column of the target."""
+    target = spec['target']
+    expressions = {column: 'NULL' for column in dedupe.CONTENT_COLUMNS[target]}
+    expressions.update({column: f's.{source_column}' for column, source_column in spec['columns'].items()})
+    expressions.update(PUBLICATION_LINKS.get((spec['source'], target), {}))
+    expressions[TYPE_COLUMNS[target]] = _literal(spec['target_type'])
+    return expressions
+
+
+def _selection(spec):
+    """WHERE clause (over `s`) for the source rows a spec moves."""
+    where = f"s.{TYPE_COLUMNS[spec['source']]} = {_literal(spec['source_type'])}"
+    if spec['source'] != spec['target']:
+        expressions = _expressions(spec)
+        for column in REQUIRED_COLUMNS.get(spec['target'], []):
+            where += f' AND {expressions[column]} IS NOT NULL'
+    return where
+
+
+def _target_match(conn, spec):
+    """Join condition finding the target row `t` a source row `s` was inserted as."""
+    expressions = _expressions(spec)
+    columns = dedupe.CONTENT_COLUMNS[spec['target']]
+    exact = ' AND '.join(f't.{column} IS {expressions[column]}' for column in columns)
+    if dedupe.has_hashed_key(conn, spec['target']):
+        # The same hash as the generated column, so the UNIQUE index finds the row;
+        # the columns are still compared in case two rows ever share a hash
+        key = dedupe.content_key_expression(spec['target'], [expressions[column] for column in columns])
+        return f't.content_key = {key} AND {exact}'
+    return exact
+
+
+def _move_chunk(conn, run_id, spec, low, high):
+    """Move the selected source rows with low < rowid <= high into the target. Returns rows moved."""
+    source, target = spec['source'], spec['target']
+    where = f's.rowid > ? AND s.rowid <= ? AND {_selection(spec)}'
+    expressions = _expressions(spec)
+    columns = list(expressions)
+    conn.execute(f'''
+        INSERT INTO {target} ({', '.join(columns)})
+        SELECT {', '.join(expressions[column] for column in columns)} FROM {source} s WHERE {where}
+        ON CONFLICT DO NOTHING
+    ''', (low, high))
+    conn.execute(f'''
+        INSERT OR IGNORE INTO reclassification_log (run_id, source_id, target_id)
+        SELECT ?, s.rowid, t.rowid FROM {source} s JOIN {target} t ON {_target_match(conn, spec)} WHERE {where}
+    ''', (run_id, low, high))
+    # Only rows that are now in the target are deleted; anything the insert couldn't place stays
+    return conn.execute(f'''
+        DELETE FROM {source} WHERE rowid IN (
+            SELECT source_id FROM reclassification_log WHERE run_id = ? AND source_id > ? AND source_id <= ?
+        )
+    ''', (run_id, low, high)).rowcount
+
+
+def _rename_chunk(conn, run_id, spec, low, high):
+    """Change the type of the selected rows with low < rowid <= high in place. Returns rows changed."""
+    table = spec['source']
+    type_column = TYPE_COLUMNS[table]
+    where = f's.rowid > ? AND s.rowid <= ? AND {_selection(spec)}'
+    conn.execute(f'''
+        INSERT OR IGNORE INTO reclassification_log (run_id, source_id, target_id)
+        SELECT ?, s.rowid, s.rowid FROM {table} s WHERE {where}
+    ''', (run_id, low, high))
+    # OR IGNORE: a row that would then duplicate another (same content_key) keeps its old type
+    renamed = conn.execute(f'''
+        UPDATE OR IGNORE {table} AS s SET {type_column} = {_literal(spec['target_type'])} WHERE {where}
+    ''', (low, high)).rowcount
+    conn.execute(f'''
+        DELETE FROM reclassification_log WHERE run_id = ? AND source_id > ? AND source_id <= ?
+          AND source_id IN (SELECT s.rowid FROM {table} s WHERE {where})
+    ''', (run_id, low, high, low, high))
+    return renamed
+
+
+def _count_selected(conn, spec, after_rowid=0):
+    return conn.execute(f"SELECT COUNT(*) FROM {spec['source']} s WHERE s.rowid > ? AND {_selection(spec)}",
+                        (after_rowid,)).fetchone()[0]
+
+
+def _start_run(conn, name):
+    """The unfinished run of this name to resume, or a new one. Returns (run_id, spec, last_rowid, rows_moved)."""
+    run = conn.execute('''
+        SELECT run_id, spec, last_rowid, rows_moved FROM reclassification_runs
+        WHERE name = ? AND status = 'running' ORDER BY run_id DESC LIMIT 1
+    ''', (name,)).fetchone()
+    if run:
+        return run[0], json.loads(run[1]), run[2], run[3]
+    if name not in RECLASSIFICATIONS:
+        raise ValueError(f"Unknown reclassification '{name}'. Choose from: {', '.join(RECLASSIFICATIONS)}")
+    spec = RECLASSIFICATIONS[name]
+    with conn:
+        cursor = conn.execute('INSERT INTO reclassification_runs (name, spec) VALUES (?, ?)',
+                              (name, json.dumps(spec)))
+    return cursor.lastrowid, spec, 0, 0
+
+
+def run_reclassification(name, db_path=DB_PATH, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Run (or resume) a reclassification from RECLASSIFICATIONS.
+
+    Args:
+        name (str): The reclassification to run.
+        db_path (str): Database to change.
+        chunk_size (int): Source rows moved per transaction.
+        progress: Optional callback called as progress(rows_done, rows_total) after each chunk.
+
+    Returns:
+        int: Rows moved (or renamed) by the run, including earlier attempts it resumed
+    """
+    conn = dedupe.register_content_hash(sqlite3.connect(db_path, timeout=30))
+    try:
+        create_tables(conn)
+        run_id, spec, last_rowid, moved = _start_run(conn, name)
+        if last_rowid:
+            print(f"Resuming run {run_id} of '{name}' after row {last_rowid} ({moved} rows moved so far)")
+        move = _rename_chunk if spec['source'] == spec['target'] else _move_chunk
+        start = time.perf_counter()
+        total = moved + _count_selected(conn, spec, last_rowid)
+        if progress:
+            progress(moved, total)
+
+        while True:
+            chunk_end = conn.execute(f'''
+                SELECT MAX(rowid) FROM (
+                    SELECT s.rowid FROM {spec['source']} s WHERE s.rowid > ? AND {_selection(spec)}
+                    ORDER BY s.rowid LIMIT ?
+                )
+            ''', (last_rowid, chunk_size)).fetchone()[0]
+            if chunk_end is None:
+                break
+            with conn:
+                moved += move(conn, run_id, spec, last_rowid, chunk_end)
+                conn.execute('UPDATE reclassification_runs SET last_rowid = ?, rows_moved = ? WHERE run_id = ?',
+                             (chunk_end, moved, run_id))
+            last_rowid = chunk_end
+            if progress:
+                progress(moved, total)
+
+        with conn:
+            conn.execute('''
+                UPDATE reclassification_runs SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE run_id = ?
+            ''', (run_id,))
+        print(f"✓ {spec['description']}: {moved} rows ({time.perf_counter() - start:.2f}s)")
+
+        left = conn.execute(f"SELECT COUNT(*) FROM {spec['source']} s WHERE s.{TYPE_COLUMNS[spec['source']]} = ?",
+                            (spec['source_type'],)).fetchone()[0]
+        if left:
+            reason = ('the same row with the new type already exists' if move is _rename_chunk else
+                      f"no publication for their volume/issue, or the same row is already in {spec['target']}")
+            print(f"❌ {left} rows of type '{spec['source_type']}' were left in {spec['source']} ({reason})")
+        return moved
+    finally:
+        conn.close()
+
+
+def list_reclassifications(db_path=DB_PATH):
+    """Print every reclassification with the rows it would move now, and the recent runs."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        create_tables(conn)
+        for name, spec in RECLASSIFICATIONS.items():
+            print(f"{name:<16} {_count_selected(conn, spec):>7} rows  {spec['description']}")
+        runs = conn.execute('''
+            SELECT run_id, name, status, rows_moved, started_at, finished_at
+            FROM reclassification_runs ORDER BY run_id DESC LIMIT 10
+        ''').fetchall()
+        if runs:
+            print("\nRecent runs:")
+            for run_id, name, status, rows_moved, started_at, finished_at in runs:
+                print(f"  {run_id:>4} {name:<16} {status:<8} {rows_moved:>7} rows  {started_at} - {finished_at or ''}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move or rename a type of row between resources and events.")
+    parser.add_argument('name', nargs='?', choices=list(RECLASSIFICATIONS), help="reclassification to run")
+    parser.add_argument('--db', default=DB_PATH, help="database to change")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="source rows moved per transaction")
+    parser.add_argument('--list', action='store_true', help="list the reclassifications and recent runs")
+    args = parser.parse_args()
+
+    if args.list or not args.name:
+        list_reclassifications(args.db)
+    else:
+        print(f"=== Reclassifying: {args.name} ===")
+        run_reclassification(args.name, args.db, args.chunk_size)
+        if args.db == DB_PATH:
+            publish.refresh_snapshot()  # the web app's snapshot is a copy of zines.db
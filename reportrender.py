@@ -0,0 +1,185 @@
+# Report Rendering for Analysis Tables
+# Splits large result tables into fixed-size pages, renders the PNG pages in parallel
+# worker processes and caches every page so unchanged pages are not re-rendered.
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+# Default folder for rendered reports and how many rows go on one PNG page
+REPORTS_DIR = 'reports'
+# Where rendered pages are cached between runs: next to this module, not the working
+# directory, since reportrunner.py runs every analysis inside a fresh run folder
+CACHE_DIR = os.environ.get('ZINES_REPORT_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report_cache'))
+ROWS_PER_PAGE = 40
+PNG_DPI = 150
+FORMATS = ('png', 'html', 'csv')
+MANIFEST_NAME = 'manifest.json'
+
+
+def _cache_key(query, fmt, page_number, rows_per_page, page_df):
+    """
+    Hash of everything a rendered page depends on: the query, the output format
+    and layout, and the data on the page itself (its data version). A page is only
+    re-rendered when this changes.
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{query}\0{fmt}\0{page_number}\0{rows_per_page}\0{PNG_DPI}\0'.encode('utf-8'))
+    digest.update(page_df.to_csv(index=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_manifest(report_dir):
+    """Return {filename: cache_key} for the pages already rendered in report_dir."""
+    manifest_path = os.path.join(report_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+
+def _save_manifest(report_dir, manifest):
+    """Write the manifest atomically so a crash never leaves it half written."""
+    tmp_path = os.path.join(report_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(report_dir, MANIFEST_NAME))
+
+
+def _publish_file(cached_path, output_path):
+    """Hard-link a cached page into the report folder (copying it if links aren't possible)."""
+    if os.path.exists(output_path):
+        if os.path.samefile(cached_path, output_path):
+            return
+        os.remove(output_path)
+    try:
+        os.link(cached_path, output_path)
+    except OSError:
+        shutil.copy2(cached_path, output_path)
+
+
+def render_png_page(rows, columns, output_path, title=None, dpi=PNG_DPI):
+    """
+    Render one page of a table to a PNG file. Runs inside a worker process, so
+    matplotlib is imported here with the non-interactive Agg backend.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    # Height follows the rows on this page only, so memory stays bounded however big the table is
+    fig, ax = plt.subplots(figsize=(12, max(len(rows), 1) * 0.5 + 1))
+    ax.axis('tight')
+    ax.axis('off')
+    if title:
+        ax.set_title(title)
+    table = ax.table(cellText=rows, colLabels=columns, cellLoc='center', loc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.auto_set_column_width(col=list(range(len(columns))))
+    fig.savefig(output_path, bbox_inches='tight', dpi=dpi)
+    plt.close(fig)
+    return output_path
+
+
+def render_table(df, name, query='', output_dir=REPORTS_DIR, fmt='png',
+                 rows_per_page=ROWS_PER_PAGE, workers=None):
+    """
+    Render a DataFrame as a cached report.
+
+    PNG output is split into pages of `rows_per_page` rows (page_001.png, ...) that
+    are rendered in parallel worker processes. HTML and CSV are written as a single
+    file each, since they are cheap to produce at any size.
+
+    Every output file is rendered into CACHE_DIR/name/ and recorded in a manifest with
+    a key built from the query and the data it shows, so the next run (whatever its
+    output_dir) only renders pages whose data changed. The files are then linked, or
+    copied, into output_dir/name/.
+
+    Args:
+        df (DataFrame): The table to render.
+        name (str): Report name; output goes into output_dir/name/.
+        query (str): The SQL the table came from, part of the cache key.
+        fmt (str): 'png', 'html' or 'csv'.
+        rows_per_page (int): Rows per PNG page.
+        workers (int): Worker processes for PNG rendering (defaults to CPU count).
+
+    Returns:
+        list: Paths of all output files for this report, in page order.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown report format: {fmt}")
+
+    report_dir = os.path.join(CACHE_DIR, name)
+    os.makedirs(report_dir, exist_ok=True)
+    manifest = _load_manifest(report_dir)
+    new_manifest = {}
+    outputs = []
+    to_render = []
+
+    if fmt == 'png':
+        page_count = max((len(df) + rows_per_page - 1) // rows_per_page, 1)
+        for page_number in range(page_count):
+            page_df = df.iloc[page_number * rows_per_page:(page_number + 1) * rows_per_page]
+            filename = f'page_{page_number + 1:03d}.png'
+            output_path = os.path.join(report_dir, filename)
+            key = _cache_key(query, fmt, page_number, rows_per_page, page_df)
+            new_manifest[filename] = key
+            outputs.append(output_path)
+            if manifest.get(filename) != key or not os.path.exists(output_path):
+                title = f'{name} (page {page_number + 1} of {page_count})'
+                to_render.append((page_df.astype(str).values.tolist(), list(df.columns), output_path, title))
+    else:
+        filename = f'{name}.{fmt}'
+        output_path = os.path.join(report_dir, filename)
+        key = _cache_key(query, fmt, 0, len(df), df)
+        new_manifest[filename] = key
+        outputs.append(output_path)
+        if manifest.get(filename) != key or not os.path.exists(output_path):
+            if fmt == 'html':
+                df.to_html(output_path, index=False)
+            else:
+                df.to_csv(output_path, index=False)
+            print(f"✓ Wrote {output_path}")
+
+    if to_render:
+        print(f"Rendering {len(to_render)} of {len(new_manifest)} pages "
+              f"({len(new_manifest) - len(to_render)} unchanged)...")
+        # Always render in workers, even for one page, so the caller's matplotlib backend is untouched
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_png_page, *page) for page in to_render]
+            for future in futures:
+                future.result()
+        print(f"✓ Rendered pages into {report_dir}")
+    elif fmt == 'png':
+        print(f"✓ All {len(new_manifest)} pages unchanged, nothing to render.")
+
+    # Pages left over from a previous, longer version of the table
+    for filename in manifest:
+        if not filename.endswith('.' + fmt) or filename in new_manifest:
+            continue
+        stale_path = os.path.join(report_dir, filename)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    # Keep entries for the other formats so switching formats doesn't invalidate them
+    kept = {filename: key for filename, key in manifest.items()
+            if not filename.endswith('.' + fmt) and os.path.exists(os.path.join(report_dir, filename))}
+    kept.update(new_manifest)
+    _save_manifest(report_dir, kept)
+
+    # Put this run's files where the caller asked for them
+    output_report_dir = os.path.join(output_dir, name)
+    os.makedirs(output_report_dir, exist_ok=True)
+    published = []
+    for cached_path in outputs:
+        output_path = os.path.join(output_report_dir, os.path.basename(cached_path))
+        _publish_file(cached_path, output_path)
+        published.append(output_path)
+    for filename in os.listdir(output_report_dir):
+        if filename.endswith('.' + fmt) and filename not in new_manifest:
+            os.remove(os.path.join(output_report_dir, filename))
+    return published
@@ -0,0 +1,231 @@
+# Parallel Report Runner
+# Runs the whole analysis suite from testqueries.py and analysisqueries.py across a
+# process pool instead of uncommenting __main__ blocks one at a time. Every analysis
+# reads zines.db through a read-only connection and writes its console output and
+# figures into its own folder of a single report directory. The columnar snapshot
+# (snapshot.py) is brought up to date once, before the workers start.
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import sharding
+import snapshot
+
+# Path to the SQLite database and the folder report runs are written to
+DB_PATH = 'zines.db'
+REPORTS_DIR = 'reports'
+
+# The real sqlite3.connect, kept before anything replaces it: when the suite runs as a
+# job, jobqueue.py wraps sqlite3.connect to report progress to jobs.db, and forked
+# workers would otherwise inherit that wrapper along with the job's jobs.db connection
+SQLITE_CONNECT = sqlite3.connect
+
+# (module, function) for every analysis in the suite
+ANALYSES = [
+    ('testqueries', 'analyze_event_types'),
+    ('testqueries', 'analyze_event_types_over_time'),
+    ('testqueries', 'analyze_event_types_and_totals_by_location'),
+    ('testqueries', 'analyze_event_advertisements_and_protests'),
+    ('testqueries', 'analyze_publications_and_events'),
+    ('testqueries', 'analyze_unique_event_locations_with_publications'),
+    ('testqueries', 'analyze_unique_non_usa_event_locations_with_publications'),
+    ('analysisqueries', 'analyze_publications_and_events'),
+    ('analysisqueries', 'rank_source_publications'),
+    ('analysisqueries', 'calculate_source_publication_ratio'),
+]
+
+
+def _readonly_connect_factory(db_path, catalog_path=None):
+    """
+    Build a replacement for sqlite3.connect that opens db_path with a read-only URI
+    (mode=ro), whatever path the analysis asks for. The analyses all call
+    sqlite3.connect('zines.db') directly, so this is installed in the worker process
+    only; the parent process and the web app are unaffected.
+
+    With a shard catalog, the analyses get a federated connection over every shard instead.
+    """
+    original_connect = SQLITE_CONNECT
+    uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+
+    def readonly_connect(database, *args, **kwargs):
+        if catalog_path:
+            sqlite3.connect = original_connect  # connect_federated opens its own connections
+            try:
+                return sharding.connect_federated(catalog_path)
+            finally:
+                sqlite3.connect = readonly_connect
+        kwargs['uri'] = True
+        return original_connect(uri, *args, **kwargs)
+
+    return readonly_connect
+
+
+def _init_worker(db_path, catalog_path=None, snapshot_dir=None):
+    """
+    Set up a worker process once, before its first analysis: the Agg backend, read-only
+    connections (built on SQLITE_CONNECT, whatever sqlite3.connect the parent had when it
+    forked) and the snapshot folder the parent process has already brought up to date.
+    Every analysis of a run needs the same setup, so workers are reused between analyses
+    and the analysis modules (pandas, seaborn, ...) are only imported once per worker.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    sqlite3.connect = _readonly_connect_factory(db_path, catalog_path)
+    if snapshot_dir:
+        # Absolute paths, since the analyses run after a chdir into their output folder
+        snapshot.DB_PATH = db_path
+        snapshot.SNAPSHOT_DIR = snapshot_dir
+        snapshot.REFRESH = False
+
+
+def run_analysis(module_name, function_name, output_dir):
+    """
+    Run one analysis inside a worker process set up by _init_worker.
+
+    Console output goes to output.txt and every figure passed to plt.show() is saved
+    as a PNG in output_dir. Returns a summary dict with the wall time and status.
+    """
+    import matplotlib.pyplot as plt
+
+    os.makedirs(output_dir, exist_ok=True)
+    plt.close('all')  # nothing left over from the worker's previous analysis
+    figure_count = 0
+
+    def save_figures(*args, **kwargs):
+        nonlocal figure_count
+        for number in plt.get_fignums():
+            figure_count += 1
+            plt.figure(number).savefig(f'figure_{figure_count:02d}.png', bbox_inches='tight')
+        plt.close('all')
+
+    plt.show = save_figures
+
+    start = time.perf_counter()
+    status = 'ok'
+    error = None
+    # Relative output paths used by the analyses (PNG tables, report pages) land in output_dir
+    os.chdir(output_dir)
+    with open('output.txt', 'w') as output, contextlib.redirect_stdout(output):
+        try:
+            module = importlib.import_module(module_name)
+            getattr(module, function_name)()
+            save_figures()  # figures that were drawn but never shown
+        except Exception as e:
+            status = 'failed'
+            error = f'{type(e).__name__}: {e}'
+            print(f"❌ {error}")
+
+    return {
+        'analysis': f'{module_name}.{function_name}',
+        'seconds': round(time.perf_counter() - start, 3),
+        'status': status,
+        'error': error,
+        'figures': figure_count,
+    }
+
+
+def prepare_snapshot(db_path, report_dir, catalog_path=None):
+    """
+    Bring the columnar snapshot up to date before any worker starts, so the analyses
+    don't all try to re-export it at once. A shard catalog gets its own snapshot
+    inside the report directory, exported through a federated connection.
+
+    Returns:
+        str: Absolute path of the snapshot folder the workers should read.
+    """
+    if catalog_path:
+        snapshot_dir = os.path.join(report_dir, 'snapshot')
+        conn = sharding.connect_federated(catalog_path)
+        try:
+            snapshot.create_snapshot(catalog_path, snapshot_dir, force=True, conn=conn)
+        finally:
+            conn.close()
+    else:
+        snapshot_dir = os.path.abspath(snapshot.SNAPSHOT_DIR)
+        snapshot.create_snapshot(db_path, snapshot_dir)
+    return snapshot_dir
+
+
+def run_suite(analyses=ANALYSES, db_path=DB_PATH, report_dir=None, workers=None, catalog_path=None,
+              progress=None):
+    """
+    Run every analysis in parallel and collect the outputs into one report directory.
+
+    Workers are set up once by _init_worker and then run one analysis after another,
+    and the whole run takes roughly as long as the slowest single analysis when there
+    are enough CPUs. Analyses cached by analysiscache.py replay their output, so a
+    re-run against unchanged data mostly costs the workers' imports. Pass catalog_path to analyze every
+    shard listed in a sharding.py catalog instead of a single database.
+    progress is an optional callback called as progress(analyses_done, analyses_total).
+
+    Returns:
+        list: One summary dict per analysis, in suite order.
+    """
+    if report_dir is None:
+        report_dir = os.path.join(REPORTS_DIR, datetime.now().strftime('run_%Y%m%d_%H%M%S'))
+    report_dir = os.path.abspath(report_dir)
+    db_path = os.path.abspath(db_path)
+    if catalog_path:
+        catalog_path = os.path.abspath(catalog_path)
+    os.makedirs(report_dir, exist_ok=True)
+
+    print("=== Running Analysis Suite ===")
+    print(f"Database: {catalog_path or db_path} (read-only)")
+    print(f"Report directory: {report_dir}")
+    print("=" * 60)
+
+    suite_start = time.perf_counter()
+    snapshot_dir = prepare_snapshot(db_path, report_dir, catalog_path)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_path, catalog_path, snapshot_dir)) as pool:
+        futures = [
+            pool.submit(run_analysis, module_name, function_name,
+                        os.path.join(report_dir, f'{module_name}.{function_name}'))
+            for module_name, function_name in analyses
+        ]
+        for done, _ in enumerate(as_completed(futures), start=1):
+            if progress:
+                progress(done, len(futures))
+        results = [future.result() for future in futures]
+    total_seconds = time.perf_counter() - suite_start
+
+    print(f"{'Analysis':<75} {'Seconds':>8}  Status")
+    print("-" * 95)
+    for result in results:
+        print(f"{result['analysis']:<75} {result['seconds']:>8.2f}  {result['status']}")
+        if result['error']:
+            print(f"    {result['error']}")
+    print("-" * 95)
+    slowest = max((result['seconds'] for result in results), default=0)
+    print(f"Total wall time: {total_seconds:.2f}s (slowest single analysis: {slowest:.2f}s)")
+
+    with open(os.path.join(report_dir, 'summary.json'), 'w') as file:
+        json.dump({'total_seconds': round(total_seconds, 3), 'analyses': results}, file, indent=2)
+    print(f"\n✓ Summary saved to {os.path.join(report_dir, 'summary.json')}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analysis suite in parallel.")
+    parser.add_argument('--db', default=DB_PATH, help="database to analyze (opened read-only)")
+    parser.add_argument('--catalog', help="shard catalog from sharding.py (analyzes every shard)")
+    parser.add_argument('--report-dir', help="where to write the report (default: reports/run_<timestamp>)")
+    parser.add_argument('--workers', type=int, help="number of worker processes (default: CPU count)")
+    parser.add_argument('--only', nargs='*', help="run only analyses whose name contains one of these")
+    args = parser.parse_args()
+
+    selected = ANALYSES
+    if args.only:
+        selected = [(module_name, function_name) for module_name, function_name in ANALYSES
+                    if any(part in f'{module_name}.{function_name}' for part in args.only)]
+    run_suite(selected, db_path=args.db, report_dir=args.report_dir, workers=args.workers,
+              catalog_path=args.catalog)
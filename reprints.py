@@ -0,0 +1,278 @@
+# Reprint Detection with MinHash and LSH
+# Many events are reprints: the same item appears in several zines with slightly
+# different wording, and source_publication ("LNS", "The Militant", ...) is only filled
+# in for some of them. This finds them without comparing every pair of events.
+#
+# Each event's title + description is cut into overlapping 5-character shingles and
+# summarized by a MinHash signature (NUM_PERM minimums of random hash functions; two
+# signatures agree in about the same share of places as the two shingle sets overlap).
+# The signature is split into BANDS bands, and events that match exactly on any band
+# share an LSH bucket. Only events sharing a bucket are compared, and pairs whose
+# estimated similarity is at least LINK_THRESHOLD are written to reprint_links.
+#
+# Signatures and buckets are stored in zines.db, so each run only signs events that
+# are new (no signature yet) or changed since the last run (from change_log), and
+# compares them against the buckets already there.
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import zlib
+
+import numpy as np
+
+import changelog
+
+# Path to the SQLite database
+DB_PATH = 'zines.db'
+
+# Shingle length in characters, and the signature layout: BANDS bands of ROWS values.
+# With 32 bands of 4 rows, pairs about 42% similar have an even chance of sharing a
+# bucket, and pairs 70% similar or more almost always do.
+SHINGLE_SIZE = 5
+BANDS = 32
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+
+# Estimated Jaccard similarity needed to record a pair as reprints (recurring ads
+# like "Tuesday Meetings" / "Thursday Meetings" score around 0.5-0.6)
+LINK_THRESHOLD = 0.7
+
+# Shorter texts (a bare title like "Meeting") are signed but never bucketed
+MIN_TEXT_LENGTH = 40
+
+# Events signed per batch
+BATCH_SIZE = 500
+
+# Random hash functions h(x) = (a*x + b) mod PRIME, fixed by the seed so stored
+# signatures stay comparable between runs
+PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1971)
+HASH_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.int64)
+HASH_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.int64)
+
+
+def create_reprint_tables(conn):
+    """Create the signature, bucket and link tables if they don't exist yet."""
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS minhash_signatures (
+            event_id INTEGER PRIMARY KEY,
+            signature BLOB                  -- NUM_PERM int32 values, NULL for texts too short to compare
+        );
+        CREATE TABLE IF NOT EXISTS lsh_buckets (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,        -- hash of the signature values in this band
+            event_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, event_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_lsh_buckets_event ON lsh_buckets(event_id);
+        CREATE TABLE IF NOT EXISTS reprint_links (
+            event_id INTEGER NOT NULL,      -- the lower id of the pair
+            reprint_id INTEGER NOT NULL,    -- the higher id
+            similarity REAL NOT NULL,       -- estimated Jaccard similarity of the shingle sets
+            PRIMARY KEY (event_id, reprint_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_reprint_links_reprint ON reprint_links(reprint_id);
+        CREATE TABLE IF NOT EXISTS reprint_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL,           -- change_log seq processed up to
+            epoch TEXT                      -- change_log epoch that seq belongs to
+        );
+    ''')
+    if 'epoch' not in [row[1] for row in conn.execute('PRAGMA table_info(reprint_state)')]:
+        conn.execute('ALTER TABLE reprint_state ADD COLUMN epoch TEXT')  # tables from before epochs
+
+
+def normalize(text):
+    """Lowercase, letters and digits only, single spaces, so punctuation and spacing edits don't matter."""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', (text or '').lower()).split())
+
+
+def signature(text):
+    """
+    MinHash signature of a normalized text's shingles.
+
+    Returns:
+        numpy.ndarray or None: NUM_PERM int32 values, or None if the text is too short.
+    """
+    if len(text) < MIN_TEXT_LENGTH:
+        return None
+    shingles = {text[start:start + SHINGLE_SIZE] for start in range(len(text) - SHINGLE_SIZE + 1)}
+    values = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                         dtype=np.int64, count=len(shingles)) % PRIME
+    # One row per hash function, one column per shingle; keep each row's minimum
+    return ((np.outer(HASH_A, values) + HASH_B[:, None]) % PRIME).min(axis=1).astype(np.int32)
+
+
+def band_buckets(values):
+    """One bucket number per band: a 64-bit hash of that band's signature values."""
+    return [int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'big', signed=True)
+            for band in values.reshape(BANDS, ROWS)]
+
+
+def _forget(conn, event_ids):
+    """Remove the stored signatures, buckets and links of these events."""
+    for start in range(0, len(event_ids), BATCH_SIZE):
+        chunk = event_ids[start:start + BATCH_SIZE]
+        placeholders = ', '.join('?' * len(chunk))
+        conn.execute(f'DELETE FROM lsh_buckets WHERE event_id IN ({placeholders})', chunk)
+        conn.execute(f'DELETE FROM minhash_signatures WHERE event_id IN ({placeholders})', chunk)
+        conn.execute(f'DELETE FROM reprint_links WHERE event_id IN ({placeholders})', chunk)
+        conn.execute(f'DELETE FROM reprint_links WHERE reprint_id IN ({placeholders})', chunk)
+
+
+def _sign_batch(conn, event_ids):
+    """
+    Sign a batch of events, store their buckets, and link them to every stored event
+    they share a bucket with and are similar enough to.
+
+    Returns:
+        int: Number of links written.
+    """
+    placeholders = ', '.join('?' * len(event_ids))
+    rows = conn.execute(f'''
+        SELECT event_id, event_title, description FROM events WHERE event_id IN ({placeholders})
+    ''', event_ids).fetchall()
+
+    signatures = {}
+    for event_id, title, description in rows:
+        values = signature(normalize(f'{title} {description or ""}'))
+        conn.execute('INSERT OR REPLACE INTO minhash_signatures (event_id, signature) VALUES (?, ?)',
+                     (event_id, None if values is None else values.tobytes()))
+        if values is not None:
+            signatures[event_id] = values
+            conn.executemany('INSERT OR IGNORE INTO lsh_buckets (band, bucket, event_id) VALUES (?, ?, ?)',
+                             [(band, bucket, event_id) for band, bucket in enumerate(band_buckets(values))])
+    if not signatures:
+        return 0
+
+    # Every stored event sharing a bucket with one of this batch (the batch included)
+    signed = list(signatures)
+    candidates = conn.execute(f'''
+        SELECT DISTINCT mine.event_id, other.event_id, minhash_signatures.signature
+        FROM lsh_buckets AS mine
+        JOIN lsh_buckets AS other ON other.band = mine.band AND other.bucket = mine.bucket
+                                 AND other.event_id != mine.event_id
+        JOIN minhash_signatures ON minhash_signatures.event_id = other.event_id
+        WHERE mine.event_id IN ({', '.join('?' * len(signed))})
+    ''', signed).fetchall()
+
+    links = {}
+    for event_id, other_id, other_signature in candidates:
+        similarity = float((signatures[event_id] == np.frombuffer(other_signature, dtype=np.int32)).mean())
+        if similarity >= LINK_THRESHOLD:
+            links[(min(event_id, other_id), max(event_id, other_id))] = similarity
+    conn.executemany('INSERT OR REPLACE INTO reprint_links (event_id, reprint_id, similarity) VALUES (?, ?, ?)',
+                     [(first, second, round(similarity, 4)) for (first, second), similarity in links.items()])
+    return len(links)
+
+
+def update_reprints(db_path=DB_PATH, progress=None):
+    """
+    Bring signatures, buckets and reprint links up to date with the events table.
+
+    Events without a signature are signed; events edited since the last run (per
+    change_log) are re-signed; signatures of deleted events are removed. Each batch is
+    committed on its own, so an interrupted run carries on where it stopped.
+
+    Args:
+        progress: Optional callback progress(done, total), e.g. a jobqueue.JobProgress.
+
+    Returns:
+        int: Number of events signed.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            create_reprint_tables(conn)
+        state = conn.execute('SELECT seq, epoch FROM reprint_state WHERE id = 1').fetchone()
+        last_seq, last_epoch = state if state else (0, None)
+        latest_seq = changelog.current_seq(conn)
+        epoch = changelog.log_epoch(conn)
+
+        # Edited events since the last run: drop what was stored for them, so they count as new
+        if latest_seq < last_seq or (state and epoch != last_epoch):
+            # The database was rebuilt (new epoch), so nothing stored can be trusted: sign everything again
+            edited = {row[0] for row in conn.execute('SELECT event_id FROM minhash_signatures')}
+        else:
+            edited = {row[0] for row in conn.execute('''
+                SELECT DISTINCT row_id FROM change_log WHERE table_name = 'events' AND seq > ?
+            ''', (last_seq,))} if changelog.has_change_log(conn) else set()
+        with conn:
+            _forget(conn, sorted(edited))
+            # Events deleted without going through the log (e.g. a database without change_log)
+            deleted = [row[0] for row in conn.execute('''
+                SELECT event_id FROM minhash_signatures
+                WHERE NOT EXISTS (SELECT 1 FROM events WHERE events.event_id = minhash_signatures.event_id)
+            ''')]
+            _forget(conn, deleted)
+
+        unsigned = [row[0] for row in conn.execute('''
+            SELECT event_id FROM events
+            WHERE NOT EXISTS (SELECT 1 FROM minhash_signatures WHERE minhash_signatures.event_id = events.event_id)
+            ORDER BY event_id
+        ''')]
+        links = 0
+        for start in range(0, len(unsigned), BATCH_SIZE):
+            with conn:
+                links += _sign_batch(conn, unsigned[start:start + BATCH_SIZE])
+            if progress:
+                progress(min(start + BATCH_SIZE, len(unsigned)), len(unsigned))
+
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO reprint_state (id, seq, epoch) VALUES (1, ?, ?)',
+                         (latest_seq, epoch))
+        print(f"✓ Signed {len(unsigned)} new or edited events, {links} reprint links written")
+        return len(unsigned)
+    finally:
+        conn.close()
+
+
+def show_reprints(db_path=DB_PATH, min_similarity=LINK_THRESHOLD, limit=20):
+    """Print the strongest reprint links, with the zine and source publication of each side."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('''
+            SELECT reprint_links.similarity,
+                   first.event_id, first.event_title, first_pub.pub_title, first.source_publication,
+                   second.event_id, second.event_title, second_pub.pub_title, second.source_publication
+            FROM reprint_links
+            JOIN events AS first ON first.event_id = reprint_links.event_id
+            JOIN events AS second ON second.event_id = reprint_links.reprint_id
+            LEFT JOIN publications AS first_pub ON first_pub.pub_id = first.publication_id
+            LEFT JOIN publications AS second_pub ON second_pub.pub_id = second.publication_id
+            WHERE reprint_links.similarity >= ?
+            ORDER BY reprint_links.similarity DESC, reprint_links.event_id
+            LIMIT ?
+        ''', (min_similarity, limit)).fetchall()
+        total, across_zines = conn.execute('''
+            SELECT COUNT(*), COALESCE(SUM(first.publication_id IS NOT second.publication_id), 0)
+            FROM reprint_links
+            JOIN events AS first ON first.event_id = reprint_links.event_id
+            JOIN events AS second ON second.event_id = reprint_links.reprint_id
+            WHERE reprint_links.similarity >= ?
+        ''', (min_similarity,)).fetchone()
+    except sqlite3.Error as e:
+        print(f"❌ Error while reading reprint links: {e}")
+        return
+    finally:
+        conn.close()
+
+    print(f"\n=== Reprints (similarity >= {min_similarity}) ===")
+    print(f"{total} linked pairs, {across_zines} of them in different issues")
+    for similarity, *pair in rows:
+        print(f"\n{similarity:.2f}")
+        for event_id, title, pub_title, source in (pair[:4], pair[4:]):
+            print(f"  [{event_id}] {title} — {pub_title or 'NA'} (source: {source or 'NA'})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find reprinted events with MinHash signatures and LSH buckets.")
+    parser.add_argument('--min-similarity', type=float, default=LINK_THRESHOLD, help="only show links at least this similar")
+    parser.add_argument('--top', type=int, default=20, help="links to print")
+    args = parser.parse_args()
+
+    print("=== Updating Reprint Links ===")
+    update_reprints()
+    show_reprints(min_similarity=args.min_similarity, limit=args.top)
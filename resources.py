@@ -1,5 +1,7 @@
 #import sqlite3
 #import csv
+#import createdb
+#import dedupe
 
 # Path to the SQLite database
 #DB_PATH = 'zines.db'
@@ -11,29 +13,17 @@
 #    """
 #    Delete the 'resources' table if it exists and recreate it with the specified columns.
 #    """
-#    conn = sqlite3.connect(DB_PATH)
+#    conn = dedupe.register_content_hash(sqlite3.connect(DB_PATH))  # content_key is computed by content_hash()
 #    cursor = conn.cursor()
 
     # Drop the 'resources' table if it exists
 #    cursor.execute('DROP TABLE IF EXISTS resources')
 
     # Create the 'resources' table with the specified columns
-#    cursor.execute('''
-#        CREATE TABLE resources (
-#            resource_id INTEGER PRIMARY KEY AUTOINCREMENT,
-#            resource_title TEXT,
-#            volume INTEGER,
-#            issue INTEGER,
-#            resource_type TEXT,
-#            location TEXT,
-#            address TEXT,
-#            city TEXT,
-#            state TEXT,
-#            country TEXT,
-#            source_publication TEXT,
-#            description TEXT
-#        )
-#    ''')
+#    # Same definition as createdb.py, with the content_key column and its UNIQUE index,
+#    # so the ON CONFLICT DO NOTHING below skips rows that are already there
+#    createdb.create_resources_table(cursor)
+#    cursor.execute(dedupe.unique_index_sql('resources'))
 #    conn.commit()
 #    conn.close()
 #    print("Table 'resources' recreated successfully.")
@@ -43,7 +33,7 @@
 #    Import data from the CSV file into the 'resources' table.
 #    Handles multiple resource types by splitting them into separate rows.
 #    """
-#    conn = sqlite3.connect(DB_PATH)
+#    conn = dedupe.register_content_hash(sqlite3.connect(DB_PATH))  # content_key is computed by content_hash()
 #    cursor = conn.cursor()
 
     # Open the CSV file and insert data into the 'resources' table
@@ -58,6 +48,7 @@
 #                cursor.execute('''
 #                    INSERT INTO resources (resource_title, volume, issue, resource_type, location, address, city, state, country, source_publication, description)
 #                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+#                    ON CONFLICT DO NOTHING
 #                ''', (
 #                    row.get('resource_title', 'NA'),
 #                    row.get('volume', None),
@@ -67,6 +58,7 @@
 #                    row.get('address', 'NA'),
 #                    row.get('city', 'NA'),
 #                    row.get('state', 'NA'),
+#                    row.get('country', 'NA'),
 #                    row.get('source_publication', 'NA'),
 #                    row.get('description', 'NA')
 #                ))
@@ -75,12 +67,13 @@
 #    conn.close()
 #    print("Data imported into 'resources' table successfully.")
 
+# (now reclassify.py's 'courses' spec)
 #def move_courses_to_events():
 #    """
 #    Move all rows with resource_type 'Courses' from the 'resources' table
 #    into the 'events' table, matching columns directly.
 #    """
-#    conn = sqlite3.connect(DB_PATH)
+#    conn = dedupe.register_content_hash(sqlite3.connect(DB_PATH))  # content_key is computed by content_hash()
 #    cursor = conn.cursor()
 
     # Insert rows with resource_type 'Courses' into the events table
@@ -91,6 +84,7 @@
 #        LEFT JOIN publications p
 #       ON r.volume = p.volume AND r.issue = p.issue_number
 #        WHERE r.resource_type = 'Courses'
+#        ON CONFLICT DO NOTHING
 #    ''')
 
     # Delete the moved rows from the resources table
@@ -140,55 +134,26 @@
 #    delete_events()
 
 # ---------------------------------------------------------------------------------------
-import sqlite3
+# Moves between resources and events are specs in reclassify.py now
+# (python reclassify.py courses / organizations); this keeps the old entry point.
+import reclassify
 
 # Path to the SQLite database
 DB_PATH = 'zines.db'
 
-def move_organizations_to_events():
+def move_organizations_to_events(progress=None):
     """
     Move rows with resource_type 'Organization' from the 'resources' table
     into the 'events' table, setting event_type to 'Meeting Advertisement'.
+    Only rows whose volume/issue matches a publication are moved (an event needs
+    its publication_id); the rest stay in resources, where integrity.py reports them.
+
+    Runs reclassify.py's 'organizations' spec: chunked, resumable, and logged in
+    reclassification_log. progress is an optional callback called as
+    progress(rows_done, rows_total).
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    try:
-        # Insert rows with resource_type 'Organization' into the events table
-        cursor.execute('''
-            INSERT INTO events (event_title, description, publication_id, event_date, city, state, country, event_type, location, address, source_publication)
-            SELECT 
-                r.resource_title, 
-                r.description, 
-                p.pub_id, 
-                NULL,  -- No event_date provided
-                r.city, 
-                r.state, 
-                r.country, 
-                'Meeting Advertisement',  -- Set event_type to 'Meeting Advertisement'
-                r.location, 
-                r.address, 
-                r.source_publication
-            FROM resources r
-            LEFT JOIN publications p
-            ON r.volume = p.volume AND r.issue = p.issue_number
-            WHERE r.resource_type = 'Organization'
-        ''')
-
-        # Delete the moved rows from the resources table
-        cursor.execute('''
-            DELETE FROM resources
-            WHERE resource_type = 'Organization'
-        ''')
-
-        conn.commit()
-        print("Organizations moved to 'events' table successfully as 'Meeting Advertisement'.")
-    except sqlite3.Error as e:
-        print(f"❌ Error while moving organizations to events: {e}")
-    finally:
-        conn.close()
-        print("\n✓ Database connection closed.")
+    return reclassify.run_reclassification('organizations', db_path=DB_PATH, progress=progress)
 
 # Run the function
 if __name__ == "__main__":
-    move_organizations_to_events()
\ No newline at end of file
+    move_organizations_to_events()
@@ -0,0 +1,657 @@
+# Multi-Zine Sharding
+# Stores each publication title (zine run) in its own shard database, listed in a small
+# catalog database. Imports and edits for one zine only lock that zine's shard, and
+# readers see every zine at once through a federated connection that ATTACHes the
+# shards and exposes events/publications/resources as UNION ALL views.
+#
+# Record ids are globally unique: shard n hands out ids starting at n * SHARD_ID_SPAN,
+# so an id alone tells which shard a record lives in and joins across the views work.
+
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+import createdb
+import dedupe
+
+# Catalog database and the folder the shard databases live in
+CATALOG_PATH = 'catalog.db'
+SHARDS_DIR = 'shards'
+
+# Ids reserved per shard (shard 1 uses 1,000,000,001 - 1,999,999,999, and so on)
+SHARD_ID_SPAN = 1_000_000_000
+
+SHARDED_TABLES = {
+    'publications': 'pub_id',
+    'events': 'event_id',
+    'resources': 'resource_id',
+}
+
+
+def _connect_catalog(catalog_path=CATALOG_PATH):
+    """Open the catalog, creating its table on first use."""
+    conn = sqlite3.connect(catalog_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shards (
+            shard_id INTEGER PRIMARY KEY,        -- also the id range of the shard
+            pub_title TEXT NOT NULL UNIQUE,      -- the zine stored in this shard
+            db_path TEXT NOT NULL,               -- shard database, relative to the catalog
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    return conn
+
+
+def _shard_filename(pub_title, shard_id):
+    """A readable, filesystem-safe file name for a shard."""
+    slug = re.sub(r'[^a-z0-9]+', '_', pub_title.lower()).strip('_') or 'zine'
+    return f'{shard_id:03d}_{slug}.db'
+
+
+def _resolve(catalog_path, db_path):
+    """Shard paths are stored relative to the catalog so the folder can be moved."""
+    return os.path.join(os.path.dirname(os.path.abspath(catalog_path)), db_path)
+
+
+def list_shards(catalog_path=CATALOG_PATH):
+    """Return every shard as a dict with shard_id, pub_title and the absolute db_path."""
+    conn = _connect_catalog(catalog_path)
+    try:
+        rows = conn.execute('SELECT shard_id, pub_title, db_path FROM shards ORDER BY shard_id').fetchall()
+    finally:
+        conn.close()
+    return [{'shard_id': row['shard_id'], 'pub_title': row['pub_title'],
+             'db_path': _resolve(catalog_path, row['db_path'])} for row in rows]
+
+
+def get_or_create_shard(pub_title, catalog_path=CATALOG_PATH):
+    """
+    Return the shard for a publication title, creating the shard database
+    (full zines schema, id counters moved to the shard's range) if it's new.
+    """
+    conn = _connect_catalog(catalog_path)
+    try:
+        row = conn.execute('SELECT shard_id, db_path FROM shards WHERE pub_title = ?', (pub_title,)).fetchone()
+        if row:
+            return {'shard_id': row['shard_id'], 'pub_title': pub_title,
+                    'db_path': _resolve(catalog_path, row['db_path'])}
+
+        shard_id = conn.execute('SELECT COALESCE(MAX(shard_id), 0) + 1 FROM shards').fetchone()[0]
+        relative_path = os.path.join(SHARDS_DIR, _shard_filename(pub_title, shard_id))
+        db_path = _resolve(catalog_path, relative_path)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        shard = sqlite3.connect(db_path)
+        try:
+            createdb.create_tables(shard)
+            # AUTOINCREMENT continues from sqlite_sequence, so start each table at the shard's range
+            shard.executemany('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                              [(table, shard_id * SHARD_ID_SPAN) for table in SHARDED_TABLES])
+            shard.commit()
+        finally:
+            shard.close()
+
+        conn.execute('INSERT INTO shards (shard_id, pub_title, db_path) VALUES (?, ?, ?)',
+                     (shard_id, pub_title, relative_path))
+        conn.commit()
+        print(f"✓ Created shard {shard_id} for {pub_title}: {db_path}")
+        return {'shard_id': shard_id, 'pub_title': pub_title, 'db_path': db_path}
+    finally:
+        conn.close()
+
+
+def shard_for_id(record_id, catalog_path=CATALOG_PATH):
+    """Return the shard a record id belongs to, or None if no such shard exists."""
+    shard_id = int(record_id) // SHARD_ID_SPAN
+    for shard in list_shards(catalog_path):
+        if shard['shard_id'] == shard_id:
+            return shard
+    return None
+
+
+def connect_shard(shard):
+    """Open a normal read/write connection to one shard."""
+    conn = dedupe.register_content_hash(sqlite3.connect(shard['db_path']))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _attach_shards(conn, shards):
+    """Attach shards read-only to conn and create the UNION ALL views over them."""
+    for shard in shards:
+        uri = Path(shard['db_path']).resolve().as_uri() + '?mode=ro'
+        conn.execute('ATTACH DATABASE ? AS ?', (uri, f"shard_{shard['shard_id']}"))
+
+    for table in SHARDED_TABLES:
+        if shards:
+            union = '\nUNION ALL\n'.join(f"SELECT * FROM shard_{shard['shard_id']}.{table}" for shard in shards)
+        else:
+            # No shards yet: an empty view with the right columns
+            empty = sqlite3.connect(':memory:')
+            createdb.create_tables(empty)
+            columns = [row[1] for row in empty.execute(f'PRAGMA table_info({table})')]
+            empty.close()
+            union = f"SELECT {', '.join('NULL AS ' + column for column in columns)} WHERE 0"
+        conn.execute(f'CREATE TEMP VIEW {table} AS {union}')
+
+
+def connect_federated(catalog_path=CATALOG_PATH):
+    """
+    Open a read-only connection that sees every shard at once.
+
+    Each shard is attached read-only and events, publications and resources are
+    TEMP views that UNION ALL the shard tables. SQLite pushes WHERE clauses on the
+    views down into each shard, so id lookups still use each shard's primary key.
+    Writes must go to the shard itself (connect_shard).
+
+    SQLite attaches at most 10 databases per connection by default (125 at most, set
+    at compile time). With more shards than that, the shards are split into groups
+    that each get their own connection and views, and a FederatedConnection runs
+    every query on each group and merges the results (see FederatedConnection).
+    """
+    shards = list_shards(catalog_path)
+    conn = sqlite3.connect('file::memory:', uri=True)
+    # Raising the limit past the build's maximum is silently capped
+    conn.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, max(len(shards), 1))
+    group_size = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(shards) <= group_size:
+        _attach_shards(conn, shards)
+        return conn
+    conn.close()
+
+    federated = sqlite3.connect(':memory:', factory=FederatedConnection)
+    for start in range(0, len(shards), group_size):
+        group = sqlite3.connect('file::memory:', uri=True)
+        _attach_shards(group, shards[start:start + group_size])
+        federated.groups.append(group)
+    return federated
+
+
+# Aggregates whose per-group results can be combined: function -> how
+MERGEABLE_AGGREGATES = {'COUNT': 'sum', 'SUM': 'sum', 'TOTAL': 'sum', 'MIN': 'min', 'MAX': 'max'}
+AGGREGATES = set(MERGEABLE_AGGREGATES) | {'AVG', 'GROUP_CONCAT', 'JSON_GROUP_ARRAY', 'JSON_GROUP_OBJECT'}
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<name>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|[A-Za-z_][A-Za-z_0-9$]*)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+)
+  | (?P<param>\?\d*|[:@$][A-Za-z_0-9]+)
+  | (?P<op>\|\||<=|>=|<>|!=|==|<<|>>|.)
+''', re.S | re.X)
+
+
+class _Token:
+    """One SQL token: kind, text, upper-cased text, position in the SQL and paren depth."""
+
+    def __init__(self, kind, text, start, end, depth):
+        self.kind = kind
+        self.text = text
+        self.upper = text.upper()
+        self.start = start
+        self.end = end
+        self.depth = depth
+
+    def is_call(self, tokens, index, names):
+        """Whether this token is one of names followed by '('."""
+        return (self.kind == 'name' and self.upper in names
+                and index + 1 < len(tokens) and tokens[index + 1].text == '(')
+
+
+def _tokenize(sql):
+    tokens = []
+    depth = 0
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind == 'space':
+            continue
+        text = match.group()
+        if text == ')':
+            depth -= 1
+        tokens.append(_Token(kind, text, match.start(), match.end(), depth))
+        if text == '(':
+            depth += 1
+    return tokens
+
+
+def _unsupported(sql, reason):
+    return sqlite3.NotSupportedError(f"Can't merge this query across shard groups ({reason}): {sql.strip()[:200]}")
+
+
+def _split_commas(tokens, depth):
+    """Split a token list on the commas at the given paren depth."""
+    parts = [[]]
+    for token in tokens:
+        if token.text == ',' and token.depth == depth:
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    return parts
+
+
+def _closing(tokens, index):
+    """Index of the ')' matching the '(' at tokens[index]."""
+    for position in range(index + 1, len(tokens)):
+        if tokens[position].text == ')' and tokens[position].depth == tokens[index].depth:
+            return position
+    return len(tokens) - 1
+
+
+def _has_aggregate(tokens, skip_subqueries):
+    """Whether an aggregate (or window) function is used in tokens, optionally outside subqueries."""
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if (skip_subqueries and token.text == '(' and index + 1 < len(tokens)
+                and tokens[index + 1].upper in ('SELECT', 'WITH')):
+            index = _closing(tokens, index) + 1
+            continue
+        if token.is_call(tokens, index, AGGREGATES) or token.upper == 'OVER':
+            return True
+        index += 1
+    return False
+
+
+def _select_item(tokens, sql):
+    """
+    Classify one select-list item: ('aggregate', merge), ('value', None) or
+    ('subquery', merge or None) for a scalar subquery, plus its alias if any.
+    """
+    if len(tokens) >= 2 and tokens[-2].upper == 'AS':
+        tokens = tokens[:-2]
+    elif (len(tokens) >= 2 and tokens[-1].kind == 'name'
+          and (tokens[-2].text == ')' or tokens[-2].kind in ('name', 'number', 'string'))):
+        tokens = tokens[:-1]  # implicit alias
+
+    first = tokens[0]
+    whole_call = len(tokens) > 2 and tokens[1].text == '(' and _closing(tokens, 1) == len(tokens) - 1
+    if whole_call and first.is_call(tokens, 0, AGGREGATES):
+        arguments = _split_commas(tokens[2:-1], tokens[1].depth + 1)
+        if first.upper in ('MIN', 'MAX') and len(arguments) > 1:
+            pass  # the two-argument scalar MIN/MAX
+        elif first.upper not in MERGEABLE_AGGREGATES:
+            raise _unsupported(sql, f'{first.upper}() across groups')
+        elif tokens[2].upper == 'DISTINCT':
+            raise _unsupported(sql, f'{first.upper}(DISTINCT ...)')
+        else:
+            return 'aggregate', MERGEABLE_AGGREGATES[first.upper]
+
+    if first.text == '(' and tokens[1].upper == 'SELECT' and _closing(tokens, 0) == len(tokens) - 1:
+        inner = tokens[2:-1]
+        words = [token.upper if token.depth == first.depth + 1 else None for token in inner]
+        items = _split_commas(inner[:words.index('FROM')] if 'FROM' in words else inner, first.depth + 1)
+        if len(items) == 1 and 'GROUP' not in words:
+            kind, merge = _select_item(items[0], sql)
+            if kind == 'aggregate':
+                return 'subquery', merge
+        return 'subquery', None
+
+    if _has_aggregate(tokens, skip_subqueries=True):
+        raise _unsupported(sql, 'aggregate inside an expression')
+    return 'value', None
+
+
+class _QueryPlan:
+    """
+    How to run a SELECT on every shard group and merge the results: the SQL and
+    parameters sent to each group, and how the rows are combined afterwards.
+    """
+
+    def __init__(self, sql, parameters):
+        self.sql = sql
+        self.parameters = parameters
+        self.mode = 'first'         # 'first' (one group answers), 'rows', 'grouped' or 'aggregate'
+        self.items = []             # (kind, merge) per output column
+        self.distinct = False
+        self.order = []             # (column name or 1-based number, descending)
+        self.limit = -1
+        self.offset = 0
+
+        tokens = _tokenize(sql)
+        if not tokens or tokens[0].upper not in ('SELECT', 'WITH'):
+            return  # PRAGMA and the like: every group's schema is the same
+        top = [index for index, token in enumerate(tokens) if token.depth == 0]
+        select = next((index for index in top if tokens[index].upper == 'SELECT'), None)
+        if select is None:
+            return
+
+        clauses = {}
+        for position, index in enumerate(top):
+            word = tokens[index].upper
+            if index < select:
+                continue
+            if word in ('UNION', 'INTERSECT', 'EXCEPT'):
+                raise _unsupported(sql, 'compound SELECT')
+            if word in ('HAVING', 'WINDOW'):
+                raise _unsupported(sql, word)
+            if word in ('FROM', 'WHERE', 'LIMIT') or (
+                    word in ('GROUP', 'ORDER') and position + 1 < len(top) and tokens[top[position + 1]].upper == 'BY'):
+                clauses.setdefault(word, index)
+        boundaries = sorted(clauses.values()) + [len(tokens)]
+
+        def clause(word, skip=1):
+            if word not in clauses:
+                return []
+            start = clauses[word]
+            return tokens[start + skip:next(end for end in boundaries if end > start)]
+
+        # Subqueries feeding the rows (CTEs, FROM, WHERE) must not aggregate: they only see one group
+        feeding = tokens[:select] + clause('FROM') + clause('WHERE')
+        for index, token in enumerate(feeding):
+            if token.depth > 0 and (token.upper in ('GROUP', 'DISTINCT', 'LIMIT')
+                                    or token.is_call(feeding, index, AGGREGATES) or token.upper == 'OVER'):
+                raise _unsupported(sql, f'{token.upper} inside a subquery')
+
+        select_end = next(end for end in boundaries if end > select)
+        select_tokens = tokens[select + 1:select_end]
+        if select_tokens and select_tokens[0].upper in ('DISTINCT', 'ALL'):
+            self.distinct = select_tokens[0].upper == 'DISTINCT'
+            select_tokens = select_tokens[1:]
+        self.items = [_select_item(item, sql) for item in _split_commas(select_tokens, 0)]
+        kinds = [kind for kind, _ in self.items]
+
+        if 'GROUP' in clauses:
+            self.mode = 'grouped'
+        elif 'aggregate' in kinds:
+            if 'value' in kinds:
+                raise _unsupported(sql, 'bare column next to an aggregate')
+            self.mode = 'aggregate'
+        elif 'FROM' not in clauses:
+            # e.g. SELECT (SELECT COUNT(*) FROM events), (SELECT MAX(pub_id) FROM publications)
+            if not any(kind == 'subquery' and merge for kind, merge in self.items):
+                return
+            self.mode = 'aggregate'
+        else:
+            self.mode = 'rows'
+
+        order_tokens = clause('ORDER', skip=2)
+        for term in _split_commas(order_tokens, 0) if order_tokens else []:
+            descending = False
+            if term and term[-1].upper in ('ASC', 'DESC'):
+                descending = term[-1].upper == 'DESC'
+                term = term[:-1]
+            if len(term) == 1 and term[0].kind == 'number':
+                self.order.append((int(term[0].text), descending))
+            elif term and all(token.kind == 'name' or token.text == '.' for token in term):
+                self.order.append((term[-1].text.strip('"`[]'), descending))
+            else:
+                raise _unsupported(sql, 'ORDER BY must name output columns')
+
+        if 'LIMIT' in clauses:
+            self._plan_limit(tokens, clause('LIMIT'), clauses['LIMIT'])
+
+    def _plan_limit(self, tokens, limit_tokens, limit_index):
+        """Read LIMIT/OFFSET and send each group LIMIT limit + offset (or no LIMIT)."""
+        sql, parameters = self.sql, self.parameters
+        terms = [[]]
+        for token in limit_tokens:
+            if token.upper == 'OFFSET' or token.text == ',':
+                terms.append([])
+            else:
+                terms[-1].append(token)
+        placeholders = [index for index, token in enumerate(tokens) if token.kind == 'param']
+        used = []
+        values = []
+        for term in terms:
+            if len(term) == 2 and term[0].text == '-' and term[1].kind == 'number':
+                values.append(-int(term[1].text))
+            elif len(term) == 1 and term[0].kind == 'number':
+                values.append(int(term[0].text))
+            elif (len(term) == 1 and term[0].text == '?' and isinstance(parameters, (list, tuple))
+                  and all(tokens[index].text == '?' for index in placeholders)):
+                position = placeholders.index(tokens.index(term[0]))
+                used.append(position)
+                values.append(int(parameters[position]))
+            else:
+                raise _unsupported(sql, 'LIMIT must be a number or ?')
+        if len(values) == 2 and any(token.text == ',' for token in limit_tokens):
+            values.reverse()  # LIMIT offset, count
+        self.limit = values[0]
+        self.offset = max(values[1], 0) if len(values) > 1 else 0
+
+        pushed = f'LIMIT {self.limit + self.offset}' if self.mode == 'rows' and self.limit >= 0 else ''
+        end = limit_tokens[-1].end if limit_tokens else tokens[limit_index].end
+        self.sql = sql[:tokens[limit_index].start] + pushed + sql[end:]
+        if used:
+            self.parameters = [value for position, value in enumerate(parameters) if position not in used]
+
+
+def _sort_key(value):
+    """SQLite's ORDER BY order: NULL, then numbers, then text, then blobs."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, bytes(value))
+
+
+def _merge_values(merge, values):
+    """Combine one aggregate column's per-group values."""
+    present = [value for value in values if value is not None]
+    if merge == 'sum':
+        return sum(present) if present else values[0]
+    if merge in ('min', 'max'):
+        pick = min if merge == 'min' else max
+        return pick(present, key=_sort_key) if present else None
+    return present[0] if present else None
+
+
+def _merge_rows(plan, results, columns):
+    """Combine every group's rows into the rows a single connection would have returned."""
+    if plan.mode == 'aggregate':
+        rows = [tuple(_merge_values(merge, [result[0][column] for result in results if result])
+                      for column, (_, merge) in enumerate(plan.items))]
+    elif plan.mode == 'grouped':
+        keys = [column for column, (kind, _) in enumerate(plan.items) if kind != 'aggregate']
+        groups = {}
+        for result in results:
+            for row in result:
+                groups.setdefault(tuple(row[column] for column in keys), []).append(row)
+        rows = [tuple(_merge_values(merge if kind == 'aggregate' else 'first', [row[column] for row in group])
+                      for column, (kind, merge) in enumerate(plan.items))
+                for group in groups.values()]
+        if not plan.order:
+            rows.sort(key=lambda row: [_sort_key(row[column]) for column in keys])
+    else:
+        rows = [row for result in results for row in result]
+
+    if plan.distinct:
+        rows = list(dict.fromkeys(rows))
+    # Stable sorts from the last ORDER BY term to the first give the full ordering
+    for column, descending in reversed(plan.order):
+        if isinstance(column, str):
+            names = [name.lower() for name in columns]
+            if column.lower() not in names:
+                raise _unsupported(plan.sql, f'ORDER BY {column} is not an output column')
+            column = names.index(column.lower())
+        else:
+            column -= 1
+        rows.sort(key=lambda row: _sort_key(row[column]), reverse=descending)
+    if plan.offset or plan.limit >= 0:
+        rows = rows[plan.offset:plan.offset + plan.limit if plan.limit >= 0 else None]
+    return rows
+
+
+class FederatedCursor:
+    """The cursor of a FederatedConnection: holds the merged rows of the last query."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self.arraysize = 1
+        self._rows = iter(())
+
+    def execute(self, sql, parameters=()):
+        self.description, rows = self.connection._run(sql, parameters)
+        self._rows = iter(rows)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        raise sqlite3.NotSupportedError('The federated connection is read-only; write to the shard instead')
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        return [row for _, row in zip(range(size), self._rows)]
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        self._rows = iter(())
+
+    def __iter__(self):
+        return self._rows
+
+
+class FederatedConnection(sqlite3.Connection):
+    """
+    A read-only connection over more shards than one connection can attach.
+
+    groups holds one connection per group of shards, each with its own UNION ALL
+    views. A SELECT runs on every group and the rows are merged in Python the way a
+    single connection would have produced them: rows are concatenated, ORDER BY is
+    re-applied across groups, LIMIT/OFFSET is pushed down to each group as LIMIT
+    limit + offset and applied again after merging, COUNT/SUM/TOTAL are added up,
+    MIN/MAX take the extreme, and GROUP BY rows with the same key are combined.
+    Queries whose result can't be merged (AVG, HAVING, aggregates inside a FROM or
+    WHERE subquery, ORDER BY an expression that isn't an output column) raise
+    sqlite3.NotSupportedError rather than return wrong answers. Each record's
+    publication lives in the record's own shard, so joins stay within a group.
+
+    Created with sqlite3.connect(..., factory=FederatedConnection), so it is still an
+    sqlite3.Connection (pandas.read_sql_query accepts it) and row_factory works.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.groups = []
+
+    def _run(self, sql, parameters=()):
+        plan = _QueryPlan(sql, parameters)
+        groups = self.groups[:1] if plan.mode == 'first' else self.groups
+        results = []
+        first_cursor = None
+        for group in groups:
+            cursor = group.execute(plan.sql, plan.parameters)
+            results.append(cursor.fetchall())
+            first_cursor = first_cursor or cursor
+        description = first_cursor.description
+        columns = [column[0] for column in description or ()]
+        rows = results[0] if plan.mode == 'first' else _merge_rows(plan, results, columns)
+        if self.row_factory is not None:
+            rows = [self.row_factory(first_cursor, row) for row in rows]
+        return description, rows
+
+    def cursor(self, factory=None):
+        return FederatedCursor(self)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        for group in self.groups:
+            group.close()
+        self.groups = []
+        super().close()
+
+
+def split_database(source_path='zines.db', catalog_path=CATALOG_PATH):
+    """
+    Move an existing single-file database into one shard per pub_title.
+
+    Rows keep their id inside the shard's range (new id = shard_id * SHARD_ID_SPAN + old id),
+    and events/resources follow the publication they belong to. Resources only have a
+    volume/issue, which several zines can share: such a resource goes to the zine of the
+    lowest matching pub_id (as reclassify.PUBLICATION_LINKS picks it) and is reported.
+    Events without a matching publication and resources without a matching volume/issue
+    are reported and left behind in the source database.
+    """
+    source = sqlite3.connect(source_path)
+    try:
+        titles = [row[0] for row in source.execute('SELECT DISTINCT pub_title FROM publications ORDER BY pub_title')]
+    finally:
+        source.close()
+
+    for pub_title in titles:
+        shard = get_or_create_shard(pub_title, catalog_path)
+        base = shard['shard_id'] * SHARD_ID_SPAN
+        conn = connect_shard(shard)
+        try:
+            conn.execute('ATTACH DATABASE ? AS source', (source_path,))
+            with conn:
+                conn.execute('''
+                    INSERT INTO publications (pub_id, pub_title, volume, issue_number, issue_date,
+                                              volume_title, author_org, location)
+                    SELECT ? + pub_id, pub_title, volume, issue_number, issue_date, volume_title, author_org, location
+                    FROM source.publications WHERE pub_title = ?
+                    ON CONFLICT DO NOTHING
+                ''', (base, pub_title))
+                events = conn.execute('''
+                    INSERT INTO events (event_id, event_title, event_date, description, city, state, country,
+                                        location, address, event_type, publication_id, source_publication)
+                    SELECT ? + e.event_id, e.event_title, e.event_date, e.description, e.city, e.state, e.country,
+                           e.location, e.address, e.event_type, ? + e.publication_id, e.source_publication
+                    FROM source.events e
+                    JOIN source.publications p ON e.publication_id = p.pub_id
+                    WHERE p.pub_title = ?
+                    ON CONFLICT DO NOTHING
+                ''', (base, base, pub_title)).rowcount
+                resources = conn.execute('''
+                    INSERT INTO resources (resource_id, resource_title, volume, issue, resource_type, location,
+                                           address, city, state, country, source_publication, description)
+                    SELECT ? + r.resource_id, r.resource_title, r.volume, r.issue, r.resource_type, r.location,
+                           r.address, r.city, r.state, r.country, r.source_publication, r.description
+                    FROM source.resources r
+                    WHERE (SELECT p.pub_title FROM source.publications p
+                           WHERE p.volume = r.volume AND p.issue_number = r.issue
+                           ORDER BY p.pub_id LIMIT 1) = ?
+                    ON CONFLICT DO NOTHING
+                ''', (base, pub_title)).rowcount
+            conn.execute('DETACH DATABASE source')
+            print(f"✓ {pub_title}: {events} events, {resources} resources")
+        finally:
+            conn.close()
+
+    source = sqlite3.connect(source_path)
+    try:
+        orphan_events = source.execute('''
+            SELECT COUNT(*) FROM events e
+            WHERE NOT EXISTS (SELECT 1 FROM publications p WHERE p.pub_id = e.publication_id)
+        ''').fetchone()[0]
+        orphan_resources = source.execute('''
+            SELECT COUNT(*) FROM resources r
+            WHERE NOT EXISTS (SELECT 1 FROM publications p WHERE p.volume = r.volume AND p.issue_number = r.issue)
+        ''').fetchone()[0]
+        shared_resources = source.execute('''
+            SELECT COUNT(*) FROM resources r
+            WHERE (SELECT COUNT(DISTINCT p.pub_title) FROM publications p
+                   WHERE p.volume = r.volume AND p.issue_number = r.issue) > 1
+        ''').fetchone()[0]
+    finally:
+        source.close()
+    if shared_resources:
+        print(f"Warning: {shared_resources} resources match an issue number of more than one zine; "
+              "each went to the zine with the lowest matching pub_id")
+    if orphan_events or orphan_resources:
+        print(f"❌ Left behind {orphan_events} events and {orphan_resources} resources "
+              "with no matching publication")
+
+
+if __name__ == '__main__':
+    print("=== Splitting zines.db into per-publication shards ===")
+    split_database()
+    for shard in list_shards():
+        print(f"{shard['shard_id']:>3}  {shard['pub_title']:<40} {shard['db_path']}")
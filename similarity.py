@@ -0,0 +1,284 @@
+# TF-IDF Similarity Index over Descriptions
+# Finds events and resources that read alike (the same report in another issue or zine,
+# follow-ups, related campaigns) without LIKE scans. Each title + description is turned
+# into a sparse vector of hashed word and word-pair features, weighted by TF-IDF, and
+# "similar items" is a single sparse matrix-vector product against every document.
+#
+# The index is built offline (`python similarity.py`) into similarity_index/ and kept
+# up to date incrementally from change_log (changelog.py): only rows added, edited or
+# deleted since the last update are re-tokenized.
+
+import json
+import os
+import re
+import sqlite3
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+import changelog
+
+# Path to the SQLite database and the folder the index is saved in
+DB_PATH = 'zines.db'
+INDEX_DIR = 'similarity_index'
+
+# Features are hashed into this many columns (no vocabulary to store or grow)
+N_FEATURES = 2 ** 18
+
+# Drop superseded rows from the matrix once they are more than this share of it
+COMPACT_THRESHOLD = 0.25
+
+# Text of each document: table -> (primary key, title column, description column)
+DOCUMENT_TABLES = {
+    'events': ('event_id', 'event_title', 'description'),
+    'resources': ('resource_id', 'resource_title', 'description'),
+}
+
+STOPWORDS = set('''
+a an and are as at be by for from has he her his in is it its of on or she that the their
+they this to was were will with not but all also any been can had have into more no our out
+so than them then there these who which would na
+'''.split())
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z']+")
+
+
+def tokenize(text):
+    """Lowercase words (stopwords dropped) plus adjacent word pairs, so 'equal pay' counts as a phrase."""
+    words = [word.strip("'") for word in TOKEN_PATTERN.findall((text or '').lower())]
+    words = [word for word in words if len(word) > 1 and word not in STOPWORDS]
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+
+def vectorize(texts):
+    """
+    Hashed term-frequency rows (1 + log(count)) for a list of texts.
+    crc32 is used instead of hash() so feature numbers stay the same between runs.
+    """
+    rows, cols, values = [], [], []
+    for row, text in enumerate(texts):
+        counts = {}
+        for token in tokenize(text):
+            feature = zlib.crc32(token.encode('utf-8')) % N_FEATURES
+            counts[feature] = counts.get(feature, 0) + 1
+        rows.extend([row] * len(counts))
+        cols.extend(counts)
+        values.extend(1 + np.log(count) for count in counts.values())
+    return sparse.csr_matrix((np.asarray(values, dtype=np.float32), (rows, cols)),
+                             shape=(len(texts), N_FEATURES))
+
+
+def _document(table, row):
+    """(key, title, text) for a row from DOCUMENT_TABLES."""
+    primary_key, title_column, description_column = DOCUMENT_TABLES[table]
+    title = row[title_column] or ''
+    return (table, row[primary_key]), title, f"{title} {row[description_column] or ''}"
+
+
+class SimilarityIndex:
+    """
+    Term frequencies for every document, their document frequencies, and which
+    stored row belongs to which (table, id). Updated rows are appended and the old
+    row is switched off, so an update never rewrites the matrix.
+    """
+
+    def __init__(self):
+        self.tf = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self.df = np.zeros(N_FEATURES, dtype=np.int64)
+        self.keys = []        # (table, id) of each stored row
+        self.titles = []
+        self.active = np.zeros(0, dtype=bool)
+        self.rows_by_key = {}
+        self.seq = 0          # change_log seq the index is up to date with
+        self.epoch = None     # and the log's epoch (changelog.log_epoch) that seq belongs to
+        self._weighted = None
+
+    # --- building and updating ---
+
+    def add(self, documents):
+        """Add (key, title, text) documents, replacing any stored versions of the same keys."""
+        self.remove([key for key, _, _ in documents])
+        if not documents:
+            return
+        tf = vectorize([text for _, _, text in documents])
+        self.tf = sparse.vstack([self.tf, tf], format='csr')
+        self.df += np.bincount(tf.indices, minlength=N_FEATURES)
+        for key, title, _ in documents:
+            self.rows_by_key[key] = len(self.keys)
+            self.keys.append(key)
+            self.titles.append(title)
+        self.active = np.concatenate([self.active, np.ones(len(documents), dtype=bool)])
+        self._weighted = None
+
+    def remove(self, keys):
+        """Switch off the stored rows of these keys."""
+        for key in keys:
+            row = self.rows_by_key.pop(key, None)
+            if row is not None:
+                self.active[row] = False
+                self.df[self.tf.indices[self.tf.indptr[row]:self.tf.indptr[row + 1]]] -= 1
+                self._weighted = None
+
+    def compact(self):
+        """Drop switched-off rows."""
+        keep = np.flatnonzero(self.active)
+        self.tf = self.tf[keep]
+        self.keys = [self.keys[row] for row in keep]
+        self.titles = [self.titles[row] for row in keep]
+        self.active = np.ones(len(keep), dtype=bool)
+        self.rows_by_key = {key: row for row, key in enumerate(self.keys)}
+        self._weighted = None
+
+    def build(self, conn):
+        """Index every event and resource from scratch."""
+        self.__init__()
+        documents = []
+        for table in DOCUMENT_TABLES:
+            cursor = conn.execute(f'SELECT * FROM {table}')
+            columns = [column[0] for column in cursor.description]
+            documents += [_document(table, dict(zip(columns, values))) for values in cursor]
+        self.add(documents)
+        self.seq = changelog.current_seq(conn)
+        self.epoch = changelog.log_epoch(conn)
+
+    def update(self, conn):
+        """
+        Apply every change logged since the index was last updated.
+
+        Returns:
+            int: Number of changes applied (a full rebuild counts as all rows).
+        """
+        latest = changelog.current_seq(conn) if changelog.has_change_log(conn) else None
+        if latest is None or latest < self.seq or changelog.log_epoch(conn) != self.epoch:
+            # No log to follow, or the database was rebuilt (a new epoch, or seq went backwards)
+            self.build(conn)
+            return len(self.keys)
+
+        applied = 0
+        while True:
+            batch = changelog.read_changes(conn, self.seq)
+            if not batch:
+                break
+            latest_rows = {}
+            for change in batch:
+                if change['table'] in DOCUMENT_TABLES:
+                    latest_rows[(change['table'], change['id'])] = change['row']
+            self.remove([key for key, row in latest_rows.items() if row is None])
+            self.add([_document(key[0], row) for key, row in latest_rows.items() if row is not None])
+            self.seq = batch[-1]['seq']
+            applied += len(batch)
+
+        if len(self.active) and 1 - self.active.mean() > COMPACT_THRESHOLD:
+            self.compact()
+        return applied
+
+    # --- saving and loading ---
+
+    def save(self, index_dir=INDEX_DIR):
+        """Write the index to index_dir (each file is written under a temporary name and renamed into place)."""
+        self.compact()
+        os.makedirs(index_dir, exist_ok=True)
+        # Temporary names keep the real extension, since save_npz/np.save would add one
+        sparse.save_npz(os.path.join(index_dir, '.tf.tmp.npz'), self.tf)
+        np.save(os.path.join(index_dir, '.df.tmp.npy'), self.df)
+        with open(os.path.join(index_dir, '.meta.tmp.json'), 'w') as file:
+            json.dump({'seq': self.seq, 'epoch': self.epoch, 'keys': self.keys, 'titles': self.titles,
+                       'n_features': N_FEATURES}, file)
+        # meta.json goes last: a reader that finds it also finds the matching matrices
+        for name in ('tf.npz', 'df.npy', 'meta.json'):
+            stem, extension = name.split('.')
+            os.replace(os.path.join(index_dir, f'.{stem}.tmp.{extension}'), os.path.join(index_dir, name))
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        """Load a saved index, or return None if there isn't one."""
+        meta_path = os.path.join(index_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r') as file:
+            meta = json.load(file)
+        if meta['n_features'] != N_FEATURES:
+            return None
+        index = cls()
+        index.tf = sparse.load_npz(os.path.join(index_dir, 'tf.npz')).tocsr()
+        index.df = np.load(os.path.join(index_dir, 'df.npy'))
+        index.keys = [tuple(key) for key in meta['keys']]
+        index.titles = meta['titles']
+        index.active = np.ones(len(index.keys), dtype=bool)
+        index.rows_by_key = {key: row for row, key in enumerate(index.keys)}
+        index.seq = meta['seq']
+        index.epoch = meta.get('epoch')  # missing from older indexes
+        return index
+
+    # --- queries ---
+
+    def _weighted_matrix(self):
+        """TF-IDF rows scaled to unit length (cached until the index changes)."""
+        if self._weighted is None:
+            n_documents = max(int(self.active.sum()), 1)
+            idf = (np.log((1 + n_documents) / (1 + np.maximum(self.df, 0))) + 1).astype(np.float32)
+            weighted = self.tf @ sparse.diags(idf)
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            self._weighted = sparse.diags((1 / norms) * self.active).astype(np.float32) @ weighted
+            self._idf = idf
+        return self._weighted
+
+    def _top(self, scores, k, exclude=None):
+        if exclude is not None:
+            scores[exclude] = 0
+        candidates = np.flatnonzero(scores > 0)
+        best = candidates[np.argsort(-scores[candidates], kind='stable')[:k]]
+        return [{'table': self.keys[row][0], 'id': self.keys[row][1], 'title': self.titles[row],
+                 'score': round(float(scores[row]), 4)} for row in best]
+
+    def similar(self, table, record_id, k=10):
+        """
+        The k documents most similar to one event or resource (cosine similarity of TF-IDF vectors).
+
+        Returns:
+            list: Dicts with table, id, title and score, best first (empty if the record isn't indexed)
+        """
+        row = self.rows_by_key.get((table, record_id))
+        if row is None:
+            return []
+        matrix = self._weighted_matrix()
+        scores = (matrix @ matrix[row].T).toarray().ravel()
+        return self._top(scores, k, exclude=row)
+
+    def search(self, text, k=10):
+        """The k documents most similar to a piece of free text."""
+        matrix = self._weighted_matrix()
+        query = vectorize([text]) @ sparse.diags(self._idf)
+        norm = np.sqrt(query.multiply(query).sum()) or 1
+        scores = (matrix @ (query / norm).T).toarray().ravel()
+        return self._top(scores, k)
+
+
+def update_index(db_path=DB_PATH, index_dir=INDEX_DIR):
+    """Bring the saved index up to date with the database (building it the first time)."""
+    index = SimilarityIndex.load(index_dir)
+    conn = sqlite3.connect(db_path)
+    try:
+        if index is None:
+            index = SimilarityIndex()
+            index.build(conn)
+            print(f"✓ Built index of {len(index.keys)} documents")
+        else:
+            applied = index.update(conn)
+            print(f"✓ Applied {applied} changes ({len(index.rows_by_key)} documents indexed)")
+    finally:
+        conn.close()
+    index.save(index_dir)
+    return index
+
+
+if __name__ == '__main__':
+    print("=== Updating the Similarity Index ===")
+    index = update_index()
+    if index.keys:
+        table, record_id = index.keys[0]
+        print(f"\nMost similar to {table} {record_id} ({index.titles[0]}):")
+        for match in index.similar(table, record_id, k=5):
+            print(f"  {match['score']:.3f}  {match['table']} {match['id']}: {match['title']}")
@@ -0,0 +1,223 @@
+# Columnar Snapshot of zines.db
+# Exports events, publications and resources into Arrow IPC files that the
+# analysis scripts can memory-map instead of re-reading SQLite every time
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+# Path to the SQLite database and the folder the snapshot is written to
+DB_PATH = 'zines.db'
+SNAPSHOT_DIR = 'zines_snapshot'
+MANIFEST_NAME = 'manifest.json'
+
+# Whether read_frame re-exports a stale snapshot before loading it. reportrunner.py turns
+# this off in its workers, which read the one snapshot the parent process built
+REFRESH = True
+
+# Bump when the exported columns change, so older snapshots are re-exported
+SNAPSHOT_FORMAT = 2
+
+# Events joined with the publication they came from, so analyses don't have to re-join.
+# event_date_text keeps the date exactly as entered ('NA-NA-NA', '1970-01-NA'), for
+# analyses that print or sort it the way the SQL versions did
+EVENTS_QUERY = '''
+    SELECT
+        e.event_id, e.event_title, e.event_date, e.event_date AS event_date_text, e.description, e.city, e.state, e.country,
+        e.location, e.address, e.event_type, e.publication_id, e.source_publication,
+        p.pub_title, p.volume, p.issue_number, p.issue_date
+    FROM events e
+    LEFT JOIN publications p ON e.publication_id = p.pub_id
+    ORDER BY e.event_id
+'''
+
+PUBLICATIONS_QUERY = '''
+    SELECT pub_id, pub_title, volume, issue_number, issue_date, volume_title, author_org, location
+    FROM publications
+    ORDER BY pub_id
+'''
+
+# Resources only reference an issue by volume/issue, so pick up the matching pub_id here
+RESOURCES_QUERY = '''
+    SELECT
+        r.resource_id, r.resource_title, r.volume, r.issue, r.resource_type, r.location,
+        r.address, r.city, r.state, r.country, r.source_publication, r.description,
+        p.pub_id, p.pub_title, p.issue_date
+    FROM resources r
+    LEFT JOIN publications p ON r.volume = p.volume AND r.issue = p.issue_number
+    ORDER BY r.resource_id
+'''
+
+# Column typing for each table: integer columns are nullable Int64, dates are parsed
+# (placeholders like 'NA-NA-NA' become null) and low-cardinality text becomes categorical
+TABLES = {
+    'events': {
+        'query': EVENTS_QUERY,
+        'integers': ['event_id', 'publication_id', 'volume', 'issue_number'],
+        'dates': ['event_date', 'issue_date'],
+        'categories': ['event_type', 'pub_title', 'city', 'state', 'country', 'source_publication'],
+    },
+    'publications': {
+        'query': PUBLICATIONS_QUERY,
+        'integers': ['pub_id', 'volume', 'issue_number'],
+        'dates': ['issue_date'],
+        'categories': ['pub_title'],
+    },
+    'resources': {
+        'query': RESOURCES_QUERY,
+        'integers': ['resource_id', 'volume', 'issue', 'pub_id'],
+        'dates': ['issue_date'],
+        'categories': ['resource_type', 'pub_title', 'city', 'state', 'country'],
+    },
+}
+
+
+def connect_readonly(db_path=DB_PATH):
+    """
+    Open the database in read-only mode so snapshot and analysis runs never
+    take a write lock that would block the web app.
+    """
+    uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+    return sqlite3.connect(uri, uri=True)
+
+
+def database_fingerprint(db_path=DB_PATH):
+    """
+    Cheap fingerprint of the database file (size and modification time of the
+    database and its WAL file). Changes whenever zines.db is written to.
+    """
+    fingerprint = {}
+    for path in (db_path, db_path + '-wal'):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    """Return the manifest of the current snapshot, or None if there isn't one yet."""
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+
+def snapshot_is_current(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Check whether the snapshot on disk was taken from the current state of the database."""
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return False
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        return False
+    all_present = all(os.path.exists(os.path.join(snapshot_dir, f'{name}.arrow')) for name in TABLES)
+    return all_present and manifest.get('fingerprint') == database_fingerprint(db_path)
+
+
+def _typed_frame(df, spec):
+    """Apply the integer, date and categorical typing from TABLES to a raw query result."""
+    for column in spec['integers']:
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+    for column in spec['dates']:
+        # Partial dates ('1970-01-NA') and placeholders can't be typed, so they become null
+        df[column] = pd.to_datetime(df[column], format='%Y-%m-%d', errors='coerce').dt.date
+    for column in spec['categories']:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def _write_arrow(table, path):
+    """Write an Arrow IPC file next to the target and rename it into place atomically."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'  # two processes refreshing at once don't share a file
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def create_snapshot(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR, force=False, conn=None):
+    """
+    Export events, publications and resources into uncompressed Arrow IPC files.
+
+    The export is skipped when the manifest shows the snapshot was already taken
+    from the current database file, unless force=True. Pass conn to export from an
+    already open connection (e.g. sharding.connect_federated) instead of db_path.
+
+    Returns:
+        bool: True if a new snapshot was written, False if the existing one was current.
+    """
+    if not force and snapshot_is_current(db_path, snapshot_dir):
+        print("✓ Snapshot is up to date, nothing to export.")
+        return False
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    # Fingerprint before reading, so a write during the export triggers another refresh next time
+    fingerprint = database_fingerprint(db_path)
+
+    own_connection = conn is None
+    if own_connection:
+        conn = connect_readonly(db_path)
+    row_counts = {}
+    try:
+        for name, spec in TABLES.items():
+            df = _typed_frame(pd.read_sql_query(spec['query'], conn), spec)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            _write_arrow(table, os.path.join(snapshot_dir, f'{name}.arrow'))
+            row_counts[name] = table.num_rows
+            print(f"✓ Exported {table.num_rows} rows from {name}")
+    finally:
+        if own_connection:
+            conn.close()
+
+    manifest = {'format': SNAPSHOT_FORMAT, 'fingerprint': fingerprint, 'row_counts': row_counts}
+    tmp_manifest = os.path.join(snapshot_dir, f'{MANIFEST_NAME}.{os.getpid()}.tmp')
+    with open(tmp_manifest, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_manifest, os.path.join(snapshot_dir, MANIFEST_NAME))
+    return True
+
+
+def load_table(name, columns=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Memory-map one table of the snapshot as a pyarrow Table.
+
+    Nothing is copied into memory until columns are actually used, so selecting a
+    few columns out of a large table is cheap.
+    """
+    if name not in TABLES:
+        raise ValueError(f"Unknown snapshot table: {name}")
+    source = pa.memory_map(os.path.join(snapshot_dir, f'{name}.arrow'), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def read_frame(name, columns=None, db_path=None, snapshot_dir=None, refresh=None):
+    """
+    Load a snapshot table as a pandas DataFrame, refreshing the snapshot first if
+    zines.db has changed since it was taken. Categorical columns come back as
+    pandas categoricals.
+
+    Arguments left as None fall back to DB_PATH, SNAPSHOT_DIR and REFRESH as they are
+    when the call is made, so a caller can point every analysis at another snapshot.
+    """
+    db_path = DB_PATH if db_path is None else db_path
+    snapshot_dir = SNAPSHOT_DIR if snapshot_dir is None else snapshot_dir
+    refresh = REFRESH if refresh is None else refresh
+    if refresh:
+        create_snapshot(db_path, snapshot_dir)
+    return load_table(name, columns, snapshot_dir).to_pandas(date_as_object=False)
+
+
+if __name__ == "__main__":
+    print("=== Creating Columnar Snapshot of zines.db ===")
+    create_snapshot()
+    manifest = read_manifest()
+    if manifest:
+        for name, count in manifest['row_counts'].items():
+            print(f"{name:<15} {count:>10} rows")
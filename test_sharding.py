@@ -0,0 +1,344 @@
+# Tests for sharding.py: split_database, and the federated connection with more shards
+# than SQLite can attach to one connection (10 by default), where the shards are queried
+# in groups and the results merged in Python. Every query is checked against the same
+# query on one database holding all the shards' rows, including every query the web app,
+# its read model, facets, autocomplete and similarity index and the report snapshot send.
+#
+# Run with: python -m unittest test_sharding
+
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import changelog
+import createdb
+import sharding
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DatabaseFlask'))
+import autocomplete  # noqa: E402
+
+ZINE_COUNT = 23  # three groups of shards with the default limit of 10
+CITIES = ['Portland', 'Seattle', None, 'Boise', 'NA', 'Eugene']
+EVENT_TYPES = ['Protest', 'Benefit Show', 'Advocacy, Protest', 'Workshop']
+
+
+def build_source(path):
+    """A single-file database with ZINE_COUNT zines, a few issues each."""
+    conn = sqlite3.connect(path)
+    createdb.create_tables(conn)
+    for zine in range(ZINE_COUNT):
+        for issue in range(1, 4):
+            pub_id = conn.execute('''
+                INSERT INTO publications (pub_title, volume, issue_number, issue_date)
+                VALUES (?, ?, ?, ?)
+            ''', (f'Zine {zine:02d}', zine, issue, f'199{issue}-01-01')).lastrowid
+            for number in range((zine + issue) % 5):
+                conn.execute('''
+                    INSERT INTO events (event_title, event_date, city, state, country, event_type,
+                                        publication_id)
+                    VALUES (?, ?, ?, ?, 'USA', ?, ?)
+                ''', (f'Event {zine}-{issue}-{number}', f'19{90 + (zine * 7 + number) % 10}-0{issue}-1{number}',
+                      CITIES[(zine + number) % len(CITIES)], 'OR' if number % 2 else 'WA',
+                      EVENT_TYPES[(zine + issue + number) % len(EVENT_TYPES)], pub_id))
+            conn.execute('''
+                INSERT INTO resources (resource_title, volume, issue, resource_type, city)
+                VALUES (?, ?, ?, 'Clinic', ?)
+            ''', (f'Resource {zine}-{issue}', zine, issue, CITIES[zine % len(CITIES)]))
+
+    # A second zine with an issue numbered like Zine 00's first one, so its resources are ambiguous
+    pub_id = conn.execute('''
+        INSERT INTO publications (pub_title, volume, issue_number, issue_date) VALUES ('Zine 01', 0, 1, '1999-01-01')
+    ''').lastrowid
+    conn.execute('''
+        INSERT INTO events (event_title, event_date, city, state, country, event_type, publication_id)
+        VALUES ('Shared issue event', '1999-01-02', 'Portland', 'OR', 'USA', 'Protest', ?)
+    ''', (pub_id,))
+    conn.execute('''
+        INSERT INTO resources (resource_title, volume, issue, resource_type, city) VALUES ('Shared clinic', 0, 1, 'Clinic', 'Boise')
+    ''')
+    conn.commit()
+    conn.close()
+
+
+class ShardedTestCase(unittest.TestCase):
+    """Splits a fresh source database into ZINE_COUNT shards for each test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.source_path = os.path.join(cls.directory.name, 'zines.db')
+        cls.catalog_path = os.path.join(cls.directory.name, 'catalog.db')
+        build_source(cls.source_path)
+        cls.split_output = io.StringIO()
+        with contextlib.redirect_stdout(cls.split_output):
+            sharding.split_database(cls.source_path, cls.catalog_path)
+        cls.shards = sharding.list_shards(cls.catalog_path)
+        cls.federated = sharding.connect_federated(cls.catalog_path)
+
+        # The expected answers: every shard's rows copied into one database
+        cls.single = sqlite3.connect(':memory:')
+        for shard in cls.shards:
+            cls.single.execute('ATTACH DATABASE ? AS shard', (shard['db_path'],))
+            for table in sharding.SHARDED_TABLES:
+                if shard is cls.shards[0]:
+                    cls.single.execute(f'CREATE TABLE main.{table} AS SELECT * FROM shard.{table}')
+                else:
+                    cls.single.execute(f'INSERT INTO main.{table} SELECT * FROM shard.{table}')
+            cls.single.commit()
+            cls.single.execute('DETACH DATABASE shard')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.federated.close()
+        cls.single.close()
+        cls.directory.cleanup()
+
+    def assertSameResult(self, sql, parameters=(), ordered=True):
+        expected = self.single.execute(sql, parameters).fetchall()
+        actual = self.federated.execute(sql, parameters).fetchall()
+        if not ordered:
+            expected, actual = sorted(expected, key=repr), sorted(actual, key=repr)
+        self.assertEqual(actual, expected, sql)
+
+
+class SplitDatabaseTest(ShardedTestCase):
+
+    def test_every_row_lands_in_exactly_one_shard(self):
+        source = sqlite3.connect(self.source_path)
+        try:
+            for table in sharding.SHARDED_TABLES:
+                expected = source.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                self.assertEqual(self.single.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0], expected, table)
+        finally:
+            source.close()
+
+    def test_resources_of_an_issue_two_zines_share_go_to_the_lowest_pub_id(self):
+        owner = next(shard['shard_id'] for shard in self.shards if shard['pub_title'] == 'Zine 00')
+        rows = self.federated.execute('''
+            SELECT resource_id, resource_title FROM resources WHERE volume = 0 AND issue = 1 ORDER BY resource_title
+        ''').fetchall()
+        self.assertEqual([title for _, title in rows], ['Resource 0-1', 'Shared clinic'])
+        self.assertEqual({resource_id // sharding.SHARD_ID_SPAN for resource_id, _ in rows}, {owner})
+        self.assertIn('2 resources match an issue number of more than one zine', self.split_output.getvalue())
+
+
+class FederatedConnectionTest(ShardedTestCase):
+
+    def test_more_shards_than_one_connection_attaches(self):
+        self.assertEqual(len(self.shards), ZINE_COUNT)
+        self.assertIsInstance(self.federated, sharding.FederatedConnection)
+        self.assertGreater(len(self.federated.groups), 1)
+        self.assertEqual(self.federated.execute('SELECT COUNT(*) FROM publications').fetchone()[0], ZINE_COUNT * 3 + 1)
+
+    def test_home_page_events_are_sorted_and_paged_across_groups(self):
+        sql = '''
+            SELECT e.event_id, e.event_title, e.event_date, e.city,
+                   p.pub_title AS publication_title
+            FROM events e
+            LEFT JOIN publications p ON e.publication_id = p.pub_id
+            WHERE e.event_title LIKE ?
+            ORDER BY {} LIMIT ? OFFSET ?
+        '''
+        total = self.single.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+        for order in ['event_title ASC', 'event_title DESC', 'e.event_id DESC',
+                      'event_date DESC, event_id', 'city, 2 DESC', 'publication_title, event_id']:
+            for offset in [0, 10, 57, total - 3, total + 10]:
+                self.assertSameResult(sql.format(order), ('%Event%', 10, offset))
+        self.assertSameResult(sql.format('event_title'), ('%Event 1%', -1, 5))
+        self.assertSameResult('SELECT COUNT(*) FROM events e WHERE e.event_title LIKE ? AND e.state = ?',
+                              ('%Event 1%', 'OR'))
+
+    def test_publications_page_and_lookups(self):
+        self.assertSameResult('''
+            SELECT pub_id, pub_title, volume, issue_number FROM publications
+            ORDER BY pub_title DESC, issue_number LIMIT 10 OFFSET 20
+        ''')
+        pub_id = self.shards[-1]['shard_id'] * sharding.SHARD_ID_SPAN + 1
+        self.assertSameResult('SELECT * FROM publications WHERE pub_id = ?', (pub_id,))
+        self.assertSameResult('''
+            SELECT json_object('pub_id', p.pub_id, 'events', (
+                SELECT json_group_array(e.event_title)
+                FROM (SELECT * FROM events WHERE publication_id = p.pub_id ORDER BY event_date, event_id) e))
+            FROM publications p WHERE p.pub_id = ?
+        ''', (pub_id,))
+
+    def test_aggregates_are_combined(self):
+        self.assertSameResult('SELECT COUNT(*), MAX(event_id), MIN(event_date), SUM(publication_id) FROM events')
+        self.assertSameResult('''
+            SELECT (SELECT COUNT(*) FROM events), (SELECT MAX(event_id) FROM events),
+                   (SELECT COUNT(*) FROM publications), (SELECT MAX(pub_id) FROM publications)
+        ''')
+        self.assertSameResult('SELECT DISTINCT city FROM events', ordered=False)
+        self.assertSameResult('SELECT state, COUNT(*) AS n FROM events GROUP BY state ORDER BY n DESC, state')
+
+    def test_autocomplete_queries(self):
+        for field, sql in autocomplete.FIELD_QUERIES.items():
+            with self.subTest(field=field):
+                self.assertSameResult(sql, ordered=False)
+
+    def test_row_factory(self):
+        self.federated.row_factory = sqlite3.Row
+        try:
+            row = self.federated.execute('SELECT event_id, event_title FROM events ORDER BY event_id LIMIT 1').fetchone()
+        finally:
+            self.federated.row_factory = None
+        first = self.single.execute('SELECT event_id, event_title FROM events ORDER BY event_id LIMIT 1').fetchone()
+        self.assertEqual((row['event_id'], row['event_title']), first)
+
+    def test_pandas_reads_through_the_connection(self):
+        try:
+            import pandas as pd
+        except ImportError:
+            self.skipTest('pandas is not installed')
+        sql = 'SELECT event_id, city FROM events ORDER BY event_id'
+        self.assertTrue(pd.read_sql_query(sql, self.federated).equals(pd.read_sql_query(sql, self.single)))
+
+    def test_queries_that_cannot_be_merged_raise(self):
+        for sql in ['SELECT AVG(event_id) FROM events',
+                    'SELECT city, COUNT(*) FROM events GROUP BY city HAVING COUNT(*) = 1',
+                    'SELECT * FROM events WHERE city IN (SELECT city FROM events GROUP BY city)',
+                    'SELECT event_title FROM events ORDER BY LENGTH(event_title)']:
+            with self.subTest(sql=sql):
+                with self.assertRaises(sqlite3.NotSupportedError):
+                    self.federated.execute(sql)
+
+
+class AppQueriesTest(ShardedTestCase):
+    """The queries the web app and the scripts it shares send, through their own code."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            with mock.patch.dict(os.environ, {'ZINES_CATALOG': cls.catalog_path}):
+                import app
+                import facets
+                import readmodel
+        except ImportError as error:
+            cls.tearDownClass()
+            raise unittest.SkipTest(f'the web app needs {error.name}')
+        cls.app, cls.facets, cls.readmodel = app, facets, readmodel
+
+    def both(self, function, *args):
+        """function(connection, *args) on the single database, then on the federated one."""
+        return function(self.single, *args), function(self.federated, *args)
+
+    def test_events_table_every_sort_order_page_and_filter(self):
+        filter_sets = [{}, {'state': 'OR'}, {'event_type': 'Protest', 'year': '1993'},
+                       {'publication': 'Zine 01'}, {'city': 'Portland', 'country': 'USA'}]
+        for sort in self.app.SORTABLE_EVENT_COLUMNS + ['event_id']:
+            for order in ['asc', 'desc']:
+                for search in ['', 'Event 1', 'issue']:
+                    for filters in filter_sets:
+                        for offset in [0, 10, 30]:
+                            expected, actual = self.both(self.app.query_events_page, search, sort, order, 10,
+                                                         offset, filters)
+                            context = (sort, order, search, filters, offset)
+                            self.assertEqual(actual[1], expected[1], context)
+                            if sort in ('event_title', 'event_id'):
+                                self.assertEqual(actual[0], expected[0], context)
+                            else:
+                                # Ties on the other columns may come back in either order
+                                column = self.app.SORTABLE_EVENT_COLUMNS.index(sort) + 1
+                                self.assertEqual([row[column] for row in actual[0]],
+                                                 [row[column] for row in expected[0]], context)
+
+    def test_home_page_context(self):
+        for args in [{}, {'sort_events': 'event_date', 'order_events': 'desc', 'page_events': '3'},
+                     {'search': 'Event 2', 'state': 'WA', 'year': '1995'},
+                     {'sort_publications': 'pub_id', 'order_publications': 'desc', 'page_publications': '4'}]:
+            contexts = []
+            for conn in (self.single, self.federated):
+                with mock.patch.object(self.app, 'facet_index', self.facets.FacetIndex()), \
+                        mock.patch.object(self.app, 'read_model', None):
+                    contexts.append(self.app.load_index_context(conn, args))
+            expected, actual = contexts
+            self.assertEqual(actual['facets'], expected['facets'], args)
+            self.assertEqual(actual['total_pages_events'], expected['total_pages_events'], args)
+            self.assertEqual(actual['total_pages_publications'], expected['total_pages_publications'], args)
+            # Publications are sorted by title unless pub_id is asked for, and titles repeat
+            column = 0 if args.get('sort_publications') == 'pub_id' else 1
+            self.assertEqual([row[column] for row in actual['publications']],
+                             [row[column] for row in expected['publications']], args)
+            if args.get('sort_events', 'event_title') == 'event_title':
+                self.assertEqual(actual['events'], expected['events'], args)
+
+    def test_read_model_and_facet_index_load_the_same_data(self):
+        expected, actual = self.readmodel.EventReadModel(), self.readmodel.EventReadModel()
+        expected.refresh(self.single)
+        actual.refresh(self.federated)
+        for sort in self.app.SORTABLE_EVENT_COLUMNS:
+            for order in ['asc', 'desc']:
+                column_values = [
+                    [(row['event_title'], row[sort]) if sort == 'event_title' else row[sort] for row in rows]
+                    for rows, _ in (model.page(sort, order, 'Event', 10, 20, {'state': 'OR'})
+                                    for model in (expected, actual))]
+                self.assertEqual(column_values[1], column_values[0], (sort, order))
+        self.assertEqual(actual.page('event_title', 'asc', '', 500, 0), expected.page('event_title', 'asc', '', 500, 0))
+
+        expected, actual = self.facets.FacetIndex(), self.facets.FacetIndex()
+        expected.refresh(self.single)
+        actual.refresh(self.federated)
+        for search, filters in [('', {}), ('Event 1', {'state': 'OR'}), ('', {'publication': 'Zine 01'})]:
+            self.assertEqual(actual.counts(search, filters), expected.counts(search, filters), (search, filters))
+
+    def test_issue_and_event_pages(self):
+        pub_ids = [row[0] for row in self.single.execute('SELECT pub_id FROM publications ORDER BY pub_id')]
+        for pub_id in pub_ids[:4] + pub_ids[-4:] + [0]:
+            self.assertSameResult(self.app.ISSUE_QUERY, (pub_id,))
+        event_ids = [row[0] for row in self.single.execute('SELECT event_id FROM events ORDER BY event_id')]
+        for event_id in event_ids[:3] + event_ids[-3:]:
+            self.assertSameResult(self.app.EVENT_QUERY + ' WHERE e.event_id = ?', (event_id,))
+
+        # The static export's full listings
+        self.assertSameResult(self.app.EVENT_QUERY + ' ORDER BY e.event_title, e.event_id')
+        self.assertSameResult('''
+            SELECT pub_id, pub_title, volume, issue_number, issue_date, author_org, location
+            FROM publications ORDER BY pub_title, pub_id
+        ''')
+
+    def test_autocomplete_version_and_change_log(self):
+        suggestions = autocomplete.Autocomplete(None)
+        self.assertEqual(suggestions._data_version(self.federated), suggestions._data_version(self.single))
+        self.assertFalse(changelog.has_change_log(self.federated))
+        self.assertEqual(changelog.current_seq(self.federated), 0)
+        self.assertIsNone(changelog.log_epoch(self.federated))
+
+    def test_similarity_index(self):
+        try:
+            import similarity
+        except ImportError as error:
+            self.skipTest(f'the similarity index needs {error.name}')
+        indexes = []
+        for conn in (self.single, self.federated):
+            index = similarity.SimilarityIndex()
+            index.build(conn)
+            indexes.append(index)
+        self.assertEqual(sorted(indexes[1].keys), sorted(indexes[0].keys))
+
+    def test_report_snapshot_and_location_queries(self):
+        try:
+            import pandas as pd
+        except ImportError:
+            self.skipTest('pandas is not installed')
+        import locationqueries
+        import snapshot
+
+        for name, spec in snapshot.TABLES.items():
+            with self.subTest(table=name):
+                expected, actual = self.both(lambda conn: pd.read_sql_query(spec['query'], conn))
+                pd.testing.assert_frame_equal(actual, expected)
+        for non_usa in (False, True):
+            expected, actual = self.both(locationqueries.unique_event_locations, non_usa)
+            # The merged frame is built in pandas, so its text columns may use the string dtype
+            pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                          check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
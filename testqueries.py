@@ -12,7 +12,10 @@ attributing each type to its respective total count.
 
 import sqlite3
 import pandas as pd
+import snapshot
+from analysiscache import cached_analysis
 
+@cached_analysis
 def analyze_event_types():
     """Analyze the total count of each event type across all publications"""
     
@@ -20,49 +23,22 @@ def analyze_event_types():
     print("History 8510 - Clemson University")
     print("=" * 60)
     
-    # Connect to zines.db database
     try:
-        conn = sqlite3.connect('zines.db')
-        print("✓ Connected to Zines database (zines.db)")
-    except sqlite3.Error as e:
-        print(f"❌ Database connection error: {e}")
-        return
-    
-    # SQL query to retrieve all event types
-    query = """
-    SELECT 
-        event_type
-    FROM 
-        events
-    """
-    
-    try:
-        # Execute the query and load results into a Pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Load the event_type column from the columnar snapshot (re-exported if zines.db changed)
+        df = snapshot.read_frame('events', ['event_type'])
+        print(f"✓ Loaded {len(df)} events from the columnar snapshot")
         
-        # Split comma-separated event types and count each type
-        event_counts = {}
-        for event_type_list in df['event_type']:
-            # Split the event_type string by commas and strip whitespace
-            event_types = [etype.strip() for etype in event_type_list.split(',')]
-            for event_type in event_types:
-                if event_type in event_counts:
-                    event_counts[event_type] += 1
-                else:
-                    event_counts[event_type] = 1
+        # Split comma-separated event types into one row per type (whitespace stripped)
+        event_types = df['event_type'].astype(object).str.split(',').explode().str.strip()
         
-        # Convert the event_counts dictionary to a DataFrame for display
-        result_df = pd.DataFrame(list(event_counts.items()), columns=['event_type', 'total_count'])
+        # Count each type, keeping the types in order of first appearance like the old loop did
+        result_df = event_types.value_counts(sort=False).rename_axis('event_type').reset_index(name='total_count')
         result_df = result_df.sort_values(by='total_count', ascending=False)
         
         print("\nEvent Type Counts Across All Publications:")
         print(result_df.to_string(index=False))
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        # Close the database connection
-        conn.close()
-        print("\n✓ Database connection closed.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
 
 # Run the analysis
 if __name__ == "__main__":
@@ -84,7 +60,10 @@ import sqlite3
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+import snapshot
+from analysiscache import cached_analysis
 
+@cached_analysis
 def analyze_event_types_over_time():
     """Analyze and visualize the number of each event type over time (month/year)"""
     
@@ -92,38 +71,18 @@ def analyze_event_types_over_time():
     print("History 8510 - Clemson University")
     print("=" * 60)
     
-    # Connect to zines.db database
     try:
-        conn = sqlite3.connect('zines.db')
-        print("✓ Connected to Zines database (zines.db)")
-    except sqlite3.Error as e:
-        print(f"❌ Database connection error: {e}")
-        return
-    
-    # SQL query to retrieve event types and event dates
-    query = """
-    SELECT 
-        event_type,
-        strftime('%Y-%m', event_date) AS event_month_year
-    FROM 
-        events
-    ORDER BY 
-        event_month_year ASC;
-    """
-    
-    try:
-        # Execute the query and load results into a Pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Load event types and typed event dates from the columnar snapshot
+        df = snapshot.read_frame('events', ['event_type', 'event_date'])
+        print(f"✓ Loaded {len(df)} events from the columnar snapshot")
         
-        # Split comma-separated event types and expand the DataFrame
-        expanded_rows = []
-        for _, row in df.iterrows():
-            event_types = [etype.strip() for etype in row['event_type'].split(',')]
-            for event_type in event_types:
-                expanded_rows.append({'event_type': event_type, 'event_month_year': row['event_month_year']})
+        # Month/year of each event; partial dates ('1970-01-NA') are null, as with strftime()
+        df['event_month_year'] = df['event_date'].dt.strftime('%Y-%m')
         
-        # Create a new DataFrame with expanded rows
-        expanded_df = pd.DataFrame(expanded_rows)
+        # Split comma-separated event types into one row per type
+        df['event_type'] = df['event_type'].astype(object).str.split(',')
+        expanded_df = df.explode('event_type')
+        expanded_df['event_type'] = expanded_df['event_type'].str.strip()
         
         # Group by event_type and event_month_year, and count occurrences
         grouped_df = expanded_df.groupby(['event_type', 'event_month_year']).size().reset_index(name='event_count')
@@ -147,12 +106,8 @@ def analyze_event_types_over_time():
         plt.show()
         
         print("\nVisualization generated successfully.")
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        # Close the database connection
-        conn.close()
-        print("\n✓ Database connection closed.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
 
 # Run the analysis
 if __name__ == "__main__":
@@ -174,7 +129,10 @@ It handles multiple event types separated by commas and orders the results from
 
 import sqlite3
 import pandas as pd
+import snapshot
+from analysiscache import cached_analysis
 
+@cached_analysis
 def analyze_event_types_and_totals_by_location():
     """Analyze the number of each event type and total events grouped by location"""
     
@@ -182,38 +140,19 @@ def analyze_event_types_and_totals_by_location():
     print("History 8510 - Clemson University")
     print("=" * 60)
     
-    # Connect to zines.db database
-    try:
-        conn = sqlite3.connect('zines.db')
-        print("✓ Connected to Zines database (zines.db)")
-    except sqlite3.Error as e:
-        print(f"❌ Database connection error: {e}")
-        return
-    
-    # SQL query to retrieve event types and locations
-    query = """
-    SELECT 
-        event_type,
-        city || ', ' || state || ', ' || country AS location
-    FROM 
-        events
-    ORDER BY 
-        location ASC;
-    """
-    
     try:
-        # Execute the query and load results into a Pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Load event types and location columns from the columnar snapshot
+        df = snapshot.read_frame('events', ['event_type', 'city', 'state', 'country'])
+        print(f"✓ Loaded {len(df)} events from the columnar snapshot")
         
-        # Split comma-separated event types and expand the DataFrame
-        expanded_rows = []
-        for _, row in df.iterrows():
-            event_types = [etype.strip() for etype in row['event_type'].split(',')]
-            for event_type in event_types:
-                expanded_rows.append({'event_type': event_type, 'location': row['location']})
+        # city || ', ' || state || ', ' || country: null when any part is null, as in SQL
+        df['location'] = df['city'].astype(object).str.cat(
+            [df['state'].astype(object), df['country'].astype(object)], sep=', ')
         
-        # Create a new DataFrame with expanded rows
-        expanded_df = pd.DataFrame(expanded_rows)
+        # Split comma-separated event types into one row per type
+        df['event_type'] = df['event_type'].astype(object).str.split(',')
+        expanded_df = df[['event_type', 'location']].explode('event_type')
+        expanded_df['event_type'] = expanded_df['event_type'].str.strip()
         
         # Group by event_type and location, and count occurrences
         event_type_counts = expanded_df.groupby(['event_type', 'location']).size().reset_index(name='event_count')
@@ -231,12 +170,8 @@ def analyze_event_types_and_totals_by_location():
         
         print("\nTotal Number of Events by Location (Ordered by Most to Least):")
         print(total_event_counts.to_string(index=False))
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        # Close the database connection
-        conn.close()
-        print("\n✓ Database connection closed.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
 
 # Run the analysis
 if __name__ == "__main__":
@@ -256,7 +191,10 @@ and ordered by volume and issue number in ascending order.
 
 import sqlite3
 import pandas as pd
+import snapshot
+from analysiscache import cached_analysis
 
+@cached_analysis
 def analyze_event_advertisements_and_protests():
     """Analyze Event Advertisement and Protest Report counts in Berkeley and San Francisco"""
     
@@ -264,51 +202,37 @@ def analyze_event_advertisements_and_protests():
     print("History 8510 - Clemson University")
     print("=" * 60)
     
-    # Connect to zines.db database
-    try:
-        conn = sqlite3.connect('zines.db')
-        print("✓ Connected to Zines database (zines.db)")
-    except sqlite3.Error as e:
-        print(f"❌ Database connection error: {e}")
-        return
-    
-    # SQL query to join events and publications and calculate counts
-    query = """
-    SELECT 
-        p.pub_title AS publication_title,
-        p.volume AS volume_number,
-        p.issue_number AS issue_number,
-        e.city,
-        COUNT(CASE WHEN e.event_type LIKE '%Event Advertisement%' THEN 1 END) AS event_advertisements_count,
-        COUNT(CASE WHEN e.event_type LIKE '%Protest Report%' THEN 1 END) AS protest_reports_count,
-        COUNT(*) AS total_events
-    FROM 
-        events e
-    JOIN 
-        publications p
-    ON 
-        e.publication_id = p.pub_id
-    WHERE 
-        e.city IN ('Berkeley', 'San Francisco')
-        AND (e.event_type LIKE '%Event Advertisement%' OR e.event_type LIKE '%Protest Report%')
-    GROUP BY 
-        p.pub_title, p.volume, p.issue_number, e.city
-    ORDER BY 
-        p.volume ASC, p.issue_number ASC;
-    """
-    
     try:
-        # Execute the query and load results into a Pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Events already carry their publication's title, volume and issue in the snapshot
+        events = snapshot.read_frame('events', ['publication_id', 'pub_title', 'volume', 'issue_number',
+                                                'city', 'event_type'])
+        publications = snapshot.read_frame('publications', ['pub_id'], refresh=False)
+        print(f"✓ Loaded {len(events)} events from the columnar snapshot")
+        
+        # LIKE '%...%' is case-insensitive; the JOIN drops events without a matching publication
+        event_type = events['event_type'].astype(object)
+        is_advertisement = event_type.str.contains('Event Advertisement', case=False, regex=False)
+        is_protest = event_type.str.contains('Protest Report', case=False, regex=False)
+        events = events.assign(event_advertisements_count=is_advertisement, protest_reports_count=is_protest)
+        events = events[events['publication_id'].isin(publications['pub_id'])
+                        & events['city'].isin(['Berkeley', 'San Francisco'])
+                        & (is_advertisement | is_protest)]
+        
+        # GROUP BY p.pub_title, p.volume, p.issue_number, e.city (NULLs form their own group)
+        keys = ['pub_title', 'volume', 'issue_number', 'city']
+        events = events.astype({'pub_title': object, 'city': object})
+        grouped = events.groupby(keys, dropna=False)
+        df = grouped[['event_advertisements_count', 'protest_reports_count']].sum()
+        df['total_events'] = grouped.size()
+        df = df.reset_index().rename(columns={'pub_title': 'publication_title', 'volume': 'volume_number'})
+        
+        # ORDER BY p.volume ASC, p.issue_number ASC (NULLs sort first in SQLite)
+        df = df.sort_values(['volume_number', 'issue_number'], kind='stable', na_position='first')
         
         print("\nMaximum Number of Event Advertisements and Protest Reports by Volume and Issue:")
         print(df.to_string(index=False))
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        # Close the database connection
-        conn.close()
-        print("\n✓ Database connection closed.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
 
 # Run the analysis
 if __name__ == "__main__":
@@ -327,7 +251,10 @@ and filters rows where source_publication is not "NA".
 
 import sqlite3
 import pandas as pd
+import snapshot
+from analysiscache import cached_analysis
 
+@cached_analysis
 def analyze_publications_and_events():
     """Analyze publications and events with valid source publications"""
     
@@ -335,46 +262,25 @@ def analyze_publications_and_events():
     print("History 8510 - Clemson University")
     print("=" * 60)
     
-    # Connect to zines.db database
-    try:
-        conn = sqlite3.connect('zines.db')
-        print("✓ Connected to Zines database (zines.db)")
-    except sqlite3.Error as e:
-        print(f"❌ Database connection error: {e}")
-        return
-    
-    # SQL query to join publications and events, including volume and issue numbers
-    query = """
-    SELECT 
-        e.event_title AS event_title,
-        e.event_type AS event_type,
-        e.source_publication AS source_publication,
-        p.volume AS volume_number,
-        p.issue_number AS issue_number
-    FROM 
-        events e
-    JOIN 
-        publications p
-    ON 
-        e.publication_id = p.pub_id
-    WHERE 
-        e.source_publication IS NOT NULL
-        AND e.source_publication != 'NA';
-    """
-    
     try:
-        # Execute the query and load results into a Pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Events with their publication's volume and issue number, from the columnar snapshot
+        events = snapshot.read_frame('events', ['event_title', 'event_type', 'source_publication',
+                                                'publication_id', 'volume', 'issue_number'])
+        publications = snapshot.read_frame('publications', ['pub_id'], refresh=False)
+        print(f"✓ Loaded {len(events)} events from the columnar snapshot")
+        
+        # Inner join on publications, keeping only valid source publications
+        source = events['source_publication'].astype(object)
+        df = events[events['publication_id'].isin(publications['pub_id'])
+                    & source.notna() & (source != 'NA')]
+        df = df[['event_title', 'event_type', 'source_publication', 'volume', 'issue_number']]
+        df = df.rename(columns={'volume': 'volume_number'})
         
         # Display the data in a readable format
         print("\nPublications and Events (Filtered by Valid Source Publications):")
         print(df.to_string(index=False))
-    except sqlite3.Error as e:
-        print(f"❌ Query execution error: {e}")
-    finally:
-        # Close the database connection
-        conn.close()
-        print("\n✓ Database connection closed.")
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Snapshot error: {e}")
 
 # Run the analysis
 if __name__ == "__main__":
@@ -389,11 +295,15 @@ History 8510 - Clemson University
 
 This script retrieves events where the combined location (city, state, country) appears only once in the data,
 and joins with the publications table to include volume and issue numbers.
+The query itself lives in locationqueries.py (see benchlocations.py for the regression check).
 """
 
 import sqlite3
 import pandas as pd
+import locationqueries
+from analysiscache import cached_analysis
 
+@cached_analysis
 def analyze_unique_event_locations_with_publications():
     """Analyze events with unique locations (city, state, country combined) and include publication details"""
     
@@ -409,38 +319,10 @@ def analyze_unique_event_locations_with_publications():
         print(f"❌ Database connection error: {e}")
         return
     
-    # SQL query to find events with unique locations and include publication details
-    query = """
-    SELECT 
-        e.event_title AS event_title,
-        e.event_date AS event_date,
-        e.city || ', ' || e.state || ', ' || e.country AS location,
-        p.volume AS volume_number,
-        p.issue_number AS issue_number
-    FROM 
-        events e
-    LEFT JOIN 
-        publications p
-    ON 
-        e.publication_id = p.pub_id
-    WHERE 
-        (e.city || ', ' || e.state || ', ' || e.country) IN (
-            SELECT 
-                city || ', ' || state || ', ' || country AS location
-            FROM 
-                events
-            GROUP BY 
-                city, state, country
-            HAVING 
-                COUNT(*) = 1
-        )
-    ORDER BY 
-        e.event_date ASC;
-    """
-    
     try:
-        # Execute the query and load results into a Pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Events with unique locations and their publication details, using the indexed
+        # set-based query from locationqueries.py
+        df = locationqueries.unique_event_locations(conn)
         
         # Display the data in a readable format
         print("\nEvents with Unique Locations and Publication Details:")
@@ -465,11 +347,15 @@ History 8510 - Clemson University
 
 This script retrieves events where the combined location (city, state, country) appears only once in the data,
 filters for events outside the USA, and joins with the publications table to include volume and issue numbers.
+The query itself lives in locationqueries.py (see benchlocations.py for the regression check).
 """
 
 import sqlite3
 import pandas as pd
+import locationqueries
+from analysiscache import cached_analysis
 
+@cached_analysis
 def analyze_unique_non_usa_event_locations_with_publications():
     """Analyze events with unique non-USA locations (city, state, country combined) and include publication details"""
     
@@ -485,41 +371,10 @@ def analyze_unique_non_usa_event_locations_with_publications():
         print(f"❌ Database connection error: {e}")
         return
     
-    # SQL query to find events with unique non-USA locations and include publication details
-    query = """
-    SELECT 
-        e.event_title AS event_title,
-        e.event_date AS event_date,
-        e.city || ', ' || e.state || ', ' || e.country AS location,
-        p.volume AS volume_number,
-        p.issue_number AS issue_number
-    FROM 
-        events e
-    LEFT JOIN 
-        publications p
-    ON 
-        e.publication_id = p.pub_id
-    WHERE 
-        e.country != 'USA'
-        AND (e.city || ', ' || e.state || ', ' || e.country) IN (
-            SELECT 
-                city || ', ' || state || ', ' || country AS location
-            FROM 
-                events
-            WHERE 
-                country != 'USA'
-            GROUP BY 
-                city, state, country
-            HAVING 
-                COUNT(*) = 1
-        )
-    ORDER BY 
-        e.event_date ASC;
-    """
-    
     try:
-        # Execute the query and load results into a Pandas DataFrame
-        df = pd.read_sql_query(query, conn)
+        # Events with unique non-USA locations and their publication details, using the indexed
+        # set-based query from locationqueries.py
+        df = locationqueries.unique_event_locations(conn, non_usa=True)
         
         # Display the data in a readable format
         print("\nEvents with Unique Non-USA Locations and Publication Details:")